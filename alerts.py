@@ -0,0 +1,447 @@
+"""High-risk alerts for subscribers (webhook, e-mail, SMS).
+
+The scheduler hands every published risk table to an AlertDispatcher. The
+dispatcher runs its own asyncio loop on a daemon thread, so submitting a
+table only enqueues it and scoring or the UI never wait on a sink. For each
+table every subscriber gets at most one notification listing the districts
+that reached its level (High or Very High by default). Sends run with
+bounded concurrency and are retried with exponential backoff; a
+(subscriber, district, level) that was delivered is not sent again within
+the dedup window, but an escalation (High -> Very High) goes out at once.
+
+Subscribers live in a JSON file:
+
+    [{"name": "ops", "sink": "webhook", "target": "https://hooks.example/risk"},
+     {"name": "ranchi-dc", "sink": "sms", "target": "+9100000000", "districts": ["Ranchi"], "min_risk": "Very High"}]
+
+    python alerts.py --config alerts.json            # alert on the latest published table
+    python alerts.py --config alerts.json --dry-run  # log instead of sending
+    python scheduler.py --interval 15 --alerts alerts.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+import requests
+
+from forecast import RISK_LABELS
+from metrics import LATENCY, REGISTRY
+
+ALERTS_PATH = "alerts.json"
+ALERT_LEVELS = RISK_LABELS[RISK_LABELS.index("High"):]
+DEDUP_WINDOW = 6 * 3600.0
+SMS_MAX_CHARS = 480
+
+ALERTS = REGISTRY.counter("lightning_alerts_total", "Alert notifications by sink and result.", ("sink", "result"))
+
+log = logging.getLogger("alerts")
+
+
+class DeliveryError(Exception):
+    # raised by sinks; retryable=False skips the remaining attempts
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+# ================== SUBSCRIBERS ==================
+class Subscriber:
+    def __init__(self, name: str, sink: str, target: str, districts=None, min_risk: str = "High"):
+        if min_risk not in ALERT_LEVELS:
+            raise ValueError(f"min_risk must be one of {', '.join(ALERT_LEVELS)}")
+        self.name = name
+        self.sink = sink
+        self.target = target
+        self.districts = set(districts) if districts else None  # None: every district
+        self.level = RISK_LABELS.index(min_risk)
+
+    def wants(self, alert: dict):
+        if self.districts is not None and alert["district"] not in self.districts:
+            return False
+        return RISK_LABELS.index(alert["risk"]) >= self.level
+
+
+def load_subscribers(path: str = ALERTS_PATH):
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    subscribers = [Subscriber(**entry) for entry in entries]
+    names = [s.name for s in subscribers]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Subscriber names must be unique in {path}")
+    return subscribers
+
+
+def format_alerts(alerts):
+    # (subject, body) for one notification; highest probability first
+    alerts = sorted(alerts, key=lambda a: -a["probability"])
+    top = max((a["risk"] for a in alerts), key=RISK_LABELS.index)
+    subject = f"{top} lightning risk: {', '.join(a['district'] for a in alerts)}"
+    lines = [f"{a['risk']} lightning risk in {a['district']} ({a['probability']:.0%}) for {a['date']}" for a in alerts]
+    return subject, "\n".join(lines)
+
+# ================== SINKS ==================
+# Sinks are plain blocking senders; the dispatcher runs them on its worker
+# threads. send() raises DeliveryError (or any exception, treated as
+# retryable) when the notification did not go out.
+class WebhookSink:
+    name = "webhook"
+
+    def __init__(self, timeout: float = 10.0, session: requests.Session = None):
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def send(self, subscriber: Subscriber, alerts):
+        subject, body = format_alerts(alerts)
+        payload = {"subscriber": subscriber.name, "subject": subject, "text": body, "alerts": alerts}
+        try:
+            resp = self.session.post(subscriber.target, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise DeliveryError(f"Webhook error: {e}") from e
+        if resp.status_code >= 400:
+            retryable = resp.status_code == 429 or resp.status_code >= 500
+            raise DeliveryError(f"Webhook returned {resp.status_code}", retryable=retryable)
+
+
+class SmtpSink:
+    name = "smtp"
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        user: str = None,
+        password: str = None,
+        sender: str = None,
+        starttls: bool = True,
+        timeout: float = 15.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.sender = sender or user
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def send(self, subscriber: Subscriber, alerts):
+        subject, body = format_alerts(alerts)
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = subscriber.target
+        msg.set_content(body)
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.user:
+                    smtp.login(self.user, self.password or "")
+                smtp.send_message(msg)
+        except (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused) as e:
+            raise DeliveryError(f"SMTP rejected: {e}", retryable=False) from e
+        except (smtplib.SMTPException, OSError) as e:
+            raise DeliveryError(f"SMTP error: {e}") from e
+
+
+class SmsSink:
+    # generic HTTP SMS gateway: POST {"to": ..., "message": ...} with a bearer key
+    name = "sms"
+
+    def __init__(self, url: str, api_key: str = None, timeout: float = 10.0, session: requests.Session = None):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def send(self, subscriber: Subscriber, alerts):
+        _, body = format_alerts(alerts)
+        message = body.replace("\n", "; ")
+        if len(message) > SMS_MAX_CHARS:
+            message = message[: SMS_MAX_CHARS - 3] + "..."
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        try:
+            resp = self.session.post(
+                self.url, json={"to": subscriber.target, "message": message}, headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise DeliveryError(f"SMS gateway error: {e}") from e
+        if resp.status_code >= 400:
+            retryable = resp.status_code == 429 or resp.status_code >= 500
+            raise DeliveryError(f"SMS gateway returned {resp.status_code}", retryable=retryable)
+
+
+class MemorySink:
+    # Local stub: records what would have been sent. fail_first makes the
+    # first N sends raise, to exercise retries without a real endpoint.
+    def __init__(self, name: str = "memory", fail_first: int = 0, delay: float = 0.0):
+        self.name = name
+        self.fail_first = fail_first
+        self.delay = delay
+        self.sent = []
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def send(self, subscriber: Subscriber, alerts):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.attempts += 1
+            if self.attempts <= self.fail_first:
+                raise DeliveryError(f"Stub failure {self.attempts}")
+            self.sent.append((subscriber.name, [dict(a) for a in alerts]))
+
+
+class LogSink:
+    # --dry-run: logs each notification instead of sending it
+    def __init__(self, name: str):
+        self.name = name
+
+    def send(self, subscriber: Subscriber, alerts):
+        subject, body = format_alerts(alerts)
+        log.info("[%s -> %s <%s>] %s\n%s", self.name, subscriber.name, subscriber.target, subject, body)
+
+
+def build_sinks(dry_run: bool = False):
+    # sink name -> sink; SMTP and SMS are configured from the environment
+    if dry_run:
+        return {name: LogSink(name) for name in ("webhook", "smtp", "sms")}
+    sinks = {"webhook": WebhookSink()}
+    host = os.environ.get("SMTP_HOST", "").strip()
+    if host:
+        sinks["smtp"] = SmtpSink(
+            host,
+            port=int(os.environ.get("SMTP_PORT", "587")),
+            user=os.environ.get("SMTP_USER") or None,
+            password=os.environ.get("SMTP_PASSWORD") or None,
+            sender=os.environ.get("SMTP_FROM") or None,
+            starttls=os.environ.get("SMTP_STARTTLS", "1") != "0",
+        )
+    url = os.environ.get("SMS_API_URL", "").strip()
+    if url:
+        sinks["sms"] = SmsSink(url, api_key=os.environ.get("SMS_API_KEY") or None)
+    return sinks
+
+# ================== DEDUP ==================
+class DedupWindow:
+    # Keys (subscriber, district, level) that were delivered within `window`
+    # seconds, plus keys with a send in flight. Only touched from the
+    # dispatcher's event loop, so it needs no lock.
+
+    def __init__(self, window: float = DEDUP_WINDOW, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._sent = {}
+        self._inflight = set()
+
+    def claim(self, key):
+        if key in self._inflight:
+            return False
+        last = self._sent.get(key)
+        if last is not None and self.clock() - last < self.window:
+            return False
+        self._inflight.add(key)
+        return True
+
+    def release(self, key, delivered: bool):
+        self._inflight.discard(key)
+        if delivered:
+            self._sent[key] = self.clock()
+
+    def prune(self):
+        cutoff = self.clock() - self.window
+        self._sent = {k: t for k, t in self._sent.items() if t > cutoff}
+
+# ================== DISPATCHER ==================
+class AlertDispatcher:
+    # submit() is thread-safe and never blocks: the table is reduced to its
+    # alerting rows and handed to the loop thread. A full queue drops the
+    # batch (counted) rather than stalling the caller.
+
+    def __init__(
+        self,
+        subscribers,
+        sinks: dict = None,
+        max_concurrency: int = 8,
+        retries: int = 4,
+        backoff: float = 2.0,
+        max_backoff: float = 120.0,
+        dedup_window: float = DEDUP_WINDOW,
+        queue_size: int = 100,
+        clock=time.monotonic,
+    ):
+        self.subscribers = list(subscribers)
+        self.sinks = sinks if sinks is not None else build_sinks()
+        missing = sorted({s.sink for s in self.subscribers} - set(self.sinks))
+        if missing:
+            raise ValueError(f"No sink configured for: {', '.join(missing)}")
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.queue_size = queue_size
+        self.dedup = DedupWindow(dedup_window, clock)
+        self.stats = {"batches": 0, "sent": 0, "failed": 0, "retries": 0, "deduped": 0, "dropped": 0}
+        self._loop = None
+        self._thread = None
+        self._queue = None
+        self._pending = set()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    # ---------- caller side ----------
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="alert-send")
+                self._loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(ready,), name="alert-dispatcher", daemon=True)
+                self._thread.start()
+                ready.wait()
+        return self
+
+    def submit(self, table, issued_at: str = None):
+        # table: DataFrame (or records) with district, risk, probability, date
+        records = table.to_dict(orient="records") if hasattr(table, "to_dict") else list(table)
+        alerts = [
+            {
+                "district": r["district"],
+                "risk": r["risk"],
+                "probability": float(r["probability"]),
+                "date": str(r["date"]),
+                "issued_at": issued_at or r.get("issued_at"),
+            }
+            for r in records
+            if r["risk"] in ALERT_LEVELS
+        ]
+        if not alerts:
+            return 0
+        self.start()
+        self._loop.call_soon_threadsafe(self._offer, alerts)
+        return len(alerts)
+
+    def flush(self, timeout: float = None):
+        # wait until every submitted batch has been delivered or given up on
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._drain(), self._loop).result(timeout)
+
+    def close(self, timeout: float = 30.0):
+        if self._loop is None:
+            return
+        try:
+            self.flush(timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._executor.shutdown(wait=False)
+            self._loop = self._thread = None
+
+    # ---------- loop side ----------
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        consumer = self._loop.create_task(self._consume())
+        self._loop.call_soon(ready.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            consumer.cancel()
+            for task in list(self._pending):
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(consumer, *self._pending, return_exceptions=True))
+            self._loop.close()
+
+    def _offer(self, alerts):
+        try:
+            self._queue.put_nowait(alerts)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            ALERTS.inc("all", "dropped")
+            log.warning("Alert queue full; dropped a batch of %d alerts", len(alerts))
+
+    async def _consume(self):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        while True:
+            alerts = await self._queue.get()
+            try:
+                self.stats["batches"] += 1
+                self.dedup.prune()
+                for subscriber in self.subscribers:
+                    wanted = [a for a in alerts if subscriber.wants(a)]
+                    fresh = [a for a in wanted if self.dedup.claim((subscriber.name, a["district"], a["risk"]))]
+                    deduped = len(wanted) - len(fresh)
+                    if deduped:
+                        self.stats["deduped"] += deduped
+                        ALERTS.inc(subscriber.sink, "deduped", amount=deduped)
+                    if fresh:
+                        task = asyncio.create_task(self._deliver(subscriber, fresh, semaphore))
+                        self._pending.add(task)
+                        task.add_done_callback(self._pending.discard)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, subscriber: Subscriber, alerts, semaphore):
+        sink = self.sinks[subscriber.sink]
+        loop = asyncio.get_running_loop()
+        delivered = False
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    async with semaphore:
+                        with LATENCY.time(f"alert_{subscriber.sink}"):
+                            await loop.run_in_executor(self._executor, sink.send, subscriber, alerts)
+                    delivered = True
+                    break
+                except Exception as e:
+                    retryable = getattr(e, "retryable", True)
+                    if not retryable or attempt == self.retries:
+                        log.warning("Alert to %s via %s failed: %s", subscriber.name, subscriber.sink, e)
+                        break
+                    self.stats["retries"] += 1
+                    ALERTS.inc(subscriber.sink, "retry")
+                    delay = min(self.max_backoff, self.backoff * 2**attempt)
+                    await asyncio.sleep(delay * (0.5 + random.random() / 2))
+        finally:
+            for a in alerts:
+                self.dedup.release((subscriber.name, a["district"], a["risk"]), delivered)
+        result = "sent" if delivered else "failed"
+        self.stats[result] += 1
+        ALERTS.inc(subscriber.sink, result)
+
+    async def _drain(self):
+        await self._queue.join()
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+
+def main(argv=None):
+    from scheduler import RISK_DB, RiskTableStore
+
+    parser = argparse.ArgumentParser(description="Send alerts for the latest published risk table.")
+    parser.add_argument("--config", default=ALERTS_PATH, help="Subscribers (JSON).")
+    parser.add_argument("--db", default=RISK_DB)
+    parser.add_argument("--dry-run", action="store_true", help="Log notifications instead of sending them.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    table = RiskTableStore(args.db).latest()
+    if table.empty:
+        raise SystemExit("No risk table published yet; run scheduler.py first.")
+    dispatcher = AlertDispatcher(load_subscribers(args.config), build_sinks(args.dry_run))
+    try:
+        dispatcher.submit(table)
+    finally:
+        dispatcher.close()
+    print(", ".join(f"{k}={v}" for k, v in dispatcher.stats.items()))
+
+
+if __name__ == "__main__":
+    main()
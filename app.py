@@ -1,10 +1,26 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import pickle
-import datetime as dt
+import altair as alt
 import os
-import requests
+import time
+import numpy as np
+import pandas as pd
+
+from calibration import load_report, recommended_threshold
+from forecast import (
+    DISTRICTS,
+    DISTRICT_COORDS,
+    get_encoder,
+    get_model,
+    get_prediction_cache,
+    risk_label,
+    today_ist,
+)
+from metrics import LATENCY, parse_addr, start_exporter
+from news import get_news_cache
+from observations import get_observation_store
+from scenarios import resolve_base, sweep
+from scheduler import RISK_DB, RiskTableStore
+from weather import fetch_weather_from_openweather
 
 # ================== PAGE CONFIG ==================
 st.set_page_config(
@@ -14,8 +30,9 @@ st.set_page_config(
 )
 
 # ================== LIGHT THEME + CUSTOM CSS ==================
-st.markdown(
-    """
+# Static markup lives in module constants so a rerun only re-sends it; widget
+# interactions on the Prediction page rerun a fragment and skip it entirely.
+APP_CSS = """
     <style>
     .stApp {
         background: #f3f4f6;
@@ -177,9 +194,8 @@ st.markdown(
     .risk-high   { background:#fee2e2; color:#b91c1c; }
     .risk-vhigh  { background:#fecaca; color:#7f1d1d; }
     </style>
-    """,
-    unsafe_allow_html=True,
-)
+    """
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # ================== SESSION STATE ==================
 if "page" not in st.session_state:
@@ -187,7 +203,7 @@ if "page" not in st.session_state:
 if "weather_data" not in st.session_state:
     st.session_state.weather_data = None
 if "selected_date" not in st.session_state:
-    st.session_state.selected_date = dt.date.today()
+    st.session_state.selected_date = today_ist()
 if "selected_district" not in st.session_state:
     st.session_state.selected_district = "Ranchi"
 if "lat" not in st.session_state:
@@ -195,230 +211,25 @@ if "lat" not in st.session_state:
 if "lon" not in st.session_state:
     st.session_state.lon = 85.33
 
+# ================== METRICS ==================
+# render/fetch timings recorded in this process are only visible through an
+# exporter thread of its own (service.py's /metrics is another process)
+METRICS_ADDR = os.environ.get("LIGHTNING_METRICS_ADDR", "").strip()
+if METRICS_ADDR:
+    metrics_host, metrics_port = parse_addr(METRICS_ADDR)
+    start_exporter(metrics_port, metrics_host)
+
 # ================== API KEYS FLAGS ==================
 HAS_WEATHER_API = bool(os.environ.get("OPENWEATHER_API_KEY", "").strip())
 HAS_NEWS_API = bool(os.environ.get("NEWS_API_KEY", "").strip())
 
 # ================== LOAD MODEL (ENSEMBLE) ==================
-@st.cache(allow_output_mutation=True)
-def load_model():
-    with open("lightning_ensemble_model.pkl", "rb") as f:
-        ens = pickle.load(f)
-    return ens
-
-
-ens = load_model()
-log_pipe = ens["log_pipe"]
-mlp_pipe = ens["mlp_pipe"]
-gb_pipe = ens["gb_pipe"]
-feature_list = ens["feature_list"]
-
-# ================== CONSTANTS ==================
-DISTRICTS = [
-    "Bokaro",
-    "Chatra",
-    "Deoghar",
-    "Dhanbad",
-    "Dumka",
-    "Garhwa",
-    "Giridih",
-    "Godda",
-    "Gumla",
-    "Hazaribagh",
-    "Jamtara",
-    "Khunti",
-    "Koderma",
-    "Latehar",
-    "Lohardaga",
-    "Pakur",
-    "Palamu",
-    "Ramgarh",
-    "Ranchi",
-    "Sahibganj",
-    "Simdega",
-    "West Singhbhum",
-]
-
-DISTRICT_COORDS = {
-    "Bokaro": (23.78, 86.20),
-    "Chatra": (24.21, 84.87),
-    "Deoghar": (24.48, 86.71),
-    "Dhanbad": (23.80, 86.45),
-    "Dumka": (24.27, 87.25),
-    "Garhwa": (24.17, 83.80),
-    "Giridih": (24.18, 86.30),
-    "Godda": (24.83, 87.22),
-    "Gumla": (23.04, 84.55),
-    "Hazaribagh": (23.98, 85.36),
-    "Jamtara": (23.95, 86.80),
-    "Khunti": (23.08, 85.28),
-    "Koderma": (24.47, 85.60),
-    "Latehar": (23.75, 84.50),
-    "Lohardaga": (23.43, 84.68),
-    "Pakur": (24.64, 87.85),
-    "Palamu": (24.07, 84.08),
-    "Ramgarh": (23.64, 85.52),
-    "Ranchi": (23.36, 85.33),
-    "Sahibganj": (25.25, 87.65),
-    "Simdega": (22.62, 84.50),
-    "West Singhbhum": (22.57, 85.82),
-}
-
-# ================== API HELPERS ==================
-def fetch_weather_from_openweather(lat: float, lon: float):
-    api_key = os.environ.get("OPENWEATHER_API_KEY", "").strip()
-    if not api_key:
-        return None, "Weather API key not configured."
-
-    url = (
-        "https://api.openweathermap.org/data/2.5/weather"
-        f"?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-    )
-    try:
-        resp = requests.get(url, timeout=8)
-        if resp.status_code == 401:
-            return None, "Invalid or inactive OpenWeather API key (401)."
-        if resp.status_code != 200:
-            return None, f"OpenWeather API error: {resp.status_code}"
-
-        data = resp.json()
-        main = data.get("main", {})
-        temp_c = main.get("temp", 28.0)
-        rh = main.get("humidity", 70.0)
-        pressure = main.get("pressure", 970.0)
-        wind = data.get("wind", {}).get("speed", 0.0)
-        rain_raw = 0.0
-        if "rain" in data:
-            rain_raw = data["rain"].get("1h", data["rain"].get("3h", 0.0))
-
-        return {
-            "temp_c": float(temp_c),
-            "rh": float(rh),
-            "pressure": float(pressure),
-            "wind": float(wind),
-            "rain_mm": float(rain_raw),
-        }, None
-    except Exception as e:
-        return None, f"Request error: {e}"
-
-
-def fetch_lightning_news(max_articles: int = 4):
-    api_key = os.environ.get("NEWS_API_KEY", "").strip()
-    if not api_key:
-        return [], "News API key not configured."
-
-    url = (
-        "https://newsapi.org/v2/everything?"
-        "q=lightning%20OR%20thunderstorm%20OR%20IMD%20weather%20alert&"
-        "language=en&sortBy=publishedAt&pageSize=10&"
-        f"apiKey={api_key}"
-    )
-    try:
-        resp = requests.get(url, timeout=6)
-        if resp.status_code != 200:
-            return [], f"News API error: {resp.status_code}"
-        data = resp.json()
-        return data.get("articles", [])[:max_articles], None
-    except Exception as e:
-        return [], f"News request error: {e}"
-
-# ================== FEATURE HELPERS ==================
-def compute_season(month: int, day: int):
-    if month in [12, 1, 2]:
-        return "Winter"
-    elif month == 3:
-        return "Summer"
-    elif month in [4, 5]:
-        return "PreMonsoon"
-    elif month in [6, 7, 8, 9]:
-        return "Monsoon"
-    else:
-        return "PostMonsoon"
-
-
-def compute_thi(temp_c: float, rh: float):
-    return temp_c - ((0.55 - 0.0055 * rh) * (temp_c - 14.5))
-
-
-def build_feature_row(
-    date: dt.date,
-    district: str,
-    lat: float,
-    lon: float,
-    temp_c: float,
-    rh: float,
-    pressure: float,
-    windspeed: float,
-    rain_mm: float,
-    rain_3day_sum: float,
-    temp_3day_mean: float,
-    rh_3day_mean: float,
-    pres_3day_mean: float,
-    pressure_drop: float,
-):
-    month_no = date.month
-    day = date.day
-    day_of_year = date.timetuple().tm_yday
-    week_of_year = date.isocalendar().week
-    season = compute_season(month_no, day)
-    is_monsoon = 1 if season == "Monsoon" else 0
-    thi = compute_thi(temp_c, rh)
-
-    feats = {
-        "Month_No": month_no,
-        "Day": day,
-        "Latitude": lat,
-        "Longitude": lon,
-        "Pressure_hPa": pressure,
-        "Rh": rh,
-        "Rain_mm": rain_mm,
-        "Temp_C": temp_c,
-        "WindSpeed": windspeed,
-        "DayOfYear": day_of_year,
-        "WeekOfYear": week_of_year,
-        "IsMonsoon": is_monsoon,
-        "THI": thi,
-        "Temp_3day_mean": temp_3day_mean,
-        "Rh_3day_mean": rh_3day_mean,
-        "Rain_3day_sum": rain_3day_sum,
-        "Pres_3day_mean": pres_3day_mean,
-        "Pressure_Drop": pressure_drop,
-    }
-
-    for d in DISTRICTS:
-        feats[f"Dist_{d}"] = 1 if d == district else 0
-
-    feats["Season_Monsoon"] = 1 if season == "Monsoon" else 0
-    feats["Season_PreMonsoon"] = 1 if season == "PreMonsoon" else 0
-    feats["Season_PostMonsoon"] = 1 if season == "PostMonsoon" else 0
-    feats["Season_Summer"] = 1 if season == "Summer" else 0
-    feats["Season_Winter"] = 1 if season == "Winter" else 0
-
-    row = pd.DataFrame([feats])
-    row = row.reindex(columns=feature_list, fill_value=0)
-    return row
-
-
-def predict_ensemble_from_row(row: pd.DataFrame, threshold: float = 0.5):
-    p_log = log_pipe.predict_proba(row)[:, 1]
-    p_mlp = mlp_pipe.predict_proba(row)[:, 1]
-    p_gb = gb_pipe.predict_proba(row)[:, 1]
-    prob = (p_log + p_mlp + p_gb) / 3.0
-    pred = int(prob[0] >= threshold)
-    return pred, float(prob[0])
-
-
-def risk_label(prob: float):
-    if prob < 0.3:
-        return "Low"
-    elif prob < 0.6:
-        return "Moderate"
-    elif prob < 0.8:
-        return "High"
-    else:
-        return "Very High"
-
+# get_model() is already one ensemble per process. Each fragment asks for it
+# when it runs instead of closing over a module-level ens, so a model store
+# hot-swap reaches fragment reruns too; this call only loads it up front.
+get_model()
 
+# ================== RISK HELPERS ==================
 def risk_chip_class(label: str):
     if label == "Low":
         return "risk-low"
@@ -448,56 +259,63 @@ choice = st.sidebar.radio(
 st.session_state.page = choice
 
 # ================== OVERVIEW PAGE ==================
+HERO_HTML = (
+    '<div class="hero-wrapper">'
+    '  <div class="hero-left">'
+    '    <div class="hero-title">Lightning Forecasting System</div>'
+    '    <div class="hero-subtitle">'
+    '      A data-driven decision support tool built using LIS satellite lightning data '
+    '      and ground-based meteorological time series (MTS) to estimate the probability '
+    '      of lightning occurrence across districts of Jharkhand.'
+    '    </div>'
+    '  </div>'
+    '  <div class="hero-right">'
+    '    <div class="storm-card">'
+    '      <h3>Monsoon Storm Monitor</h3>'
+    '      <p>Track short-term lightning risk using machine learning that '
+    'blends pressure, humidity, rainfall and seasonal patterns.</p>'
+    '      <div class="storm-metric">ROC-AUC ≈ 0.97 (Ensemble)</div>'
+    '      <div class="storm-badge">Logistic Regression · MLP · Gradient Boosting</div>'
+    '      <div class="storm-icon">⚡</div>'
+    '    </div>'
+    '  </div>'
+    '</div>'
+)
+
+STATS_HTML = """
+<div class="stat-row">
+    <div class="stat-card">
+        <div class="stat-label">Data Coverage</div>
+        <div class="stat-value">2017 – 2022</div>
+        <div class="small-caption">6 years of LIS lightning & district-wise MTS weather.</div>
+    </div>
+    <div class="stat-card">
+        <div class="stat-label">Sample Size</div>
+        <div class="stat-value">53,843 rows</div>
+        <div class="small-caption">Balanced using SMOTE–Tomek to handle rare lightning days.</div>
+    </div>
+    <div class="stat-card">
+        <div class="stat-label">Key Drivers</div>
+        <div class="stat-value">Pressure drop · Rainfall</div>
+        <div class="small-caption">Followed by temperature, humidity and 3-day aggregates.</div>
+    </div>
+</div>
+"""
+
+
+@st.cache_data(ttl=60)
+def latest_risk_table():
+    # the scheduler publishes every few minutes; one read per minute serves all sessions
+    return RiskTableStore(RISK_DB).latest()
+
+
 def render_overview():
     # HERO
     st.markdown('<div class="pill">Lightning Risk · Jharkhand</div>', unsafe_allow_html=True)
-    st.markdown(
-        '<div class="hero-wrapper">'
-        '  <div class="hero-left">'
-        '    <div class="hero-title">Lightning Forecasting System</div>'
-        '    <div class="hero-subtitle">'
-        '      A data-driven decision support tool built using LIS satellite lightning data '
-        '      and ground-based meteorological time series (MTS) to estimate the probability '
-        '      of lightning occurrence across districts of Jharkhand.'
-        '    </div>'
-        '  </div>'
-        '  <div class="hero-right">'
-        '    <div class="storm-card">'
-        '      <h3>Monsoon Storm Monitor</h3>'
-        '      <p>Track short-term lightning risk using machine learning that '
-        'blends pressure, humidity, rainfall and seasonal patterns.</p>'
-        '      <div class="storm-metric">ROC-AUC ≈ 0.97 (Ensemble)</div>'
-        '      <div class="storm-badge">Logistic Regression · MLP · Gradient Boosting</div>'
-        '      <div class="storm-icon">⚡</div>'
-        '    </div>'
-        '  </div>'
-        '</div>',
-        unsafe_allow_html=True,
-    )
+    st.markdown(HERO_HTML, unsafe_allow_html=True)
 
     # STATS ROW
-    st.markdown(
-        """
-        <div class="stat-row">
-            <div class="stat-card">
-                <div class="stat-label">Data Coverage</div>
-                <div class="stat-value">2017 – 2022</div>
-                <div class="small-caption">6 years of LIS lightning & district-wise MTS weather.</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-label">Sample Size</div>
-                <div class="stat-value">53,843 rows</div>
-                <div class="small-caption">Balanced using SMOTE–Tomek to handle rare lightning days.</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-label">Key Drivers</div>
-                <div class="stat-value">Pressure drop · Rainfall</div>
-                <div class="small-caption">Followed by temperature, humidity and 3-day aggregates.</div>
-            </div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(STATS_HTML, unsafe_allow_html=True)
 
     st.markdown("---")
 
@@ -545,8 +363,10 @@ def render_overview():
                 "News API key not set. (Optional) Set `NEWS_API_KEY` in environment to display real-time lightning / IMD news here."
             )
         else:
-            news, err = fetch_lightning_news()
-            if err:
+            news, err = get_news_cache().get()
+            if news is None:
+                st.caption("Loading the latest lightning news…")
+            elif err:
                 # make 401 nicer:
                 if "401" in err:
                     st.caption("News feed unavailable: API key for NewsAPI is invalid or expired. This feature is optional.")
@@ -571,6 +391,19 @@ def render_overview():
                         unsafe_allow_html=True,
                     )
 
+    if os.path.exists(RISK_DB):
+        st.markdown("---")
+        st.markdown('<div class="section-title">🗺️ Statewide Risk (latest scheduled run)</div>', unsafe_allow_html=True)
+        table = latest_risk_table()
+        if table.empty:
+            st.caption("The risk scheduler has not published a table yet.")
+        else:
+            st.caption(f"Issued at {table['issued_at'].iloc[0]} (UTC) for {table['date'].iloc[0]}.")
+            st.dataframe(
+                table[["district", "probability", "risk", "temp_c", "rh", "pressure", "rain_mm"]],
+                hide_index=True,
+            )
+
     st.markdown("---")
     st.subheader("Try the Interactive Predictor")
     c1, c2, _ = st.columns([1.4, 2, 3])
@@ -593,20 +426,35 @@ def render_prediction():
     )
 
     st.sidebar.subheader("Model Settings")
+    # calibration.py recommends a threshold per district and season from
+    # labelled history; without a report the slider starts at 0.5
+    district, date = st.session_state.selected_district, st.session_state.selected_date
+    calibrated = load_report() is not None
+    default = min(max(round(recommended_threshold(district, date), 2), 0.1), 0.9)
     threshold = st.sidebar.slider(
         "Decision Threshold",
         min_value=0.1,
         max_value=0.9,
-        value=0.5,
-        step=0.05,
+        value=default,
+        step=0.01 if calibrated else 0.05,
         help="If predicted probability ≥ threshold → Lightning (1), else No Lightning (0).",
     )
+    if calibrated:
+        st.sidebar.caption(f"Calibrated default for {district} on {date:%d %b}: {default:.2f}")
+    prediction_inputs(threshold)
+
+
+@st.fragment
+def prediction_inputs(threshold: float):
+    # Widget changes here rerun only this fragment, not the whole app, and the
+    # weather values sit in a form, so typing reruns nothing until Predict.
 
     # ---------- TOP ROW: DATE, DISTRICT, COORDS ----------
     col1, col2, col3 = st.columns([1.2, 1.2, 1])
 
     with col1:
-        date = st.date_input("Date", value=st.session_state.selected_date)
+        prev_date = st.session_state.selected_date
+        date = st.date_input("Date", value=prev_date)
         st.session_state.selected_date = date
 
     with col2:
@@ -623,6 +471,11 @@ def render_prediction():
             st.session_state.weather_data = None
             st.session_state.selected_district = district
 
+    # the calibrated threshold slider lives outside this fragment and
+    # depends on district and date, so a change there reruns the whole page
+    if (district != prev_dist or date != prev_date) and load_report() is not None:
+        st.rerun()
+
     with col3:
         lat = st.number_input(
             "Latitude",
@@ -657,7 +510,7 @@ def render_prediction():
             else:
                 st.session_state.weather_data = weather
                 st.success("Weather data fetched and pre-filled in the input fields below.")
-                st.rerun()
+                st.rerun(scope="fragment")
 
     with colW2:
         if st.session_state.weather_data:
@@ -684,70 +537,92 @@ def render_prediction():
     default_wind = float(w.get("wind", 2.0))
     default_rain = float(w.get("rain_mm", 5.0))
 
-    st.markdown("### 📥 Input Weather Conditions")
-
-    col5, col6 = st.columns(2)
-    with col5:
-        temp_c = st.number_input("Temperature (°C)", value=default_temp, format="%.2f")
-        rh = st.number_input(
-            "Relative Humidity (%)",
-            value=default_rh,
-            min_value=0.0,
-            max_value=100.0,
-            format="%.1f",
-        )
-        rain_mm = st.number_input(
-            "Rainfall Today (mm)",
-            value=default_rain,
-            min_value=0.0,
-            format="%.2f",
-        )
+    # the store only counts when it has observations leading up to `date`;
+    # the fields stay blank so encode_row folds in the values entered above
+    observations = get_observation_store()
+    has_history = observations.rolling(district, date, default_temp, default_rh, default_pres, default_rain) is not None
+    placeholder = "from observations" if has_history else "today's value"
+
+    with st.form("weather_inputs", border=False):
+        st.markdown("### 📥 Input Weather Conditions")
+
+        col5, col6 = st.columns(2)
+        with col5:
+            temp_c = st.number_input("Temperature (°C)", value=default_temp, format="%.2f")
+            rh = st.number_input(
+                "Relative Humidity (%)",
+                value=default_rh,
+                min_value=0.0,
+                max_value=100.0,
+                format="%.1f",
+            )
+            rain_mm = st.number_input(
+                "Rainfall Today (mm)",
+                value=default_rain,
+                min_value=0.0,
+                format="%.2f",
+            )
 
-    with col6:
-        pressure = st.number_input(
-            "Surface Pressure (hPa)", value=default_pres, format="%.2f"
-        )
-        windspeed = st.number_input(
-            "Wind Speed (m/s)", value=default_wind, min_value=0.0, format="%.2f"
-        )
+        with col6:
+            pressure = st.number_input(
+                "Surface Pressure (hPa)", value=default_pres, format="%.2f"
+            )
+            windspeed = st.number_input(
+                "Wind Speed (m/s)", value=default_wind, min_value=0.0, format="%.2f"
+            )
 
-    # ---------- LAST 3 DAYS ----------
-    st.markdown("### 📊 Last 3 Days (optional, improves model)")
+        # ---------- LAST 3 DAYS ----------
+        # blank fields fall back (in encode_row) to the observation store, then to today's values
+        st.markdown("### 📊 Last 3 Days (optional, improves model)")
 
-    col7, col8, col9 = st.columns(3)
-    with col7:
-        rain_3day_sum = st.number_input(
-            "Rain (last 3 days, mm)", value=rain_mm, min_value=0.0, format="%.2f"
-        )
-    with col8:
-        temp_3day_mean = st.number_input(
-            "Temp mean (3 days, °C)", value=temp_c, format="%.2f"
-        )
-    with col9:
-        rh_3day_mean = st.number_input(
-            "RH mean (3 days, %)",
-            value=rh,
-            min_value=0.0,
-            max_value=100.0,
-            format="%.1f",
-        )
+        if has_history:
+            st.caption(
+                f"Leave blank to use the observations recorded for {district} on the days before "
+                f"{date:%d %b %Y}, together with today's values above."
+            )
+        else:
+            st.caption("Leave blank to use today's values.")
 
-    col10, col11 = st.columns(2)
-    with col10:
-        pres_3day_mean = st.number_input(
-            "Pressure mean (3 days, hPa)", value=pressure, format="%.2f"
-        )
-    with col11:
-        pressure_drop = st.number_input(
-            "Pressure drop (today - 3-day mean, hPa)",
-            value=float(pressure - pres_3day_mean),
-            format="%.3f",
-        )
+        col7, col8, col9 = st.columns(3)
+        with col7:
+            rain_3day_sum = st.number_input(
+                "Rain (last 3 days, mm)", value=None, placeholder=placeholder, min_value=0.0, format="%.2f"
+            )
+        with col8:
+            temp_3day_mean = st.number_input(
+                "Temp mean (3 days, °C)", value=None, placeholder=placeholder, format="%.2f"
+            )
+        with col9:
+            rh_3day_mean = st.number_input(
+                "RH mean (3 days, %)",
+                value=None,
+                placeholder=placeholder,
+                min_value=0.0,
+                max_value=100.0,
+                format="%.1f",
+            )
+
+        col10, col11 = st.columns(2)
+        with col10:
+            pres_3day_mean = st.number_input(
+                "Pressure mean (3 days, hPa)", value=None, placeholder=placeholder, format="%.2f"
+            )
+        with col11:
+            pressure_drop = st.number_input(
+                "Pressure drop (today - 3-day mean, hPa)",
+                value=None,
+                placeholder="today - 3-day mean",
+                format="%.3f",
+            )
+
+        st.markdown("---")
+        submitted = st.form_submit_button("Predict Lightning Risk ⚡")
 
     # ---------- PREDICT ----------
-    st.markdown("---")
-    if st.button("Predict Lightning Risk ⚡"):
-        row = build_feature_row(
+    if submitted:
+        # one ensemble for the whole prediction, feature vector included
+        ens = get_model()
+        pred, prob = get_prediction_cache().predict(
             date=date,
             district=district,
             lat=lat,
@@ -762,39 +637,148 @@ def render_prediction():
             rh_3day_mean=rh_3day_mean,
             pres_3day_mean=pres_3day_mean,
             pressure_drop=pressure_drop,
+            threshold=threshold,
+            ens=ens,
         )
 
-        pred, prob = predict_ensemble_from_row(row, threshold=threshold)
-        prob_pct = prob * 100
-        label = risk_label(prob)
-        chip_class = risk_chip_class(label)
-        message = risk_message(label)
+        with LATENCY.time("render_risk"):
+            prob_pct = prob * 100
+            label = risk_label(prob)
+            chip_class = risk_chip_class(label)
+            message = risk_message(label)
 
-        st.subheader("Prediction Result")
+            st.subheader("Prediction Result")
 
-        st.markdown(
-            f"""
-            <div class="glass-card">
-                <div style="display:flex;justify-content:space-between;align-items:center;">
-                    <div>
-                        <div class="stat-label">Lightning Probability</div>
-                        <div class="stat-value">{prob_pct:.2f}%</div>
-                        <div class="small-caption">Decision threshold: {threshold:.2f}</div>
-                    </div>
-                    <div>
-                        <span class="risk-chip {chip_class}">Risk: {label}</span>
+            st.markdown(
+                f"""
+                <div class="glass-card">
+                    <div style="display:flex;justify-content:space-between;align-items:center;">
+                        <div>
+                            <div class="stat-label">Lightning Probability</div>
+                            <div class="stat-value">{prob_pct:.2f}%</div>
+                            <div class="small-caption">Decision threshold: {threshold:.2f}</div>
+                        </div>
+                        <div>
+                            <span class="risk-chip {chip_class}">Risk: {label}</span>
+                        </div>
                     </div>
                 </div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
+                """,
+                unsafe_allow_html=True,
+            )
+
+            st.write(f"**Binary Prediction:** `{pred}`  (1 = Lightning, 0 = No Lightning)")
+            st.info(message)
+
+            with st.expander("Show Engineered Feature Vector sent to the model"):
+                row = get_encoder(ens["feature_list"]).encode_row(
+                    date=date,
+                    district=district,
+                    lat=lat,
+                    lon=lon,
+                    temp_c=temp_c,
+                    rh=rh,
+                    pressure=pressure,
+                    windspeed=windspeed,
+                    rain_mm=rain_mm,
+                    rain_3day_sum=rain_3day_sum,
+                    temp_3day_mean=temp_3day_mean,
+                    rh_3day_mean=rh_3day_mean,
+                    pres_3day_mean=pres_3day_mean,
+                    pressure_drop=pressure_drop,
+                )
+                st.dataframe(pd.DataFrame(row, columns=ens["feature_list"]))
+
+        st.session_state.scenario = {
+            "date": date,
+            "district": district,
+            "base": {
+                "lat": lat,
+                "lon": lon,
+                "temp_c": temp_c,
+                "rh": rh,
+                "pressure": pressure,
+                "windspeed": windspeed,
+                "rain_mm": rain_mm,
+                "rain_3day_sum": rain_3day_sum,
+                "temp_3day_mean": temp_3day_mean,
+                "rh_3day_mean": rh_3day_mean,
+                "pres_3day_mean": pres_3day_mean,
+                "pressure_drop": pressure_drop,
+            },
+        }
+        what_if_sweep(threshold)
+
+# ================== WHAT-IF SWEEP ==================
+# label -> (input, default half-range, max half-range, lower bound, upper bound)
+SWEEP_INPUTS = {
+    "Pressure drop (hPa)": ("pressure_drop", 5.0, 20.0, None, None),
+    "Rain, last 3 days (mm)": ("rain_3day_sum", 30.0, 150.0, 0.0, None),
+    "Rainfall today (mm)": ("rain_mm", 20.0, 100.0, 0.0, None),
+    "Relative Humidity (%)": ("rh", 20.0, 50.0, 0.0, 100.0),
+    "Temperature (°C)": ("temp_c", 5.0, 15.0, None, None),
+    "Surface Pressure (hPa)": ("pressure", 10.0, 30.0, None, None),
+    "Wind Speed (m/s)": ("windspeed", 5.0, 20.0, 0.0, None),
+}
+
+
+@st.fragment
+def what_if_sweep(threshold: float):
+    # Varies up to two inputs around the submitted conditions; the whole grid
+    # is one batched ensemble call, so moving a slider re-scores it at once.
+    scenario = st.session_state.scenario
+    base = resolve_base(scenario["district"], scenario["base"], scenario["date"])
 
-        st.write(f"**Binary Prediction:** `{pred}`  (1 = Lightning, 0 = No Lightning)")
-        st.info(message)
+    st.markdown("---")
+    st.markdown("### 🔀 What-if Scenarios")
+    picked = st.multiselect(
+        "Inputs to vary",
+        list(SWEEP_INPUTS),
+        default=["Pressure drop (hPa)", "Rain, last 3 days (mm)"],
+        max_selections=2,
+    )
+    if not picked:
+        st.caption("Pick one or two inputs to see how the probability responds.")
+        return
+
+    points = st.slider("Points per input", min_value=5, max_value=60, value=25)
+    ranges = {}
+    cols = st.columns(len(picked))
+    for col, label in zip(cols, picked):
+        name, span, max_span, lo, hi = SWEEP_INPUTS[label]
+        with col:
+            span = st.slider(f"{label}: ± around {base[name]:.1f}", 0.0, max_span, span)
+        values = np.clip(base[name] + np.linspace(-span, span, points), lo, hi)
+        ranges[name] = np.unique(values)
+
+    start = time.perf_counter()
+    surface = sweep(scenario["date"], scenario["district"], scenario["base"], ranges, ens=get_model())
+    elapsed = time.perf_counter() - start
+    frame = surface.to_frame()
+    above = float((surface.prob >= threshold).mean())
+    st.caption(
+        f"Scored {surface.meta['points']} scenarios in {elapsed * 1000:.0f} ms · "
+        f"{above:.0%} at or above the decision threshold ({threshold:.2f})."
+    )
 
-        with st.expander("Show Engineered Feature Vector sent to the model"):
-            st.dataframe(row)
+    x = surface.names[0]
+    if len(surface.names) == 1:
+        st.line_chart(frame.set_index(x)["probability"])
+        return
+    y = surface.names[1]
+    heatmap = (
+        alt.Chart(frame)
+        .mark_rect()
+        .encode(
+            x=alt.X(f"{x}:O", title=picked[0], axis=alt.Axis(format=".1f")),
+            y=alt.Y(f"{y}:O", title=picked[1], sort="descending", axis=alt.Axis(format=".1f")),
+            color=alt.Color(
+                "probability:Q", scale=alt.Scale(domain=[0, 1], scheme="yelloworangered"), title="Probability"
+            ),
+            tooltip=[x, y, alt.Tooltip("probability:Q", format=".3f"), "risk"],
+        )
+    )
+    st.altair_chart(heatmap, use_container_width=True)
 
 # ================== ROUTER ==================
 if st.session_state.page == "Overview":
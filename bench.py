@@ -0,0 +1,199 @@
+"""Inference benchmarks.
+
+Measures p50/p95/p99 latency and throughput for feature building, each
+ensemble member, the full ensemble and model cold start, and writes the
+results as JSON so runs can be compared.
+
+    python bench.py --out bench.json
+    python bench.py --sizes 1,22,1000 --compare bench.json
+
+When lightning_ensemble_model.pkl is missing a small synthetic ensemble
+with the same feature layout is trained instead, so the suite runs offline.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import forecast
+from forecast import (
+    MEMBERS,
+    MODEL_PATH,
+    build_feature_row,
+    get_encoder,
+    load_model,
+    normalize_records,
+    predict_ensemble_from_row,
+    score_batch,
+)
+from fixtures import synthetic_model, synthetic_records
+
+DEFAULT_SIZES = [1, 22, 1000, 100_000]
+ROW_ARGS = [
+    "lat",
+    "lon",
+    "temp_c",
+    "rh",
+    "pressure",
+    "windspeed",
+    "rain_mm",
+    "rain_3day_sum",
+    "temp_3day_mean",
+    "rh_3day_mean",
+    "pres_3day_mean",
+    "pressure_drop",
+]
+MIN_SECONDS = 1.0
+
+# ================== TIMING ==================
+def measure(name: str, fn, batch_size: int, min_seconds: float = MIN_SECONDS, max_repeats: int = 2000):
+    fn()  # warm-up
+    times = []
+    deadline = time.perf_counter() + min_seconds
+    while len(times) < max_repeats and (len(times) < 5 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    t = np.asarray(times) * 1000.0
+    return {
+        "name": name,
+        "batch_size": batch_size,
+        "repeats": len(times),
+        "p50_ms": float(np.percentile(t, 50)),
+        "p95_ms": float(np.percentile(t, 95)),
+        "p99_ms": float(np.percentile(t, 99)),
+        "mean_ms": float(t.mean()),
+        "rows_per_s": float(batch_size / (t.mean() / 1000.0)),
+    }
+
+
+def cold_start(model_path: str, repeats: int = 3):
+    # a fresh interpreter each time, so nothing is already imported or cached
+    code = (
+        "import time; t = time.perf_counter(); import forecast; "
+        f"forecast.load_model({model_path!r}); print(time.perf_counter() - t)"
+    )
+    env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(forecast.__file__))}
+    times = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    t = np.asarray(times) * 1000.0
+    return {
+        "name": "load_model",
+        "batch_size": 1,
+        "repeats": repeats,
+        "p50_ms": float(np.percentile(t, 50)),
+        "p95_ms": float(np.percentile(t, 95)),
+        "p99_ms": float(np.percentile(t, 99)),
+        "mean_ms": float(t.mean()),
+        "rows_per_s": None,
+    }
+
+# ================== SUITE ==================
+def run_suite(ens, sizes, model_path: str, min_seconds: float = MIN_SECONDS, cold_repeats: int = 3):
+    encoder = get_encoder(ens["feature_list"])
+    results = []
+
+    single = normalize_records(synthetic_records(1, seed=1)).iloc[0]
+    kwargs = {"date": single["date"].date(), "district": single["district"]}
+    for name in ROW_ARGS:
+        kwargs[name] = float(single[name])
+    feature_list = ens["feature_list"]
+    row = build_feature_row(**kwargs, feature_list=feature_list)
+
+    def feature_row():
+        return build_feature_row(**kwargs, feature_list=feature_list)
+
+    results.append(measure("build_feature_row", feature_row, 1, min_seconds))
+    results.append(measure("encode_row", lambda: encoder.encode_row(**kwargs), 1, min_seconds))
+    results.append(measure("predict_ensemble_from_row", lambda: predict_ensemble_from_row(row, ens=ens), 1, min_seconds))
+
+    for size in sizes:
+        records = normalize_records(synthetic_records(size, seed=size))
+        X = encoder.encode(records)
+        results.append(measure("encode_batch", lambda: encoder.encode(records), size, min_seconds))
+        for name in MEMBERS:
+            fn = lambda name=name: ens[name].predict_proba(X)
+            results.append(measure(f"{name}.predict_proba", fn, size, min_seconds))
+        results.append(measure("score_batch", lambda: score_batch(records, ens=ens), size, min_seconds))
+
+    if cold_repeats:
+        results.append(cold_start(model_path, cold_repeats))
+    return results
+
+
+def compare(results, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["name"], r["batch_size"]): r for r in json.load(f)["results"]}
+    lines = []
+    for r in results:
+        old = baseline.get((r["name"], r["batch_size"]))
+        if old is None:
+            continue
+        ratio = r["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("nan")
+        lines.append(
+            f"{r['name']:<28} n={r['batch_size']:<7} "
+            f"p50 {old['p50_ms']:10.3f} -> {r['p50_ms']:10.3f} ms  x{ratio:.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark feature building and ensemble inference.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--min-seconds", type=float, default=MIN_SECONDS, help="Time budget per case.")
+    parser.add_argument("--cold-repeats", type=int, default=3, help="Fresh-interpreter loads (0 to skip).")
+    parser.add_argument("--out", default="bench.json")
+    parser.add_argument("--compare", default=None, help="Earlier JSON output to compare against.")
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        if os.path.exists(model_path):
+            ens, source = load_model(model_path), model_path
+        else:
+            ens, source = synthetic_model(), "synthetic"
+            model_path = os.path.join(tmp, "synthetic_model.pkl")
+            with open(model_path, "wb") as f:
+                pickle.dump(ens, f)
+        results = run_suite(ens, sizes, model_path, args.min_seconds, args.cold_repeats)
+
+    report = {
+        "meta": {
+            "created_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+            "model": source,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for r in results:
+        print(
+            f"{r['name']:<28} n={r['batch_size']:<7} "
+            f"p50 {r['p50_ms']:10.3f}  p95 {r['p95_ms']:10.3f}  p99 {r['p99_ms']:10.3f} ms"
+        )
+    if args.compare:
+        print(compare(results, args.compare))
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""Threshold calibration and evaluation from labelled history.
+
+    python calibration.py scores.csv --label Lightning               # cached hindcast scores
+    python calibration.py lis_mts_2017_2022.csv --label Lightning --score
+    python calibration.py scores.parquet --label Lightning --objective recall --min-recall 0.9
+
+Scores are binned as they stream in: every (district, season) group keeps
+a fixed number of score bins per class, so memory does not grow with the
+number of rows and the ROC/PR curves, reliability curve and confusion
+counts are all derived from the bin counts afterwards. The input is either
+hindcast.py output run with --keep <label> (date, district, probability and
+the label) or, with --score, raw labelled weather that is encoded and scored
+chunk by chunk on the way through.
+
+Thresholds are recommended per district, per season and per district-season
+wherever the group has enough positives, and the risk-label cut points are
+re-derived from the reliability curve. The report is written as JSON next to
+the accumulated histogram (.npz), which can be merged with later runs.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from forecast import (
+    DISTRICTS,
+    RISK_CUTS,
+    SEASONS,
+    compute_season,
+    get_calendar,
+    get_encoder,
+    get_model,
+    normalize_records,
+    predict_ensemble_proba,
+)
+from hindcast import DEFAULT_CHUNKSIZE, RENAMES, RollingCarry, normalize_dates, read_chunks
+
+CALIBRATION_PATH = "calibration.json"
+N_BINS = 1000
+RELIABILITY_BINS = 20
+OBJECTIVES = ("f1", "youden", "recall")
+# groups with fewer positives fall back to the next broader recommendation
+MIN_POSITIVES = 30
+
+# ================== HISTOGRAM ==================
+class ScoreHistogram:
+    # counts[group, label, bin] and prob_sum[group, bin] for the groups
+    # district x season (group = district index * len(SEASONS) + season).
+    # Bin k covers scores in [k / n_bins, (k + 1) / n_bins); a score of 1.0
+    # goes in the last bin.
+
+    def __init__(self, n_bins: int = N_BINS):
+        self.n_bins = n_bins
+        self.n_groups = len(DISTRICTS) * len(SEASONS)
+        self.counts = np.zeros((self.n_groups, 2, n_bins), dtype=np.int64)
+        self.prob_sum = np.zeros((self.n_groups, n_bins), dtype=np.float64)
+
+    @property
+    def rows(self):
+        return int(self.counts.sum())
+
+    def add(self, prob, y, district_idx, season_idx):
+        prob = np.asarray(prob, dtype=np.float64)
+        y = (np.asarray(y) > 0).astype(np.intp)
+        bins = np.minimum((np.clip(prob, 0.0, 1.0) * self.n_bins).astype(np.intp), self.n_bins - 1)
+        group = np.asarray(district_idx, dtype=np.intp) * len(SEASONS) + np.asarray(season_idx, dtype=np.intp)
+        cell = group * self.n_bins + bins
+        self.counts += np.bincount(
+            (group * 2 + y) * self.n_bins + bins, minlength=self.counts.size
+        ).reshape(self.counts.shape)
+        self.prob_sum += np.bincount(cell, weights=prob, minlength=self.prob_sum.size).reshape(self.prob_sum.shape)
+
+    def add_frame(self, df: pd.DataFrame, label: str):
+        # df: date, district, probability and the label column
+        district_idx = pd.Categorical(df["district"], categories=DISTRICTS).codes
+        if (district_idx < 0).any():
+            unknown = sorted(set(df["district"][district_idx < 0].astype(str)))
+            raise ValueError(f"Unknown districts: {', '.join(unknown)}")
+        _, season_idx = get_calendar().lookup_many(pd.to_datetime(df["date"]).to_numpy())
+        self.add(df["probability"].to_numpy(), df[label].to_numpy(), district_idx, season_idx)
+
+    def merge(self, other):
+        if other.n_bins != self.n_bins:
+            raise ValueError("Cannot merge histograms with different bin counts.")
+        self.counts += other.counts
+        self.prob_sum += other.prob_sum
+        return self
+
+    def select(self, district: str = None, season: str = None):
+        # (counts (2, n_bins), prob_sum (n_bins)) summed over the matching groups
+        counts = self.counts.reshape(len(DISTRICTS), len(SEASONS), 2, self.n_bins)
+        prob_sum = self.prob_sum.reshape(len(DISTRICTS), len(SEASONS), self.n_bins)
+        if district is not None:
+            i = DISTRICTS.index(district)
+            counts, prob_sum = counts[i : i + 1], prob_sum[i : i + 1]
+        if season is not None:
+            j = SEASONS.index(season)
+            counts, prob_sum = counts[:, j : j + 1], prob_sum[:, j : j + 1]
+        return counts.sum(axis=(0, 1)), prob_sum.sum(axis=(0, 1))
+
+    def save(self, path: str):
+        np.savez_compressed(path, counts=self.counts, prob_sum=self.prob_sum)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            hist = cls(data["counts"].shape[-1])
+            hist.counts[:] = data["counts"]
+            hist.prob_sum[:] = data["prob_sum"]
+        return hist
+
+# ================== CURVES ==================
+def confusion_curve(counts):
+    # TP/FP/FN/TN when predicting 1 for score >= k / n_bins, k = 0..n_bins
+    neg, pos = counts[0], counts[1]
+    tp = np.concatenate([np.cumsum(pos[::-1])[::-1], [0]])
+    fp = np.concatenate([np.cumsum(neg[::-1])[::-1], [0]])
+    return tp, fp, pos.sum() - tp, neg.sum() - fp
+
+
+def curve_metrics(counts):
+    tp, fp, fn, tn = confusion_curve(counts)
+    n_pos, n_neg = tp[0], fp[0]
+    if n_pos == 0 or n_neg == 0:
+        return {"rows": int(n_pos + n_neg), "positives": int(n_pos), "roc_auc": None, "average_precision": None}
+    tpr, fpr = tp / n_pos, fp / n_neg
+    # rows within one bin are tied, which the trapezoid handles exactly
+    auc = float(np.sum((fpr[:-1] - fpr[1:]) * (tpr[:-1] + tpr[1:]) / 2.0))
+    predicted = tp + fp
+    precision = np.divide(tp, predicted, out=np.ones(len(tp)), where=predicted > 0)
+    ap = float(np.sum((tpr[:-1] - tpr[1:]) * precision[:-1]))
+    return {"rows": int(n_pos + n_neg), "positives": int(n_pos), "roc_auc": auc, "average_precision": ap}
+
+
+def reliability(counts, prob_sum, n_out: int = RELIABILITY_BINS):
+    # the fine bins merged into n_out equal-width bins
+    n_bins = counts.shape[1]
+    if n_bins % n_out:
+        raise ValueError(f"{n_bins} bins cannot be merged into {n_out}.")
+    total = counts.sum(axis=0).reshape(n_out, -1).sum(axis=1)
+    pos = counts[1].reshape(n_out, -1).sum(axis=1)
+    mean_prob = np.divide(prob_sum.reshape(n_out, -1).sum(axis=1), total, out=np.full(n_out, np.nan), where=total > 0)
+    observed = np.divide(pos, total, out=np.full(n_out, np.nan), where=total > 0)
+    ece = float(np.nansum(np.abs(mean_prob - observed) * total) / max(total.sum(), 1))
+    edges = np.arange(n_out + 1) / n_out
+    curve = [
+        {"lo": float(edges[i]), "hi": float(edges[i + 1]), "rows": int(total[i]),
+         "mean_probability": float(mean_prob[i]), "observed_rate": float(observed[i])}
+        for i in range(n_out)
+        if total[i] > 0
+    ]
+    return curve, ece
+
+
+def risk_cuts(counts, levels=RISK_CUTS, n_out: int = RELIABILITY_BINS):
+    # score at which the observed lightning rate first reaches each level;
+    # the rate is made non-decreasing so sparse high bins cannot dip back
+    total = counts.sum(axis=0).reshape(n_out, -1).sum(axis=1)
+    pos = counts[1].reshape(n_out, -1).sum(axis=1)
+    rate = np.maximum.accumulate(np.divide(pos, total, out=np.zeros(n_out), where=total > 0))
+    edges = np.arange(n_out) / n_out
+    cuts = []
+    for level in levels:
+        hit = np.flatnonzero(rate >= level)
+        cuts.append(float(edges[hit[0]]) if len(hit) else None)
+    return cuts
+
+# ================== RECOMMENDATION ==================
+def best_threshold(counts, objective: str = "f1", min_recall: float = 0.9):
+    # (threshold, confusion at it) maximizing the objective over the bin edges
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; choose from {', '.join(OBJECTIVES)}")
+    tp, fp, fn, tn = confusion_curve(counts)
+    n_pos, n_neg = tp[0], fp[0]
+    recall = tp / max(n_pos, 1)
+    if objective == "f1":
+        score = np.divide(2 * tp, 2 * tp + fp + fn, out=np.zeros(len(tp)), where=(2 * tp + fp + fn) > 0)
+    elif objective == "youden":
+        score = recall - fp / max(n_neg, 1)
+    else:
+        # highest precision among the thresholds that keep recall >= min_recall
+        predicted = tp + fp
+        precision = np.divide(tp, predicted, out=np.zeros(len(tp)), where=predicted > 0)
+        score = np.where(recall >= min_recall, precision, -1.0)
+    # ties go to the highest threshold, i.e. the fewest alerts
+    k = len(score) - 1 - int(np.argmax(score[::-1]))
+    t = float(k / (len(tp) - 1))
+    return t, confusion_at(counts, t)
+
+
+def confusion_at(counts, threshold: float):
+    tp, fp, fn, tn = confusion_curve(counts)
+    n_bins = counts.shape[1]
+    k = min(int(np.ceil(threshold * n_bins - 1e-9)), n_bins)
+    return {"threshold": threshold, "tp": int(tp[k]), "fp": int(fp[k]), "fn": int(fn[k]), "tn": int(tn[k])}
+
+
+def recommend(
+    hist: ScoreHistogram,
+    objective: str = "f1",
+    min_recall: float = 0.9,
+    min_positives: int = MIN_POSITIVES,
+    baseline: float = 0.5,
+):
+    counts, prob_sum = hist.select()
+    curve, ece = reliability(counts, prob_sum)
+    overall, _ = best_threshold(counts, objective, min_recall)
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "objective": objective,
+        "min_recall": min_recall if objective == "recall" else None,
+        "min_positives": min_positives,
+        "n_bins": hist.n_bins,
+        "overall": {
+            **curve_metrics(counts),
+            "threshold": overall,
+            "confusion": confusion_at(counts, overall),
+            "baseline_confusion": confusion_at(counts, baseline),
+            "ece": ece,
+            "reliability": curve,
+        },
+        "risk_cuts": {"current": list(RISK_CUTS), "recommended": risk_cuts(counts)},
+        "district": {},
+        "season": {},
+        "district_season": {},
+    }
+
+    def group(counts, fallback):
+        metrics = curve_metrics(counts)
+        enough = metrics["positives"] >= min_positives and metrics["rows"] > metrics["positives"]
+        t = best_threshold(counts, objective, min_recall)[0] if enough else fallback
+        return {
+            **metrics,
+            "threshold": t,
+            "fallback": not enough,
+            "confusion": confusion_at(counts, t),
+            "baseline_confusion": confusion_at(counts, baseline),
+        }
+
+    for season in SEASONS:
+        report["season"][season] = group(hist.select(season=season)[0], overall)
+    for district in DISTRICTS:
+        entry = report["district"][district] = group(hist.select(district=district)[0], overall)
+        report["district_season"][district] = {
+            season: group(hist.select(district, season)[0], entry["threshold"]) for season in SEASONS
+        }
+    return report
+
+# ================== STREAMING ==================
+def accumulate_scores(src: str, label: str, hist: ScoreHistogram = None, chunksize: int = DEFAULT_CHUNKSIZE):
+    # cached scores: hindcast.py output run with --keep <label>
+    hist = hist if hist is not None else ScoreHistogram()
+    columns = ["date", "district", "probability", label]
+    for chunk in read_chunks(src, chunksize, columns=columns):
+        hist.add_frame(chunk, label)
+    return hist
+
+
+def accumulate_labelled(src: str, label: str, hist: ScoreHistogram = None, chunksize: int = DEFAULT_CHUNKSIZE, ens=None):
+    # raw labelled weather, encoded and scored on the way through
+    hist = hist if hist is not None else ScoreHistogram()
+    if ens is None:
+        ens = get_model()
+    encoder = get_encoder(ens["feature_list"])
+    buf = encoder.empty(chunksize)
+    rolling = RollingCarry()
+    for chunk in read_chunks(src, chunksize):
+        chunk = chunk.rename(columns={k: v for k, v in RENAMES.items() if k in chunk and v not in chunk})
+        if label not in chunk:
+            raise ValueError(f"Label column {label!r} not found in {src}")
+        df = normalize_records(rolling.apply(normalize_dates(chunk)))
+        df["probability"] = predict_ensemble_proba(encoder.encode(df, out=buf), ens)
+        hist.add_frame(df, label)
+    return hist
+
+
+def calibrate(
+    src: str,
+    label: str,
+    out: str = CALIBRATION_PATH,
+    score: bool = False,
+    merge: bool = False,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    **kwargs,
+):
+    # kwargs go to recommend()
+    hist_path = os.path.splitext(out)[0] + ".npz"
+    hist = ScoreHistogram.load(hist_path) if merge and os.path.exists(hist_path) else None
+    if score:
+        hist = accumulate_labelled(src, label, hist, chunksize)
+    else:
+        hist = accumulate_scores(src, label, hist, chunksize)
+    report = recommend(hist, **kwargs)
+    report["source"] = os.path.basename(src)
+    hist.save(hist_path)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+# ================== LOOKUP ==================
+_reports = {}
+_reports_lock = threading.Lock()
+
+
+def load_report(path: str = CALIBRATION_PATH):
+    # the parsed report, re-read when the file changes; None if there is none
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _reports_lock:
+        cached = _reports.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding="utf-8") as f:
+                cached = _reports[path] = (mtime, json.load(f))
+        return cached[1]
+
+
+def recommended_threshold(district: str = None, date=None, path: str = CALIBRATION_PATH, default: float = 0.5):
+    # most specific calibrated threshold: district-season, district, season, overall
+    report = load_report(path)
+    if report is None:
+        return default
+    season = compute_season(date.month, date.day) if date is not None else None
+    if district in report["district"]:
+        if season is not None:
+            return report["district_season"][district][season]["threshold"]
+        return report["district"][district]["threshold"]
+    if season is not None:
+        return report["season"][season]["threshold"]
+    return report["overall"]["threshold"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the ensemble on labelled history and recommend thresholds.")
+    parser.add_argument("src", help="Scores (.csv/.parquet from hindcast.py --keep <label>) or, with --score, raw data")
+    parser.add_argument("--label", default="Lightning")
+    parser.add_argument("--score", action="store_true", help="Score raw labelled weather instead of reading scores.")
+    parser.add_argument("--out", default=CALIBRATION_PATH)
+    parser.add_argument("--merge", action="store_true", help="Add to the histogram saved by a previous run.")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="f1")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="For --objective recall.")
+    parser.add_argument("--min-positives", type=int, default=MIN_POSITIVES)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    report = calibrate(
+        args.src,
+        args.label,
+        args.out,
+        score=args.score,
+        merge=args.merge,
+        objective=args.objective,
+        min_recall=args.min_recall,
+        min_positives=args.min_positives,
+        chunksize=args.chunksize,
+    )
+    overall = report["overall"]
+    print(
+        f"{overall['rows']} rows, {overall['positives']} positive; ROC-AUC {overall['roc_auc']}, "
+        f"AP {overall['average_precision']}, ECE {overall['ece']:.4f}"
+    )
+    print(f"Overall threshold ({args.objective}): {overall['threshold']:.3f}")
+    print(f"Risk cuts: current {report['risk_cuts']['current']} -> recommended {report['risk_cuts']['recommended']}")
+    rows = [
+        {"district": d, "threshold": e["threshold"], "positives": e["positives"], "fallback": e["fallback"]}
+        for d, e in report["district"].items()
+    ]
+    print(pd.DataFrame(rows).to_string(index=False))
+    print(f"Wrote {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from forecast import MEMBERS, get_model
+
+PROCESS_MIN_ROWS = 50_000
+
+# ================== PROCESS WORKERS ==================
+_worker_ens = None
+
+
+def _init_worker(ens):
+    global _worker_ens
+    _worker_ens = ens
+
+
+def _member_chunk(name, X):
+    start = time.perf_counter()
+    proba = _worker_ens[name].predict_proba(X)[:, 1]
+    return proba, time.perf_counter() - start
+
+
+# ================== EXECUTOR ==================
+class EnsembleExecutor:
+    # Runs log_pipe, mlp_pipe and gb_pipe concurrently and averages them the
+    # same way predict_ensemble_from_row does.
+    #
+    # mode="thread" uses one thread per member; the NumPy/XGBoost kernels
+    # release the GIL, so the slow gradient-boosting member no longer holds
+    # up the other two. mode="process" additionally splits batches of at
+    # least process_min_rows rows into chunks spread over worker processes;
+    # smaller batches still go through the thread pool.
+    #
+    # Without an `ens` the executor follows get_model() on every call, so a
+    # hot-swapped model is picked up; the worker processes are restarted
+    # when the ensemble they were started with is no longer the one asked for.
+
+    def __init__(
+        self,
+        ens=None,
+        mode: str = "thread",
+        max_workers: int = None,
+        process_min_rows: int = PROCESS_MIN_ROWS,
+    ):
+        if mode not in ("serial", "thread", "process"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self._ens = ens
+        self.mode = mode
+        self.process_min_rows = process_min_rows
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._threads = None
+        self._processes = None
+        self._process_ens = None
+        if mode != "serial":
+            self._threads = ThreadPoolExecutor(max_workers=len(MEMBERS), thread_name_prefix="ensemble")
+
+    @property
+    def ens(self):
+        # the ensemble the next call runs: the one passed in, else the current model
+        return self._ens if self._ens is not None else get_model()
+
+    def close(self):
+        if self._threads is not None:
+            self._threads.shutdown()
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown()
+            self._processes = None
+            self._process_ens = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _timed(ens, name, X):
+        start = time.perf_counter()
+        proba = ens[name].predict_proba(X)[:, 1]
+        return proba, time.perf_counter() - start
+
+    def _run_serial(self, ens, X):
+        return {name: self._timed(ens, name, X) for name in MEMBERS}
+
+    def _run_threads(self, ens, X):
+        futures = {name: self._threads.submit(self._timed, ens, name, X) for name in MEMBERS}
+        return {name: fut.result() for name, fut in futures.items()}
+
+    def _run_processes(self, ens, X):
+        # the workers hold a pickled copy of the ensemble they were started with
+        if self._processes is not None and ens is not self._process_ens:
+            self._processes.shutdown()
+            self._processes = None
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(ens,),
+            )
+            self._process_ens = ens
+        bounds = np.linspace(0, len(X), self.max_workers + 1, dtype=int)
+        futures = {
+            name: [self._processes.submit(_member_chunk, name, X[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+            for name in MEMBERS
+        }
+        results = {}
+        for name, futs in futures.items():
+            parts = [fut.result() for fut in futs]
+            # per-member time is the summed predict_proba wall time of its chunks
+            results[name] = (np.concatenate([p for p, _ in parts]), sum(t for _, t in parts))
+        return results
+
+    def predict_members(self, X, ens=None):
+        # pass the ensemble X was encoded for when it may have been swapped since
+        if ens is None:
+            ens = self.ens
+        if self.mode == "serial":
+            results = self._run_serial(ens, X)
+        elif self.mode == "process" and len(X) >= self.process_min_rows:
+            results = self._run_processes(ens, np.asarray(X))
+        else:
+            results = self._run_threads(ens, X)
+        probas = {name: results[name][0] for name in MEMBERS}
+        timings = {name: results[name][1] for name in MEMBERS}
+        return probas, timings
+
+    def predict_proba(self, X, ens=None):
+        start = time.perf_counter()
+        probas, timings = self.predict_members(X, ens)
+        prob = (probas["log_pipe"] + probas["mlp_pipe"] + probas["gb_pipe"]) / 3.0
+        timings["total"] = time.perf_counter() - start
+        return prob, timings
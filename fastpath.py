@@ -0,0 +1,564 @@
+"""Pure-NumPy fast path for single-record inference.
+
+compile_ensemble() exports each fitted pipeline to plain arrays:
+
+* log_pipe  - scaler folded into the logistic coefficients (one dot product)
+* mlp_pipe  - scaler folded into the first layer, then plain matmuls
+* gb_pipe   - sklearn GradientBoosting or XGBoost trees flattened into node
+              arrays and walked for all trees at once
+
+The compiled ensemble is a drop-in for the model dict, so forecast's
+predict functions work unchanged. Compilation checks parity against the
+original predict_proba on a probe batch and refuses to return a fast path
+that disagrees.
+
+precision="float32" stores the weights and runs the linear/MLP maths in
+float32 (trees keep their float32 split comparisons and store float32 leaves
+and int32 node arrays); precision="int8" additionally quantizes the MLP
+weights per output unit. evaluate() gives the probability/AUC change against
+the float64 baseline; rss_report() measures a fresh process's resident memory
+before and after loading, compiling and clear_model(), and size_report() is a
+quick per-member proxy (pickled size vs compiled array bytes).
+
+    python fastpath.py                                   # float64, report parity
+    python fastpath.py --precision int8 --data labelled.csv --label Lightning
+    python fastpath.py --precision float32 --rss         # also measure process RSS
+"""
+import argparse
+import copy
+import json
+import os
+import pickle
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from forecast import DISTRICTS, MEMBERS, get_encoder, get_model, normalize_records
+
+PARITY_ATOL = 1e-5
+PRECISIONS = ("float64", "float32", "int8")
+# max |p_fast - p_original| accepted by compile_ensemble for each precision
+PRECISION_ATOL = {"float64": PARITY_ATOL, "float32": 1e-4, "int8": 0.05}
+
+
+class FastPathUnsupported(Exception):
+    pass
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _two_column(p):
+    p = np.asarray(p, dtype=np.float64)
+    return np.column_stack([1.0 - p, p])
+
+# ================== PIPELINE UNWRAPPING ==================
+def _split_pipeline(pipe):
+    # returns (mean, scale, final_estimator); mean/scale are None when the
+    # pipeline has no scaler
+    steps = [step for _, step in getattr(pipe, "steps", [("model", pipe)])]
+    transforms, final = steps[:-1], steps[-1]
+    mean = scale = None
+    for step in transforms:
+        if step is None or step == "passthrough":
+            continue
+        if type(step).__name__ != "StandardScaler" or mean is not None:
+            raise FastPathUnsupported(f"Unsupported pipeline step: {type(step).__name__}")
+        n = step.n_features_in_
+        mean = step.mean_ if step.mean_ is not None else np.zeros(n)
+        scale = step.scale_ if step.scale_ is not None else np.ones(n)
+    return mean, scale, final
+
+
+def _fold_scaler(W, b, mean, scale):
+    # (x - mean) / scale @ W + b  ==  x @ (W / scale) + (b - (mean / scale) @ W)
+    if mean is None:
+        return np.array(W, dtype=np.float64), np.array(b, dtype=np.float64)
+    W = np.asarray(W, dtype=np.float64)
+    return W / scale[:, None], np.asarray(b, dtype=np.float64) - (mean / scale) @ W
+
+# ================== LINEAR / MLP ==================
+class FastLogistic:
+    def __init__(self, pipe, dtype=np.float64):
+        mean, scale, clf = _split_pipeline(pipe)
+        if type(clf).__name__ != "LogisticRegression" or clf.coef_.shape[0] != 1:
+            raise FastPathUnsupported("log_pipe must end in a binary LogisticRegression.")
+        W, b = _fold_scaler(clf.coef_.T, clf.intercept_, mean, scale)
+        self.dtype = dtype
+        self.w = np.ascontiguousarray(W[:, 0], dtype=dtype)
+        self.b = float(b[0])
+
+    def predict_proba(self, X):
+        return _two_column(_sigmoid(np.asarray(X, dtype=self.dtype) @ self.w + self.b))
+
+
+ACTIVATIONS = {
+    "relu": lambda z: np.maximum(z, 0.0),
+    "tanh": np.tanh,
+    "logistic": _sigmoid,
+    "identity": lambda z: z,
+}
+
+
+def _quantize_int8(W):
+    # symmetric per-output-unit quantization: W ~= q * scale, q in [-127, 127]
+    scale = np.abs(W).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    return np.round(W / scale).astype(np.int8), scale.astype(np.float32)
+
+
+class FastMLP:
+    def __init__(self, pipe, dtype=np.float64, int8: bool = False):
+        mean, scale, clf = _split_pipeline(pipe)
+        if type(clf).__name__ != "MLPClassifier" or clf.out_activation_ != "logistic":
+            raise FastPathUnsupported("mlp_pipe must end in a binary MLPClassifier.")
+        self.dtype = np.float32 if int8 else dtype
+        self.int8 = int8
+        self.mean = self.scale = None
+        if int8:
+            # folding the scaler would mix raw feature ranges (pressure ~1000,
+            # flags 0/1) into one weight column and wreck the int8 grid, so the
+            # scaler stays a separate float32 step
+            weights = [np.asarray(W, dtype=np.float64) for W in clf.coefs_]
+            biases = [np.asarray(b, dtype=np.float64) for b in clf.intercepts_]
+            if mean is not None:
+                self.mean, self.scale = mean.astype(np.float32), scale.astype(np.float32)
+        else:
+            W0, b0 = _fold_scaler(clf.coefs_[0], clf.intercepts_[0], mean, scale)
+            weights = [W0] + [np.asarray(W, dtype=np.float64) for W in clf.coefs_[1:]]
+            biases = [b0] + [np.asarray(b, dtype=np.float64) for b in clf.intercepts_[1:]]
+        if int8:
+            quantized = [_quantize_int8(W) for W in weights]
+            self.weights = [q for q, _ in quantized]
+            self.scales = [s for _, s in quantized]
+        else:
+            self.weights = [W.astype(dtype) for W in weights]
+            self.scales = None
+        self.biases = [b.astype(self.dtype) for b in biases]
+        self.hidden = ACTIVATIONS[clf.activation]
+
+    def predict_proba(self, X):
+        a = np.asarray(X, dtype=self.dtype)
+        if self.mean is not None:
+            a = (a - self.mean) / self.scale
+        last = len(self.weights) - 1
+        for i, (W, b) in enumerate(zip(self.weights, self.biases)):
+            if self.int8:
+                a = (a @ W.astype(np.float32)) * self.scales[i] + b
+            else:
+                a = a @ W + b
+            if i < last:
+                a = self.hidden(a)
+        return _two_column(_sigmoid(a[:, 0]))
+
+# ================== TREES ==================
+class FastTrees:
+    # All trees packed into one set of node arrays. Leaves point to themselves,
+    # so walking max_depth steps from every root lands every row on a leaf
+    # without per-tree bookkeeping.
+
+    def __init__(self, pipe, probe, dtype=np.float64):
+        mean, scale, clf = _split_pipeline(pipe)
+        self.mean, self.scale = mean, scale
+        self.dtype = dtype
+        name = type(clf).__name__
+        if name == "GradientBoostingClassifier":
+            trees, self.strict = self._from_sklearn(clf), False
+        elif name == "XGBClassifier":
+            trees, self.strict = self._from_xgboost(clf), True
+        else:
+            raise FastPathUnsupported(f"Unsupported gradient boosting member: {name}")
+        self._pack(trees)
+
+        # the constant starting margin (prior / base_score) is whatever the
+        # original model adds on top of the summed leaves
+        probe = probe[:1]
+        if name == "GradientBoostingClassifier":
+            margin = clf.decision_function(self._scaled(probe))
+        else:
+            margin = clf.predict(self._scaled(probe), output_margin=True)
+        self.base = float(np.ravel(margin)[0] - self._leaf_sum(probe)[0])
+
+    @staticmethod
+    def _from_sklearn(clf):
+        if clf.estimators_.shape[1] != 1:
+            raise FastPathUnsupported("Only binary GradientBoostingClassifier is supported.")
+        trees = []
+        for est in clf.estimators_[:, 0]:
+            t = est.tree_
+            trees.append(
+                (t.feature, t.threshold, t.children_left, t.children_right, t.value[:, 0, 0] * clf.learning_rate)
+            )
+        return trees
+
+    @staticmethod
+    def _from_xgboost(clf):
+        model = json.loads(clf.get_booster().save_raw("json"))
+        booster = model["learner"]["gradient_booster"]
+        if booster.get("name") != "gbtree":
+            raise FastPathUnsupported("Only gbtree XGBoost models are supported.")
+        trees = []
+        for tree in booster["model"]["trees"]:
+            left = np.asarray(tree["left_children"])
+            right = np.asarray(tree["right_children"])
+            feature = np.asarray(tree["split_indices"])
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            # xgboost stores the leaf weight in split_conditions
+            value = np.where(left == -1, cond, 0.0)
+            trees.append((feature, cond.astype(np.float64), left, right, value))
+        return trees
+
+    def _pack(self, trees):
+        features, thresholds, lefts, rights, values, roots, depths = [], [], [], [], [], [], []
+        offset = 0
+        for feature, threshold, left, right, value in trees:
+            n = len(feature)
+            idx = np.arange(n) + offset
+            leaf = np.asarray(left) == -1
+            features.append(np.where(leaf, 0, feature))
+            thresholds.append(np.where(leaf, 0.0, threshold))
+            lefts.append(np.where(leaf, idx, np.asarray(left) + offset))
+            rights.append(np.where(leaf, idx, np.asarray(right) + offset))
+            values.append(np.where(leaf, value, 0.0))
+            roots.append(offset)
+            depths.append(self._depth(np.asarray(left), np.asarray(right)))
+            offset += n
+        # reduced precision: split thresholds are float32 in both libraries
+        # anyway, so only leaf values lose bits; node indices fit in int32
+        index = np.intp if self.dtype == np.float64 else np.int32
+        self.feature = np.concatenate(features).astype(index)
+        self.threshold = np.concatenate(thresholds).astype(self.dtype)
+        self.left = np.concatenate(lefts).astype(index)
+        self.right = np.concatenate(rights).astype(index)
+        self.value = np.concatenate(values).astype(self.dtype)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.depth = max(depths)
+
+    @staticmethod
+    def _depth(left, right):
+        depth, frontier = 0, [0]
+        while True:
+            frontier = [c for n in frontier for c in (left[n], right[n]) if c != -1]
+            if not frontier:
+                return depth
+            depth += 1
+
+    def _scaled(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return X if self.mean is None else (X - self.mean) / self.scale
+
+    def _leaf_sum(self, X):
+        # both libraries compare float32 feature values against the split
+        Xs = self._scaled(X).astype(np.float32).astype(self.dtype)
+        node = np.broadcast_to(self.roots, (len(Xs), len(self.roots)))
+        rows = np.arange(len(Xs))[:, None]
+        for _ in range(self.depth):
+            x = Xs[rows, self.feature[node]]
+            t = self.threshold[node]
+            go_left = x < t if self.strict else x <= t
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].sum(axis=1, dtype=np.float64)
+
+    def predict_proba(self, X):
+        return _two_column(_sigmoid(self.base + self._leaf_sum(X)))
+
+    # node arrays written by save() and memory-mapped by load(); mean/scale
+    # only exist when the pipeline had a scaler
+    ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "mean", "scale")
+
+    def save(self, directory: str, prefix: str):
+        # one .npy per array so every worker can np.load(mmap_mode="r") them
+        # and share the pages; returns the manifest entry for load()
+        files = {}
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            if array is None:
+                continue
+            files[name] = f"{prefix}.{name}.npy"
+            np.save(os.path.join(directory, files[name]), np.ascontiguousarray(array))
+        return {"files": files, "base": self.base, "depth": int(self.depth), "strict": self.strict}
+
+    @classmethod
+    def load(cls, directory: str, entry: dict, mmap_mode: str = "r"):
+        self = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            filename = entry["files"].get(name)
+            path = None if filename is None else os.path.join(directory, filename)
+            setattr(self, name, None if path is None else np.load(path, mmap_mode=mmap_mode))
+        self.dtype = self.value.dtype.type
+        self.base, self.depth, self.strict = float(entry["base"]), int(entry["depth"]), bool(entry["strict"])
+        return self
+
+    def astype(self, dtype):
+        # the reduced-precision layout of _pack, from already compiled trees
+        if self.dtype == dtype:
+            return self
+        other = copy.copy(self)
+        index = np.intp if dtype == np.float64 else np.int32
+        for name in ("feature", "left", "right"):
+            setattr(other, name, np.asarray(getattr(self, name)).astype(index))
+        other.threshold = np.asarray(self.threshold).astype(dtype)
+        other.value = np.asarray(self.value).astype(dtype)
+        other.dtype = dtype
+        return other
+
+# ================== ENSEMBLE ==================
+class FastEnsemble(Mapping):
+    # Drop-in for the model dict: forecast.predict_ensemble_from_row and
+    # score_batch accept it as `ens`.
+
+    def __init__(self, members: dict, feature_list, precision: str = "float64", version: str = None):
+        self.members = members
+        self.feature_list = list(feature_list)
+        self.precision = precision
+        self.version = version  # model store version compiled from, if any
+
+    def __getitem__(self, key):
+        if key == "feature_list":
+            return self.feature_list
+        return self.members[key]
+
+    def __iter__(self):
+        yield from MEMBERS
+        yield "feature_list"
+
+    def __len__(self):
+        return len(MEMBERS) + 1
+
+
+def probe_records(n: int, seed: int = 0):
+    # plausible weather for every district over several years; enough to
+    # reach most tree paths and the scaled ranges of the linear members
+    rng = np.random.default_rng(seed)
+    temp = rng.normal(28.0, 5.0, n)
+    rh = rng.uniform(20.0, 100.0, n)
+    pressure = rng.normal(975.0, 6.0, n)
+    rain = rng.exponential(4.0, n)
+    return pd.DataFrame(
+        {
+            "date": pd.Timestamp("2017-01-01") + pd.to_timedelta(rng.integers(0, 6 * 365, n), unit="D"),
+            "district": rng.choice(DISTRICTS, n),
+            "temp_c": temp,
+            "rh": rh,
+            "pressure": pressure,
+            "windspeed": rng.uniform(0.0, 9.0, n),
+            "rain_mm": rain,
+            "rain_3day_sum": rain * rng.uniform(1.0, 3.0, n),
+            "temp_3day_mean": temp + rng.normal(0.0, 1.0, n),
+            "rh_3day_mean": np.clip(rh + rng.normal(0.0, 5.0, n), 0.0, 100.0),
+            "pres_3day_mean": pressure + rng.normal(0.0, 2.0, n),
+        }
+    )
+
+
+def probe_matrix(feature_list, n: int = 256, seed: int = 0):
+    return get_encoder(feature_list).encode(normalize_records(probe_records(n, seed)))
+
+
+def _compile_trees(pipe, probe, dtype):
+    # a model store version may already serve its trees compiled (and
+    # checked against the original at export, see model_store.export_store)
+    if isinstance(pipe, FastTrees):
+        return pipe.astype(dtype)
+    return FastTrees(pipe, probe, dtype)
+
+
+def check_parity(ens, fast, X):
+    # max |p_fast - p_original| for every member
+    return {
+        name: float(np.max(np.abs(fast[name].predict_proba(X)[:, 1] - ens[name].predict_proba(X)[:, 1])))
+        for name in MEMBERS
+    }
+
+
+def compile_ensemble(ens=None, atol: float = None, probe=None, precision: str = "float64"):
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {', '.join(PRECISIONS)}")
+    if ens is None:
+        ens = get_model()
+    if atol is None:
+        atol = PRECISION_ATOL[precision]
+    dtype = np.float64 if precision == "float64" else np.float32
+    feature_list = ens["feature_list"]
+    if probe is None:
+        probe = probe_matrix(feature_list)
+    fast = FastEnsemble(
+        {
+            "log_pipe": FastLogistic(ens["log_pipe"], dtype),
+            "mlp_pipe": FastMLP(ens["mlp_pipe"], dtype, int8=precision == "int8"),
+            "gb_pipe": _compile_trees(ens["gb_pipe"], probe, dtype),
+        },
+        feature_list,
+        precision,
+        getattr(ens, "version", None),
+    )
+    diffs = check_parity(ens, fast, probe)
+    bad = {name: d for name, d in diffs.items() if not d <= atol}
+    if bad:
+        raise FastPathUnsupported(f"Fast path disagrees with predict_proba beyond {atol}: {bad}")
+    fast.parity = diffs
+    return fast
+
+# ================== REPORTING ==================
+def array_bytes(obj):
+    # bytes held in NumPy arrays reachable from a compiled member
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (list, tuple)):
+        return sum(array_bytes(o) for o in obj)
+    if hasattr(obj, "__dict__"):
+        return sum(array_bytes(v) for v in vars(obj).values())
+    return 0
+
+
+def size_report(ens, fast):
+    # Proxy only: the pickled member against the bytes in its compiled
+    # arrays. Neither is what a process keeps resident (interpreter objects,
+    # allocator slack and shared mmaps are not counted); see rss_report.
+    report = {}
+    for name in MEMBERS:
+        original = len(pickle.dumps(ens[name], protocol=pickle.HIGHEST_PROTOCOL))
+        report[name] = {"original_bytes": original, "compiled_bytes": array_bytes(fast[name])}
+    report["total"] = {
+        key: sum(report[name][key] for name in MEMBERS) for key in ("original_bytes", "compiled_bytes")
+    }
+    return report
+
+
+def _rss():
+    # current resident set size in bytes (psutil when installed, else
+    # /proc); None where neither is available
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _rss_stages(path: str = None, precision: str = "float64"):
+    # runs in the fresh interpreter started by rss_report
+    import gc
+    import importlib
+
+    from forecast import clear_model, load_model
+
+    # import what unpickling would, so "loaded" counts the model and not
+    # the libraries (sklearn alone is ~100 MiB of RSS)
+    for module in ("sklearn.ensemble", "sklearn.linear_model", "sklearn.neural_network", "sklearn.pipeline", "xgboost"):
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    rss = {"start": _rss()}
+    ens = load_model(path) if path else get_model()
+    probe = probe_matrix(ens["feature_list"], n=64)
+    for name in MEMBERS:
+        ens[name].predict_proba(probe)  # store members are only read on first use
+    rss["loaded"] = _rss()
+    fast = compile_ensemble(ens, probe=probe, precision=precision)
+    rss["compiled"] = _rss()
+    del ens
+    clear_model()
+    gc.collect()
+    for name in MEMBERS:
+        fast[name].predict_proba(probe)
+    rss["cleared"] = _rss()
+    return rss
+
+
+def rss_report(path: str = None, precision: str = "float64"):
+    # Resident memory of a fresh process at each stage of what service.py
+    # does with --precision: start (libraries imported), loaded (every member
+    # used once), compiled, and cleared (sklearn ensemble dropped). path is
+    # a pickled ensemble; None uses get_model(). Memory the allocator keeps
+    # after clear_model() still counts, as it does for the real worker.
+    import subprocess
+    import sys
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    path = os.path.abspath(path) if path else None
+    code = f"import json, fastpath; print(json.dumps(fastpath._rss_stages({path!r}, {precision!r})))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    if out.returncode != 0:
+        raise RuntimeError(f"RSS probe failed: {out.stderr.strip().splitlines()[-1:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def evaluate(ens, fast, X, y=None, threshold: float = 0.5):
+    # ensemble-level change against the float64 sklearn baseline
+    base = sum(ens[name].predict_proba(X)[:, 1] for name in MEMBERS) / len(MEMBERS)
+    reduced = sum(fast[name].predict_proba(X)[:, 1] for name in MEMBERS) / len(MEMBERS)
+    result = {
+        "rows": int(len(X)),
+        "max_abs_diff": float(np.max(np.abs(reduced - base))),
+        "decision_agreement": float(np.mean((base >= threshold) == (reduced >= threshold))),
+    }
+    if y is not None:
+        from sklearn.metrics import roc_auc_score
+
+        y = np.asarray(y)
+        result["auc_base"] = float(roc_auc_score(y, base))
+        result["auc_fast"] = float(roc_auc_score(y, reduced))
+        result["auc_delta"] = result["auc_fast"] - result["auc_base"]
+        result["accuracy_delta"] = float(np.mean((reduced >= threshold) == y) - np.mean((base >= threshold) == y))
+    return result
+
+
+def labelled_matrix(path: str, label: str, feature_list, rows: int = None):
+    from hindcast import RENAMES, RollingCarry, normalize_dates
+
+    df = pd.read_csv(path, nrows=rows)
+    df = df.rename(columns={k: v for k, v in RENAMES.items() if k in df and v not in df})
+    y = df[label].to_numpy()
+    X = get_encoder(feature_list).encode(normalize_records(RollingCarry().apply(normalize_dates(df))))
+    return X, y
+
+
+def main(argv=None):
+    import time
+
+    parser = argparse.ArgumentParser(description="Compile the ensemble to the pure-NumPy fast path.")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float64")
+    parser.add_argument("--data", default=None, help="Labelled CSV to measure the AUC change on.")
+    parser.add_argument("--label", default="Lightning", help="Label column in --data.")
+    parser.add_argument("--rows", type=int, default=None, help="Read only the first N rows of --data.")
+    parser.add_argument("--rss", action="store_true", help="Measure resident memory in a fresh process.")
+    args = parser.parse_args(argv)
+
+    ens = get_model()
+    fast = compile_ensemble(ens, precision=args.precision)
+    X = probe_matrix(ens["feature_list"], n=1, seed=7)
+    for name in MEMBERS:
+        timings = []
+        for model in (ens[name], fast[name]):
+            start = time.perf_counter()
+            for _ in range(200):
+                model.predict_proba(X)
+            timings.append((time.perf_counter() - start) / 200 * 1e6)
+        print(f"{name:<9} max|diff| {fast.parity[name]:.2e}  {timings[0]:9.1f} us -> {timings[1]:7.1f} us per row")
+
+    print("size proxy (pickled member -> compiled arrays):")
+    for name, sizes in size_report(ens, fast).items():
+        print(f"{name:<9} {sizes['original_bytes'] / 1024:9.1f} KiB -> {sizes['compiled_bytes'] / 1024:9.1f} KiB")
+    if args.rss:
+        rss = rss_report(precision=args.precision)
+        print("process RSS: " + ", ".join(f"{stage} {v / 2**20:.1f} MiB" for stage, v in rss.items() if v is not None))
+
+    if args.data:
+        X, y = labelled_matrix(args.data, args.label, ens["feature_list"], args.rows)
+    else:
+        X, y = probe_matrix(ens["feature_list"], n=10_000, seed=11), None
+    print(json.dumps(evaluate(ens, fast, X, y), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Synthetic records and ensemble with the real feature layout.
+
+Used by bench.py and the tests, so they run offline without
+lightning_ensemble_model.pkl.
+"""
+import numpy as np
+import pandas as pd
+
+from fastpath import probe_records
+from forecast import FEATURE_COLUMNS, get_encoder, normalize_records
+
+
+def synthetic_records(n: int, seed: int = 0):
+    # the same plausible weather the fast path probes parity with
+    return probe_records(n, seed)
+
+
+def synthetic_model(n: int = 4000, seed: int = 0):
+    # same members and feature_list layout as the real artifact; only the
+    # fitted weights are made up
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    records = synthetic_records(n, seed)
+    X = pd.DataFrame(get_encoder(FEATURE_COLUMNS).encode(normalize_records(records)), columns=FEATURE_COLUMNS)
+    rng = np.random.default_rng(seed)
+    score = 0.08 * (X["Rh"] - 70) + 0.3 * (X["Rain_3day_sum"] - 8) - 0.5 * X["Pressure_Drop"] + 1.5 * X["IsMonsoon"]
+    y = (score + rng.normal(0.0, 1.5, n) > 1.0).astype(int)
+
+    return {
+        "log_pipe": Pipeline([("scaler", StandardScaler()), ("clf", LogisticRegression(max_iter=1000))]).fit(X, y),
+        "mlp_pipe": Pipeline(
+            [("scaler", StandardScaler()), ("clf", MLPClassifier((64, 32), max_iter=200, random_state=seed))]
+        ).fit(X, y),
+        "gb_pipe": Pipeline([("clf", GradientBoostingClassifier(n_estimators=100, random_state=seed))]).fit(X, y),
+        "feature_list": list(FEATURE_COLUMNS),
+    }
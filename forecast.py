@@ -0,0 +1,758 @@
+import collections
+import datetime as dt
+import os
+import pickle
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from metrics import CACHE, MEMBER_LATENCY, PREDICTIONS, timed
+
+MODEL_PATH = "lightning_ensemble_model.pkl"
+MEMBERS = ("log_pipe", "mlp_pipe", "gb_pipe")
+
+# ================== CONSTANTS ==================
+DISTRICTS = [
+    "Bokaro",
+    "Chatra",
+    "Deoghar",
+    "Dhanbad",
+    "Dumka",
+    "Garhwa",
+    "Giridih",
+    "Godda",
+    "Gumla",
+    "Hazaribagh",
+    "Jamtara",
+    "Khunti",
+    "Koderma",
+    "Latehar",
+    "Lohardaga",
+    "Pakur",
+    "Palamu",
+    "Ramgarh",
+    "Ranchi",
+    "Sahibganj",
+    "Simdega",
+    "West Singhbhum",
+]
+
+DISTRICT_COORDS = {
+    "Bokaro": (23.78, 86.20),
+    "Chatra": (24.21, 84.87),
+    "Deoghar": (24.48, 86.71),
+    "Dhanbad": (23.80, 86.45),
+    "Dumka": (24.27, 87.25),
+    "Garhwa": (24.17, 83.80),
+    "Giridih": (24.18, 86.30),
+    "Godda": (24.83, 87.22),
+    "Gumla": (23.04, 84.55),
+    "Hazaribagh": (23.98, 85.36),
+    "Jamtara": (23.95, 86.80),
+    "Khunti": (23.08, 85.28),
+    "Koderma": (24.47, 85.60),
+    "Latehar": (23.75, 84.50),
+    "Lohardaga": (23.43, 84.68),
+    "Pakur": (24.64, 87.85),
+    "Palamu": (24.07, 84.08),
+    "Ramgarh": (23.64, 85.52),
+    "Ranchi": (23.36, 85.33),
+    "Sahibganj": (25.25, 87.65),
+    "Simdega": (22.62, 84.50),
+    "West Singhbhum": (22.57, 85.82),
+}
+
+SEASONS = ["Monsoon", "PreMonsoon", "PostMonsoon", "Summer", "Winter"]
+
+# district-day dates are Indian Standard Time days everywhere: observation
+# day buckets, horizon dates and the scheduler's published day
+IST = dt.timezone(dt.timedelta(hours=5, minutes=30))
+
+
+def today_ist():
+    return dt.datetime.now(IST).date()
+
+# the pipelines were fitted on DataFrames; the encoder feeds them plain arrays
+# laid out in feature_list order, so the column-name check is redundant
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# column order produced by build_feature_row before reindexing
+FEATURE_COLUMNS = (
+    [
+        "Month_No",
+        "Day",
+        "Latitude",
+        "Longitude",
+        "Pressure_hPa",
+        "Rh",
+        "Rain_mm",
+        "Temp_C",
+        "WindSpeed",
+        "DayOfYear",
+        "WeekOfYear",
+        "IsMonsoon",
+        "THI",
+        "Temp_3day_mean",
+        "Rh_3day_mean",
+        "Rain_3day_sum",
+        "Pres_3day_mean",
+        "Pressure_Drop",
+    ]
+    + [f"Dist_{d}" for d in DISTRICTS]
+    + [f"Season_{s}" for s in SEASONS]
+)
+
+RISK_CUTS = [0.3, 0.6, 0.8]
+RISK_LABELS = ["Low", "Moderate", "High", "Very High"]
+
+# ================== MODEL ==================
+_model = None
+_host = None
+# bumped by every load and clear, so caches can tell ensembles apart even
+# when they carry no version of their own
+_loads = 0
+
+
+@timed("load_model")
+def load_model(path: str = MODEL_PATH):
+    with open(path, "rb") as f:
+        ens = pickle.load(f)
+    return ens
+
+
+def get_model():
+    # one ensemble per process, shared by the UI and headless callers; an
+    # exported model store is preferred because it loads members lazily and
+    # follows hot-swaps of model_store/CURRENT (see model_store.ModelHost).
+    # Take the result once per prediction rather than holding on to it.
+    global _model, _host, _loads
+    if _host is not None:
+        return _host.current()
+    if _model is None:
+        import model_store
+
+        _loads += 1
+        if os.path.exists(os.path.join(model_store.STORE_DIR, model_store.CURRENT)):
+            _host = model_store.ModelHost()
+            return _host.current()
+        _model = load_model()
+    return _model
+
+
+def clear_model():
+    # drop the process-wide ensemble, e.g. once a compiled fast path has
+    # replaced it; the next get_model() loads it again
+    global _model, _host, _loads
+    _model = None
+    _host = None
+    _loads += 1
+
+# ================== FEATURE HELPERS ==================
+def compute_season(month: int, day: int):
+    if month in [12, 1, 2]:
+        return "Winter"
+    elif month == 3:
+        return "Summer"
+    elif month in [4, 5]:
+        return "PreMonsoon"
+    elif month in [6, 7, 8, 9]:
+        return "Monsoon"
+    else:
+        return "PostMonsoon"
+
+
+def compute_thi(temp_c: float, rh: float):
+    return temp_c - ((0.55 - 0.0055 * rh) * (temp_c - 14.5))
+
+
+def resolve_rolling(
+    district: str,
+    temp_c: float,
+    rh: float,
+    pressure: float,
+    rain_mm: float,
+    rain_3day_sum: float = None,
+    temp_3day_mean: float = None,
+    rh_3day_mean: float = None,
+    pres_3day_mean: float = None,
+    pressure_drop: float = None,
+    date: dt.date = None,
+):
+    # 3-day aggregates that were not passed in come from the observation
+    # store (the days before `date` plus today's values), or fall back to
+    # today's values when the store has no observations leading up to `date`
+    given = (rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean)
+    if None in given:
+        from observations import get_observation_store
+
+        if date is None:
+            date = today_ist()
+        agg = get_observation_store().rolling(district, date, temp_c, rh, pressure, rain_mm) or {}
+        rain_3day_sum = rain_3day_sum if rain_3day_sum is not None else agg.get("rain_3day_sum", rain_mm)
+        temp_3day_mean = temp_3day_mean if temp_3day_mean is not None else agg.get("temp_3day_mean", temp_c)
+        rh_3day_mean = rh_3day_mean if rh_3day_mean is not None else agg.get("rh_3day_mean", rh)
+        pres_3day_mean = pres_3day_mean if pres_3day_mean is not None else agg.get("pres_3day_mean", pressure)
+    if pressure_drop is None:
+        pressure_drop = pressure - pres_3day_mean
+    return rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean, pressure_drop
+
+
+@timed("build_feature_row")
+def build_feature_row(
+    date: dt.date,
+    district: str,
+    lat: float,
+    lon: float,
+    temp_c: float,
+    rh: float,
+    pressure: float,
+    windspeed: float,
+    rain_mm: float,
+    rain_3day_sum: float = None,
+    temp_3day_mean: float = None,
+    rh_3day_mean: float = None,
+    pres_3day_mean: float = None,
+    pressure_drop: float = None,
+    feature_list=None,
+):
+    if feature_list is None:
+        feature_list = get_model()["feature_list"]
+    rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean, pressure_drop = resolve_rolling(
+        district, temp_c, rh, pressure, rain_mm,
+        rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean, pressure_drop, date,
+    )
+
+    month_no = date.month
+    day = date.day
+    day_of_year = date.timetuple().tm_yday
+    week_of_year = date.isocalendar().week
+    season = compute_season(month_no, day)
+    is_monsoon = 1 if season == "Monsoon" else 0
+    thi = compute_thi(temp_c, rh)
+
+    feats = {
+        "Month_No": month_no,
+        "Day": day,
+        "Latitude": lat,
+        "Longitude": lon,
+        "Pressure_hPa": pressure,
+        "Rh": rh,
+        "Rain_mm": rain_mm,
+        "Temp_C": temp_c,
+        "WindSpeed": windspeed,
+        "DayOfYear": day_of_year,
+        "WeekOfYear": week_of_year,
+        "IsMonsoon": is_monsoon,
+        "THI": thi,
+        "Temp_3day_mean": temp_3day_mean,
+        "Rh_3day_mean": rh_3day_mean,
+        "Rain_3day_sum": rain_3day_sum,
+        "Pres_3day_mean": pres_3day_mean,
+        "Pressure_Drop": pressure_drop,
+    }
+
+    for d in DISTRICTS:
+        feats[f"Dist_{d}"] = 1 if d == district else 0
+
+    feats["Season_Monsoon"] = 1 if season == "Monsoon" else 0
+    feats["Season_PreMonsoon"] = 1 if season == "PreMonsoon" else 0
+    feats["Season_PostMonsoon"] = 1 if season == "PostMonsoon" else 0
+    feats["Season_Summer"] = 1 if season == "Summer" else 0
+    feats["Season_Winter"] = 1 if season == "Winter" else 0
+
+    row = pd.DataFrame([feats])
+    row = row.reindex(columns=feature_list, fill_value=0)
+    return row
+
+# ================== BATCH FEATURES ==================
+# 3-day aggregate -> the today's-value input it falls back to
+ROLLING_SOURCES = {
+    "rain_3day_sum": "rain_mm",
+    "temp_3day_mean": "temp_c",
+    "rh_3day_mean": "rh",
+    "pres_3day_mean": "pressure",
+}
+
+
+def normalize_records(records):
+    # accepts a DataFrame or an iterable of dicts using the build_feature_row
+    # argument names; weather dicts from OpenWeather use "wind" for windspeed
+    df = records.copy() if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(list(records))
+    if df.empty:
+        raise ValueError("No records to score.")
+    if "wind" in df:
+        df["windspeed"] = df["windspeed"].fillna(df["wind"]) if "windspeed" in df else df["wind"]
+
+    required = ["date", "district", "temp_c", "rh", "pressure", "windspeed", "rain_mm"]
+    missing = [c for c in required if c not in df]
+    if missing:
+        raise ValueError(f"Records are missing fields: {', '.join(missing)}")
+    empty = [c for c in required if df[c].isna().any()]
+    if empty:
+        raise ValueError(f"Records have empty values in: {', '.join(empty)}")
+
+    df["date"] = pd.to_datetime(df["date"])
+    df["district"] = df["district"].astype(str)
+    unknown = sorted(set(df["district"]) - set(DISTRICTS))
+    if unknown:
+        raise ValueError(f"Unknown districts: {', '.join(unknown)}")
+
+    # same fallbacks as build_feature_row: coordinates from the district
+    # centroid and missing 3-day aggregates from the observation store (see
+    # resolve_rolling), then today's values
+    coords = df["district"].map(DISTRICT_COORDS)
+    for col, idx in (("lat", 0), ("lon", 1)):
+        fallback = coords.str[idx]
+        df[col] = df[col].fillna(fallback) if col in df else fallback
+    for col in ROLLING_SOURCES:
+        if col not in df:
+            df[col] = np.nan
+    missing = df[list(ROLLING_SOURCES)].isna().any(axis=1).to_numpy()
+    if missing.any():
+        from observations import get_observation_store
+
+        store = get_observation_store()
+        rows = df.loc[missing, ["district", "date", "temp_c", "rh", "pressure", "rain_mm"]]
+        found = [store.rolling(*row) or {} for row in rows.itertuples(index=False, name=None)]
+        found = pd.DataFrame.from_records(found, index=rows.index, columns=list(ROLLING_SOURCES))
+        for col in ROLLING_SOURCES:
+            df[col] = df[col].fillna(found[col])
+    for col, src in ROLLING_SOURCES.items():
+        df[col] = df[col].fillna(df[src])
+    drop = df["pressure"] - df["pres_3day_mean"]
+    df["pressure_drop"] = df["pressure_drop"].fillna(drop) if "pressure_drop" in df else drop
+    return df.reset_index(drop=True)
+
+
+def season_codes(month):
+    month = np.asarray(month)
+    return np.select(
+        [np.isin(month, [12, 1, 2]), month == 3, np.isin(month, [4, 5]), np.isin(month, [6, 7, 8, 9])],
+        ["Winter", "Summer", "PreMonsoon", "Monsoon"],
+        default="PostMonsoon",
+    )
+
+# ================== CALENDAR TABLE ==================
+CALENDAR_FEATURES = ["Month_No", "Day", "DayOfYear", "WeekOfYear", "IsMonsoon"]
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+
+
+class CalendarTable:
+    # Calendar features for every day of a span of years, computed once with
+    # the same rules as build_feature_row. block[i] holds CALENDAR_FEATURES
+    # for day i of the span and season[i] its index into SEASONS, so encoders
+    # slot a ready-made row instead of doing datetime work per record. The
+    # span grows (rebuilt under a lock) when a date outside it is looked up.
+
+    def __init__(self, first_year: int = 2000, last_year: int = 2040):
+        self._lock = threading.Lock()
+        self._state = self._build(first_year, last_year)
+
+    @staticmethod
+    def _build(first_year: int, last_year: int):
+        days = pd.date_range(f"{first_year}-01-01", f"{last_year}-12-31", freq="D")
+        month = days.month.to_numpy()
+        season = season_codes(month)
+        block = np.column_stack(
+            [
+                month,
+                days.day.to_numpy(),
+                days.dayofyear.to_numpy(),
+                days.isocalendar().week.to_numpy(dtype=np.int64),
+                season == "Monsoon",
+            ]
+        ).astype(np.float64)
+        codes = pd.Categorical(season, categories=SEASONS).codes.astype(np.intp)
+        return dt.date(first_year, 1, 1).toordinal(), first_year, last_year, block, codes
+
+    def _covering(self, first_year: int, last_year: int):
+        state = self._state
+        if state[1] <= first_year and last_year <= state[2]:
+            return state
+        with self._lock:
+            state = self._state
+            if not (state[1] <= first_year and last_year <= state[2]):
+                state = self._state = self._build(min(first_year, state[1]), max(last_year, state[2]))
+            return state
+
+    def lookup(self, date: dt.date):
+        start, first_year, last_year, block, codes = self._state
+        if not first_year <= date.year <= last_year:
+            start, _, _, block, codes = self._covering(date.year, date.year)
+        i = date.toordinal() - start
+        return block[i], codes[i]
+
+    def lookup_many(self, days):
+        # days: datetime64 array (any unit); returns (n, 5) block and season codes
+        ordinals = days.astype("datetime64[D]").astype(np.int64) + _EPOCH_ORDINAL
+        lo, hi = int(ordinals.min()), int(ordinals.max())
+        start, first_year, last_year, block, codes = self._state
+        if lo < start or hi >= start + len(block):
+            start, _, _, block, codes = self._covering(
+                dt.date.fromordinal(lo).year, dt.date.fromordinal(hi).year
+            )
+        i = ordinals - start
+        return block[i], codes[i]
+
+
+_calendar = None
+
+
+def get_calendar():
+    global _calendar
+    if _calendar is None:
+        _calendar = CalendarTable()
+    return _calendar
+
+
+def calendar_block(dates):
+    # ready-to-slot CALENDAR_FEATURES rows for a date or an array of dates
+    if isinstance(dates, dt.date):
+        return get_calendar().lookup(dates)[0]
+    return get_calendar().lookup_many(np.asarray(dates, dtype="datetime64[D]"))[0]
+
+# ================== ARRAY ENCODER ==================
+# build_feature_row argument -> model column, in encode_row's argument order
+NUMERIC_FEATURES = [
+    ("lat", "Latitude"),
+    ("lon", "Longitude"),
+    ("pressure", "Pressure_hPa"),
+    ("rh", "Rh"),
+    ("rain_mm", "Rain_mm"),
+    ("temp_c", "Temp_C"),
+    ("windspeed", "WindSpeed"),
+    ("temp_3day_mean", "Temp_3day_mean"),
+    ("rh_3day_mean", "Rh_3day_mean"),
+    ("rain_3day_sum", "Rain_3day_sum"),
+    ("pres_3day_mean", "Pres_3day_mean"),
+    ("pressure_drop", "Pressure_Drop"),
+]
+
+
+class FeatureEncoder:
+    # Writes build_feature_row's features straight into a float64 array laid
+    # out like feature_list. Columns the model does not use are skipped and
+    # columns nobody writes stay 0, which is what reindex(fill_value=0) does.
+
+    def __init__(self, feature_list):
+        self.feature_list = list(feature_list)
+        self.n_features = len(self.feature_list)
+        self.index = {name: i for i, name in enumerate(self.feature_list)}
+
+        self.numeric = [(k, self.index[col]) for k, (_, col) in enumerate(NUMERIC_FEATURES) if col in self.index]
+        used = [k for k, col in enumerate(CALENDAR_FEATURES) if col in self.index]
+        self.calendar_src = np.array(used, dtype=np.intp)
+        self.calendar_dst = np.array([self.index[CALENDAR_FEATURES[k]] for k in used], dtype=np.intp)
+        self.thi_col = self.index.get("THI", -1)
+        self.district_cols = {d: self.index.get(f"Dist_{d}", -1) for d in DISTRICTS}
+        self.season_cols = np.array([self.index.get(f"Season_{s}", -1) for s in SEASONS], dtype=np.intp)
+
+    def empty(self, n_rows: int = 1):
+        return np.zeros((n_rows, self.n_features), dtype=np.float64)
+
+    @timed("encode_row")
+    def encode_row(
+        self,
+        date: dt.date,
+        district: str,
+        lat: float,
+        lon: float,
+        temp_c: float,
+        rh: float,
+        pressure: float,
+        windspeed: float,
+        rain_mm: float,
+        rain_3day_sum: float = None,
+        temp_3day_mean: float = None,
+        rh_3day_mean: float = None,
+        pres_3day_mean: float = None,
+        pressure_drop: float = None,
+        out=None,
+    ):
+        if None in (rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean, pressure_drop):
+            rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean, pressure_drop = resolve_rolling(
+                district, temp_c, rh, pressure, rain_mm,
+                rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean, pressure_drop, date,
+            )
+        if out is None:
+            out = self.empty(1)
+        else:
+            out.fill(0.0)
+        row = out[0]
+
+        values = (
+            lat,
+            lon,
+            pressure,
+            rh,
+            rain_mm,
+            temp_c,
+            windspeed,
+            temp_3day_mean,
+            rh_3day_mean,
+            rain_3day_sum,
+            pres_3day_mean,
+            pressure_drop,
+        )
+        for k, i in self.numeric:
+            row[i] = values[k]
+
+        block, season = get_calendar().lookup(date)
+        row[self.calendar_dst] = block[self.calendar_src]
+
+        if self.thi_col >= 0:
+            row[self.thi_col] = compute_thi(temp_c, rh)
+        i = self.district_cols.get(district, -1)
+        if i >= 0:
+            row[i] = 1.0
+        i = self.season_cols[season]
+        if i >= 0:
+            row[i] = 1.0
+        return out
+
+    @timed("encode_batch")
+    def encode(self, df: pd.DataFrame, out=None):
+        # df holds one record per row, as returned by normalize_records
+        n = len(df)
+        if out is None:
+            out = self.empty(n)
+        else:
+            out = out[:n]
+            out.fill(0.0)
+
+        for k, i in self.numeric:
+            out[:, i] = df[NUMERIC_FEATURES[k][0]].to_numpy(dtype=np.float64)
+
+        block, season = get_calendar().lookup_many(df["date"].to_numpy())
+        out[:, self.calendar_dst] = block[:, self.calendar_src]
+
+        if self.thi_col >= 0:
+            out[:, self.thi_col] = compute_thi(
+                df["temp_c"].to_numpy(dtype=np.float64), df["rh"].to_numpy(dtype=np.float64)
+            )
+
+        rows = np.arange(n)
+        district_cols = np.array([self.district_cols[d] for d in DISTRICTS])
+        cols = district_cols[pd.Categorical(df["district"], categories=DISTRICTS).codes]
+        hit = cols >= 0
+        out[rows[hit], cols[hit]] = 1.0
+
+        cols = self.season_cols[season]
+        hit = cols >= 0
+        out[rows[hit], cols[hit]] = 1.0
+        return out
+
+
+_encoders = {}
+
+
+def get_encoder(feature_list=None):
+    if feature_list is None:
+        feature_list = get_model()["feature_list"]
+    key = tuple(feature_list)
+    encoder = _encoders.get(key)
+    if encoder is None:
+        encoder = _encoders[key] = FeatureEncoder(feature_list)
+    return encoder
+
+
+def build_feature_matrix(records, feature_list=None):
+    encoder = get_encoder(feature_list)
+    X = encoder.encode(normalize_records(records))
+    return pd.DataFrame(X, columns=encoder.feature_list)
+
+# ================== ENSEMBLE ==================
+def predict_member_probas(X, ens=None):
+    if ens is None:
+        ens = get_model()
+    probas = {}
+    for name in MEMBERS:
+        with MEMBER_LATENCY.time(name):
+            probas[name] = ens[name].predict_proba(X)[:, 1]
+    return probas
+
+
+def predict_ensemble_proba(X, ens=None):
+    probas = predict_member_probas(X, ens)
+    return (probas["log_pipe"] + probas["mlp_pipe"] + probas["gb_pipe"]) / 3.0
+
+
+def predict_ensemble_from_row(row: pd.DataFrame, threshold: float = 0.5, ens=None):
+    prob = predict_ensemble_proba(row, ens)
+    pred = int(prob[0] >= threshold)
+    PREDICTIONS.inc(risk_label(prob[0]))
+    return pred, float(prob[0])
+
+
+def score_batch(records, threshold: float = 0.5, ens=None, executor=None):
+    # one feature matrix and one predict_proba per member for the whole batch;
+    # pass an ensemble.EnsembleExecutor to run the members concurrently
+    if ens is None:
+        ens = executor.ens if executor is not None else get_model()
+    df = normalize_records(records)
+    X = get_encoder(ens["feature_list"]).encode(df)
+    if executor is not None:
+        prob, _ = executor.predict_proba(X, ens)
+    else:
+        prob = predict_ensemble_proba(X, ens)
+
+    out = pd.DataFrame({"date": df["date"].dt.date, "district": df["district"]})
+    out["probability"] = prob
+    out["prediction"] = (prob >= threshold).astype(int)
+    out["risk"] = risk_labels(prob)
+    for label, n in zip(*np.unique(out["risk"].to_numpy(dtype=str), return_counts=True)):
+        PREDICTIONS.inc(label, amount=int(n))
+    return out
+
+# ================== RISK LABELS ==================
+def risk_label(prob: float):
+    if prob < 0.3:
+        return "Low"
+    elif prob < 0.6:
+        return "Moderate"
+    elif prob < 0.8:
+        return "High"
+    else:
+        return "Very High"
+
+
+def risk_labels(prob):
+    # vectorized risk_label: a value on a cut point falls into the higher band
+    idx = np.searchsorted(RISK_CUTS, np.asarray(prob, dtype=float), side="right")
+    return np.asarray(RISK_LABELS, dtype=object)[idx]
+
+# ================== PREDICTION CACHE ==================
+# rounding applied to each input before it becomes part of the cache key,
+# roughly the resolution of the station / OpenWeather readings
+SENSOR_RESOLUTION = {
+    "lat": 0.01,
+    "lon": 0.01,
+    "temp_c": 0.1,
+    "rh": 1.0,
+    "pressure": 0.1,
+    "windspeed": 0.1,
+    "rain_mm": 0.1,
+    "rain_3day_sum": 0.1,
+    "temp_3day_mean": 0.1,
+    "rh_3day_mean": 1.0,
+    "pres_3day_mean": 0.1,
+    "pressure_drop": 0.1,
+}
+QUANTIZED = [arg for arg, _ in NUMERIC_FEATURES]
+
+
+def quantize(name: str, value: float):
+    step = SENSOR_RESOLUTION[name]
+    return round(round(float(value) / step) * step, 6)
+
+
+class PredictionCache:
+    # Bounded LRU of ensemble probabilities keyed on (model version, date,
+    # district, inputs rounded to SENSOR_RESOLUTION). Misses are scored on
+    # the rounded inputs, so a cached answer does not depend on which caller
+    # filled it. Entries of an older model are dropped as soon as a
+    # different version is seen: the load counter for the process-wide
+    # pickled ensemble, else the ensemble's own version (a model store's).
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._version = None
+        self._owner = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def predict(
+        self,
+        date: dt.date,
+        district: str,
+        lat: float,
+        lon: float,
+        temp_c: float,
+        rh: float,
+        pressure: float,
+        windspeed: float,
+        rain_mm: float,
+        rain_3day_sum: float = None,
+        temp_3day_mean: float = None,
+        rh_3day_mean: float = None,
+        pres_3day_mean: float = None,
+        pressure_drop: float = None,
+        threshold: float = 0.5,
+        ens=None,
+    ):
+        # same result as encode_row + predict_ensemble_from_row on the rounded inputs
+        if ens is None:
+            ens = get_model()
+        version = (_loads if ens is _model else None, getattr(ens, "version", None))
+        rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean, pressure_drop = resolve_rolling(
+            district, temp_c, rh, pressure, rain_mm,
+            rain_3day_sum, temp_3day_mean, rh_3day_mean, pres_3day_mean, pressure_drop, date,
+        )
+        values = {
+            "lat": lat,
+            "lon": lon,
+            "temp_c": temp_c,
+            "rh": rh,
+            "pressure": pressure,
+            "windspeed": windspeed,
+            "rain_mm": rain_mm,
+            "rain_3day_sum": rain_3day_sum,
+            "temp_3day_mean": temp_3day_mean,
+            "rh_3day_mean": rh_3day_mean,
+            "pres_3day_mean": pres_3day_mean,
+            "pressure_drop": pressure_drop,
+        }
+        values = {name: quantize(name, values[name]) for name in QUANTIZED}
+        key = (version, date, district) + tuple(values[name] for name in QUANTIZED)
+        # an ensemble without a version (a compiled pickle, say) is told
+        # apart by identity; the cache holds it, so its id cannot be reused
+        owner = ens if version[1] is None else None
+
+        with self._lock:
+            if version != self._version or owner is not self._owner:
+                if self._data:
+                    self.stats["invalidations"] += 1
+                self._data.clear()
+                self._version, self._owner = version, owner
+            prob = self._data.get(key)
+            if prob is not None:
+                self._data.move_to_end(key)
+                self.stats["hits"] += 1
+        if prob is None:
+            CACHE.inc("prediction", "miss")
+            row = get_encoder(ens["feature_list"]).encode_row(date=date, district=district, **values)
+            prob = float(predict_ensemble_proba(row, ens)[0])
+            with self._lock:
+                self.stats["misses"] += 1
+                if version == self._version and owner is self._owner:
+                    self._data[key] = prob
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+        else:
+            CACHE.inc("prediction", "hit")
+        PREDICTIONS.inc(risk_label(prob))
+        return int(prob >= threshold), prob
+
+
+_prediction_cache = None
+
+
+def get_prediction_cache():
+    global _prediction_cache
+    if _prediction_cache is None:
+        _prediction_cache = PredictionCache()
+    return _prediction_cache
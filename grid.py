@@ -0,0 +1,212 @@
+"""Gridded risk map over Jharkhand.
+
+Scores a regular lat/lon mesh covering the state instead of the 22 district
+centroids. Every cell is assigned its nearest district centroid (the index
+is built once per grid and cached), takes that district's weather unless
+per-cell weather is supplied, and is scored in fixed-size chunks through
+the vectorized encoder.
+
+    python grid.py --resolution 0.05 --out risk_grid     # risk_grid.npy + risk_grid.json
+"""
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from forecast import (
+    DISTRICT_COORDS,
+    DISTRICTS,
+    get_encoder,
+    get_model,
+    normalize_records,
+    predict_ensemble_proba,
+    today_ist,
+)
+
+# (lat_min, lat_max, lon_min, lon_max)
+JHARKHAND_BBOX = (21.95, 25.35, 83.30, 87.95)
+DEFAULT_RESOLUTION = 0.05
+# cells further than this from every centroid are treated as outside the state
+MAX_CENTROID_DISTANCE = 0.75
+CHUNK_CELLS = 50_000
+GRID_CACHE_DIR = ".grid_cache"
+
+# ================== GRID + SPATIAL INDEX ==================
+class Grid:
+    def __init__(self, lat, lon, district_idx, inside, bbox, resolution):
+        self.lat = lat  # (ny,) cell-centre latitudes, south to north
+        self.lon = lon  # (nx,) cell-centre longitudes, west to east
+        self.district_idx = district_idx  # (ny, nx) index into DISTRICTS
+        self.inside = inside  # (ny, nx) bool
+        self.bbox = bbox
+        self.resolution = resolution
+
+    @property
+    def shape(self):
+        return self.district_idx.shape
+
+    def cells(self):
+        # flat (lat, lon, district index) of the cells inside the state
+        lat2, lon2 = np.meshgrid(self.lat, self.lon, indexing="ij")
+        mask = self.inside
+        return lat2[mask], lon2[mask], self.district_idx[mask]
+
+
+def _nearest_centroid(lat2, lon2):
+    centroids = np.array([DISTRICT_COORDS[d] for d in DISTRICTS])
+    # equirectangular distance, good enough at this scale
+    coslat = np.cos(np.deg2rad(centroids[:, 0].mean()))
+    best = np.full(lat2.shape, np.inf)
+    idx = np.zeros(lat2.shape, dtype=np.int16)
+    for i, (clat, clon) in enumerate(centroids):
+        d = np.hypot(lat2 - clat, (lon2 - clon) * coslat)
+        closer = d < best
+        best[closer] = d[closer]
+        idx[closer] = i
+    return idx, best
+
+
+def _index_key(resolution: float, bbox):
+    # hash of everything the nearest-centroid index depends on, so moved
+    # centroids or a different grid spec never reuse a stale cached index
+    spec = {
+        "centroids": [[d, *DISTRICT_COORDS[d]] for d in DISTRICTS],
+        "max_centroid_distance": MAX_CENTROID_DISTANCE,
+        "resolution": round(float(resolution), 6),
+        "bbox": [float(b) for b in bbox],
+    }
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+_grids = {}
+
+
+def build_grid(resolution: float = DEFAULT_RESOLUTION, bbox=JHARKHAND_BBOX, cache_dir: str = GRID_CACHE_DIR):
+    key = _index_key(resolution, bbox)
+    grid = _grids.get(key)
+    if grid is not None:
+        return grid
+
+    lat_min, lat_max, lon_min, lon_max = bbox
+    lat = np.arange(lat_min + resolution / 2, lat_max, resolution)
+    lon = np.arange(lon_min + resolution / 2, lon_max, resolution)
+
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"grid_{resolution:g}_{key}.npz")
+    if path and os.path.exists(path):
+        with np.load(path) as data:
+            district_idx, inside = data["district_idx"], data["inside"]
+    else:
+        lat2, lon2 = np.meshgrid(lat, lon, indexing="ij")
+        district_idx, dist = _nearest_centroid(lat2, lon2)
+        inside = dist <= MAX_CENTROID_DISTANCE
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(path, district_idx=district_idx, inside=inside)
+
+    grid = _grids[key] = Grid(lat, lon, district_idx, inside, tuple(bbox), resolution)
+    return grid
+
+# ================== SCORING ==================
+WEATHER_FIELDS = ["temp_c", "rh", "pressure", "windspeed", "rain_mm"]
+ROLLING_FIELDS = ["rain_3day_sum", "temp_3day_mean", "rh_3day_mean", "pres_3day_mean", "pressure_drop"]
+
+
+def district_weather_table(date: dt.date, weather: dict):
+    # weather: district -> dict with the build_feature_row weather arguments;
+    # normalize_records applies the usual "wind" alias and 3-day fallbacks
+    missing = [d for d in DISTRICTS if d not in weather]
+    if missing:
+        raise ValueError(f"No weather for districts: {', '.join(missing)}")
+    return normalize_records([{**weather[d], "date": date, "district": d} for d in DISTRICTS])
+
+
+def score_grid(
+    date: dt.date,
+    weather: dict,
+    resolution: float = DEFAULT_RESOLUTION,
+    bbox=JHARKHAND_BBOX,
+    ens=None,
+    chunk_cells: int = CHUNK_CELLS,
+    cell_weather=None,
+):
+    # Returns (raster, metadata). raster is float32 (ny, nx), NaN outside
+    # the state. cell_weather, if given, is a callable (lat, lon) -> dict of
+    # arrays overriding the per-district weather for each cell.
+    if ens is None:
+        ens = get_model()
+    grid = build_grid(resolution, bbox)
+    encoder = get_encoder(ens["feature_list"])
+    table = district_weather_table(date, weather)
+    values = {col: table[col].to_numpy(dtype=np.float64) for col in WEATHER_FIELDS + ROLLING_FIELDS}
+
+    lat, lon, didx = grid.cells()
+    prob = np.empty(len(lat), dtype=np.float64)
+    buf = encoder.empty(min(chunk_cells, len(lat)))
+    district_names = np.asarray(DISTRICTS, dtype=object)
+
+    for start in range(0, len(lat), chunk_cells):
+        stop = min(start + chunk_cells, len(lat))
+        idx = didx[start:stop]
+        chunk = {col: v[idx] for col, v in values.items()}
+        if cell_weather is not None:
+            chunk.update(cell_weather(lat[start:stop], lon[start:stop]))
+        df = pd.DataFrame(chunk)
+        df["date"] = pd.Timestamp(date)
+        df["district"] = district_names[idx]
+        df["lat"] = lat[start:stop]
+        df["lon"] = lon[start:stop]
+        X = encoder.encode(df, out=buf)
+        prob[start:stop] = predict_ensemble_proba(X, ens)
+
+    raster = np.full(grid.shape, np.nan, dtype=np.float32)
+    raster[grid.inside] = prob
+    meta = {
+        "date": date.isoformat(),
+        "issued_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "bbox": {"lat_min": bbox[0], "lat_max": bbox[1], "lon_min": bbox[2], "lon_max": bbox[3]},
+        "resolution": resolution,
+        "shape": list(grid.shape),
+        "origin": "lower-left",  # row 0 is the southernmost latitude
+        "cells_scored": int(len(lat)),
+        "model_version": getattr(ens, "version", None),
+    }
+    return raster, meta
+
+
+def district_raster(resolution: float = DEFAULT_RESOLUTION, bbox=JHARKHAND_BBOX):
+    # which district each cell was assigned to (-1 outside the state)
+    grid = build_grid(resolution, bbox)
+    return np.where(grid.inside, grid.district_idx, -1).astype(np.int16)
+
+
+def save_raster(raster, meta: dict, path: str):
+    np.save(f"{path}.npy", raster)
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump({**meta, "districts": DISTRICTS}, f, indent=2)
+
+
+def main(argv=None):
+    from weather import fetch_districts
+
+    parser = argparse.ArgumentParser(description="Score a lat/lon grid over Jharkhand.")
+    parser.add_argument("--date", default=today_ist().isoformat())
+    parser.add_argument("--resolution", type=float, default=DEFAULT_RESOLUTION)
+    parser.add_argument("--out", default="risk_grid")
+    args = parser.parse_args(argv)
+
+    weather, errors = fetch_districts()
+    if errors:
+        raise SystemExit(f"Weather unavailable for: {', '.join(sorted(errors))}")
+    raster, meta = score_grid(dt.date.fromisoformat(args.date), weather, args.resolution)
+    save_raster(raster, meta, args.out)
+    print(f"Scored {meta['cells_scored']} cells {tuple(meta['shape'])} -> {args.out}.npy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Historical backfill: stream district-day weather through the ensemble.
+
+    python hindcast.py lis_mts_2017_2022.csv hindcast.csv
+    python hindcast.py grid_weather.parquet scores.parquet --chunksize 500000 --threads
+
+The input is read in chunks and each chunk is encoded with the vectorized
+FeatureEncoder, scored, and appended to the output, so memory stays bounded
+by the chunk size whatever the file length. Columns may use either the
+build_feature_row argument names (temp_c, rh, ...) or the dataset names
+(Temp_C, Rh, Pressure_hPa, ...). When the 3-day aggregates are missing they
+are computed on the fly; rows must then be in date order per district.
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from ensemble import EnsembleExecutor
+from forecast import get_encoder, get_model, normalize_records, predict_ensemble_proba, risk_labels
+
+DEFAULT_CHUNKSIZE = 200_000
+ROLLING_DAYS = 3
+
+# dataset column -> build_feature_row argument
+RENAMES = {
+    "Date": "date",
+    "District": "district",
+    "Latitude": "lat",
+    "Longitude": "lon",
+    "Temp_C": "temp_c",
+    "Rh": "rh",
+    "Pressure_hPa": "pressure",
+    "WindSpeed": "windspeed",
+    "Rain_mm": "rain_mm",
+    "Rain_3day_sum": "rain_3day_sum",
+    "Temp_3day_mean": "temp_3day_mean",
+    "Rh_3day_mean": "rh_3day_mean",
+    "Pres_3day_mean": "pres_3day_mean",
+    "Pressure_Drop": "pressure_drop",
+}
+ROLLING = {
+    "rain_3day_sum": ("rain_mm", "sum"),
+    "temp_3day_mean": ("temp_c", "mean"),
+    "rh_3day_mean": ("rh", "mean"),
+    "pres_3day_mean": ("pressure", "mean"),
+}
+
+log = logging.getLogger("hindcast")
+
+# ================== INPUT ==================
+def read_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE, columns=None):
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet needs pyarrow: pip install pyarrow") from None
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns)
+
+
+def normalize_dates(df: pd.DataFrame):
+    # RollingCarry compares dates across chunks, so parse them up front
+    if "date" in df:
+        df = df.assign(date=pd.to_datetime(df["date"]))
+    return df
+
+
+class RollingCarry:
+    # Adds the 3-day aggregates to chunks of raw rows. Each row aggregates the
+    # rows of its district dated within the ROLLING_DAYS days ending at it,
+    # (date - 3 days, date], so missing days shorten the window and sub-daily
+    # rows still cover three days rather than three rows. Rows from the last
+    # ROLLING_DAYS days of every district are carried into the next chunk so
+    # windows that straddle a chunk boundary come out the same as they would
+    # on the whole file.
+
+    def __init__(self):
+        self.carry = None
+
+    def apply(self, df: pd.DataFrame):
+        need = [col for col in ROLLING if col not in df]
+        if not need:
+            return df
+        df = df.assign(_row=np.arange(len(df)))
+        src = [ROLLING[col][0] for col in need]
+        full = df[["district", "date", "_row"] + src]
+        if self.carry is not None:
+            full = pd.concat([self.carry, full])
+        # time-based rolling returns the groups one after another, so lay the
+        # rows out that way first (stable: date order within a district holds)
+        full = full.sort_values("district", kind="stable", ignore_index=True)
+
+        grouped = full.groupby("district", sort=True, dropna=False)
+        if not grouped["date"].is_monotonic_increasing.all():
+            raise ValueError("Rows must be in date order within each district to compute 3-day aggregates.")
+        window = pd.Timedelta(days=ROLLING_DAYS)
+        rolling = grouped.rolling(window, on="date", min_periods=1)
+        for col in need:
+            base, how = ROLLING[col]
+            full[col] = rolling[base].agg(how).to_numpy()
+
+        recent = full["date"] > grouped["date"].transform("max") - window
+        self.carry = full.loc[recent, ["district", "date", "_row"] + src].assign(_row=-1)
+        out = full[full["_row"] >= 0].set_index("_row").sort_index()
+        for col in need:
+            df[col] = out[col].to_numpy()
+        if "pressure_drop" not in df:
+            df["pressure_drop"] = df["pressure"] - df["pres_3day_mean"]
+        return df.drop(columns="_row")
+
+# ================== OUTPUT ==================
+class ChunkWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = None
+        self._header = True
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df: pd.DataFrame):
+        if self.path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+# ================== RUN ==================
+def hindcast(
+    src: str,
+    dst: str,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    threshold: float = 0.5,
+    keep=(),
+    executor: EnsembleExecutor = None,
+    ens=None,
+):
+    if ens is None:
+        ens = executor.ens if executor is not None else get_model()
+    encoder = get_encoder(ens["feature_list"])
+    buf = encoder.empty(chunksize)
+    rolling = RollingCarry()
+    writer = ChunkWriter(dst)
+
+    total = 0
+    started = time.perf_counter()
+    try:
+        for chunk in read_chunks(src, chunksize):
+            chunk = chunk.rename(columns={k: v for k, v in RENAMES.items() if k in chunk and v not in chunk})
+            df = normalize_records(rolling.apply(normalize_dates(chunk)))
+            X = encoder.encode(df, out=buf)
+            if executor is not None:
+                prob, _ = executor.predict_proba(X, ens)
+            else:
+                prob = predict_ensemble_proba(X, ens)
+
+            out = pd.DataFrame({"date": df["date"].dt.date, "district": df["district"]})
+            for col in keep:
+                out[col] = chunk[col].to_numpy()
+            out["probability"] = prob
+            out["prediction"] = (prob >= threshold).astype(np.int8)
+            out["risk"] = risk_labels(prob)
+            writer.write(out)
+
+            total += len(df)
+            rate = total / max(time.perf_counter() - started, 1e-9)
+            log.info("Scored %d rows (%.0f rows/s)", total, rate)
+    finally:
+        writer.close()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score historical district-day weather with the ensemble.")
+    parser.add_argument("src", help="Input .csv or .parquet")
+    parser.add_argument("dst", help="Output .csv or .parquet")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--keep", default="", help="Comma-separated input columns to copy to the output.")
+    parser.add_argument("--threads", action="store_true", help="Run the ensemble members concurrently.")
+    parser.add_argument("--processes", type=int, default=0, help="Split each chunk over N worker processes.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    keep = [c for c in args.keep.split(",") if c]
+    executor = None
+    if args.processes:
+        executor = EnsembleExecutor(mode="process", max_workers=args.processes, process_min_rows=1)
+    elif args.threads:
+        executor = EnsembleExecutor(mode="thread")
+    try:
+        total = hindcast(args.src, args.dst, args.chunksize, args.threshold, keep, executor)
+    finally:
+        if executor is not None:
+            executor.close()
+    print(f"Scored {total} rows -> {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
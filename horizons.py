@@ -0,0 +1,182 @@
+"""Multi-horizon lightning risk (0-72 h) from the OpenWeather 3-hourly forecast.
+
+For every district the forecast series is interpolated to each horizon and
+the 3-day aggregates are rebuilt for that horizon's trailing window: the
+part of the window that is still in the past comes from the observation
+store, the rest from the forecast steps. All (district, horizon) rows are
+scored in one batch and the table is reused until the provider's forecast
+rolls forward (the first forecast step becomes current).
+
+    python horizons.py --max-horizon 72 --step 3
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from forecast import DISTRICT_COORDS, DISTRICTS, IST, score_batch
+from observations import OBS_PATH, get_observation_store
+from weather import OPENWEATHER_FORECAST_URL, WeatherClient, fetch_districts, parse_forecast
+
+MAX_HORIZON_H = 72
+STEP_H = 3
+WINDOW_H = 72
+MEANS = {"temp_c": "temp_3day_mean", "rh": "rh_3day_mean", "pressure": "pres_3day_mean"}
+
+# ================== HORIZON FEATURES ==================
+def horizon_records(district: str, series: dict, issued: float, horizons, past: dict = None):
+    # One record per horizon for a district. series is parse_forecast output,
+    # issued the UTC timestamp the horizons count from, past the observation
+    # store aggregates at `issued` (None when it has no recent history).
+    horizons = np.asarray(horizons, dtype=np.float64)
+    offset = (np.asarray(series["time"], dtype=np.float64) - issued) / 3600.0
+    lat, lon = DISTRICT_COORDS[district]
+    values = {key: np.asarray(series[key], dtype=np.float64) for key in ("temp_c", "rh", "pressure", "wind")}
+    rain = np.asarray(series["rain_mm"], dtype=np.float64)
+
+    # steps in the trailing window (h - WINDOW_H, h] that are still ahead of `issued`
+    ahead = offset > 0
+    in_window = ahead[None, :] & (offset[None, :] <= horizons[:, None])
+    in_window &= offset[None, :] > (horizons[:, None] - WINDOW_H)
+    in_day = ahead[None, :] & (offset[None, :] <= horizons[:, None]) & (offset[None, :] > horizons[:, None] - 24)
+    counts = in_window.sum(axis=1)
+
+    rec = pd.DataFrame({"horizon_h": horizons.astype(np.int64)})
+    valid = pd.to_datetime(issued + horizons * 3600.0, unit="s", utc=True)
+    rec["valid_time"] = valid
+    rec["date"] = valid.tz_convert(IST).date
+    rec["district"] = district
+    rec["lat"], rec["lon"] = lat, lon
+    for key, v in values.items():
+        rec[key] = np.interp(horizons, offset, v)
+    rec["windspeed"] = rec["wind"]
+
+    # the share of each window that lies before `issued`, covered by observations
+    past_share = np.clip((WINDOW_H - horizons) / WINDOW_H, 0.0, 1.0) if past else np.zeros(len(horizons))
+    ahead_share = 1.0 - past_share
+    rain_ahead = in_window.astype(np.float64) @ rain
+    for key, col in MEANS.items():
+        ahead_mean = np.where(counts > 0, (in_window @ values[key]) / np.maximum(counts, 1), rec[key])
+        rec[col] = ahead_mean if not past else past_share * past[col] + ahead_share * ahead_mean
+    if past:
+        hourly = past["rain_3day_sum"] / WINDOW_H
+        rec["rain_3day_sum"] = past_share * past["rain_3day_sum"] + rain_ahead
+        rec["rain_mm"] = in_day.astype(np.float64) @ rain + hourly * np.clip(24.0 - horizons, 0.0, 24.0)
+    else:
+        rec["rain_3day_sum"] = rain_ahead
+        rec["rain_mm"] = in_day.astype(np.float64) @ rain
+    rec["pressure_drop"] = rec["pressure"] - rec["pres_3day_mean"]
+    return rec
+
+
+def build_horizon_records(forecasts: dict, issued: float, horizons, observations=None):
+    frames = []
+    for district in DISTRICTS:
+        if district not in forecasts:
+            continue
+        # None when the store has nothing from the day before `issued`
+        past = observations.aggregates(district, issued) if observations is not None else None
+        frames.append(horizon_records(district, forecasts[district], issued, horizons, past))
+    return pd.concat(frames, ignore_index=True)
+
+# ================== FORECASTER ==================
+class HorizonForecaster:
+    # Fetches the forecast for every district, scores all (district, horizon)
+    # pairs in one batch and keeps the table until the provider issues the
+    # next forecast, i.e. until the earliest first step across districts has
+    # passed. Shared across sessions; concurrent callers wait on one refresh.
+
+    def __init__(
+        self,
+        client: WeatherClient = None,
+        max_horizon: int = MAX_HORIZON_H,
+        step: int = STEP_H,
+        threshold: float = 0.5,
+        max_concurrency: int = 8,
+        obs_path: str = OBS_PATH,
+        clock=time.time,
+    ):
+        if client is None:
+            client = WeatherClient(base_url=OPENWEATHER_FORECAST_URL, parser=parse_forecast, ttl=1800.0)
+        self.client = client
+        self.horizons = np.arange(0, max_horizon + 1, step)
+        self.threshold = threshold
+        self.max_concurrency = max_concurrency
+        self.obs_path = obs_path
+        self.clock = clock
+        self._table = None
+        self._errors = {}
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def table(self, ens=None):
+        # returns (table, errors); table is None if no district could be fetched
+        with self._lock:
+            if self._table is None or self.clock() >= self._expires:
+                self._refresh(ens)
+            return self._table, self._errors
+
+    def invalidate(self):
+        with self._lock:
+            self._expires = 0.0
+
+    def _refresh(self, ens):
+        self.client.cache.clear()
+        forecasts, errors = fetch_districts(client=self.client, max_concurrency=self.max_concurrency)
+        self._errors = errors
+        if not forecasts:
+            self._table = None
+            return
+        issued = float(int(self.clock()))
+        records = build_horizon_records(forecasts, issued, self.horizons, get_observation_store(self.obs_path))
+        scored = score_batch(records, threshold=self.threshold, ens=ens)
+        table = pd.concat(
+            [records[["horizon_h", "valid_time"]], scored, records[["temp_c", "rh", "pressure", "wind", "rain_mm"]]],
+            axis=1,
+        )
+        table["issued_at"] = pd.Timestamp(issued, unit="s", tz="UTC")
+        self._table = table
+        first_steps = [s["time"][0] for s in forecasts.values()]
+        self._expires = max(min(first_steps), issued + 60.0)
+
+
+_forecaster = None
+_forecaster_lock = threading.Lock()
+
+
+def get_horizon_forecaster():
+    global _forecaster
+    if _forecaster is None:
+        with _forecaster_lock:
+            if _forecaster is None:
+                _forecaster = HorizonForecaster()
+    return _forecaster
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score every district at each forecast horizon.")
+    parser.add_argument("--max-horizon", type=int, default=MAX_HORIZON_H, help="Hours ahead.")
+    parser.add_argument("--step", type=int, default=STEP_H, help="Hours between horizons.")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--observations", default=OBS_PATH)
+    parser.add_argument("--out", default=None, help="Write the table to this CSV.")
+    args = parser.parse_args(argv)
+
+    forecaster = HorizonForecaster(
+        max_horizon=args.max_horizon, step=args.step, threshold=args.threshold, obs_path=args.observations
+    )
+    table, errors = forecaster.table()
+    for name, err in sorted(errors.items()):
+        print(f"{name}: {err}")
+    if table is None:
+        raise SystemExit("No forecast available for any district.")
+    if args.out:
+        table.to_csv(args.out, index=False)
+    peak = table.sort_values("probability", ascending=False).drop_duplicates("district")
+    print(peak[["district", "horizon_h", "valid_time", "probability", "risk"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""In-process counters, latency histograms and an optional sampling profiler.
+
+Metrics are exposed in the Prometheus text format by service.py at
+GET /metrics. Processes without their own HTTP endpoint (the Streamlit app,
+the scheduler) can serve the same text from a background thread with
+start_exporter(); the app does so when LIGHTNING_METRICS_ADDR is set to a
+port or host:port. Setting LIGHTNING_PROFILE=1 (or service.py --profile)
+starts a sampling profiler whose stacks are served at GET /debug/profile in
+the collapsed format used by flamegraph tools.
+"""
+import bisect
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# seconds; covers the ~10 us encoder up to multi-second upstream calls
+LATENCY_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(text: str, quote: bool = True):
+    # text exposition format: backslash and newline always, double quotes
+    # inside label values
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quote else text
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+# ================== METRIC TYPES ==================
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape(self.help, quote=False)}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            lines.append(f"{self.name}{_labels(self.labels, key)} {v:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape(self.help, quote=False)}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._series.items())
+        names = self.labels + ("le",)
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(names, key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total:.9g}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+# ================== REGISTRY ==================
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kw):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kw)
+            elif not isinstance(metric, cls) or metric.labels != tuple(labels):
+                raise ValueError(f"Metric {name} already registered with a different type or labels.")
+            return metric
+
+    def counter(self, name: str, help: str, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# the hooks used across the app; all durations are in seconds
+LATENCY = REGISTRY.histogram(
+    "lightning_operation_seconds",
+    "Duration of instrumented operations.",
+    ("operation",),
+)
+MEMBER_LATENCY = REGISTRY.histogram(
+    "lightning_member_predict_seconds",
+    "predict_proba duration per ensemble member.",
+    ("member",),
+)
+REQUESTS = REGISTRY.counter("lightning_requests_total", "HTTP requests served.", ("route", "status"))
+REQUEST_LATENCY = REGISTRY.histogram("lightning_request_seconds", "HTTP request duration.", ("route",))
+CACHE = REGISTRY.counter("lightning_cache_total", "Cache lookups by cache and result.", ("cache", "result"))
+UPSTREAM_ERRORS = REGISTRY.counter("lightning_upstream_errors_total", "Failed upstream calls.", ("upstream",))
+PREDICTIONS = REGISTRY.counter("lightning_predictions_total", "Predictions by risk class.", ("risk",))
+
+
+def timed(operation: str):
+    # decorator feeding LATENCY{operation=...}
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                LATENCY.observe(time.perf_counter() - start, operation)
+
+        return inner
+
+    return wrap
+
+
+def render():
+    return REGISTRY.render()
+
+# ================== EXPORTER ==================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ExporterServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def parse_addr(addr: str, host: str = "127.0.0.1"):
+    # "9100" or "0.0.0.0:9100" -> (host, port)
+    addr = addr.strip()
+    if ":" in addr:
+        host, _, addr = addr.rpartition(":")
+    return host, int(addr)
+
+
+def start_exporter(port: int, host: str = "127.0.0.1"):
+    # Serves GET /metrics from a daemon thread. Started at most once per
+    # process (a Streamlit rerun calls this again); returns the server, or
+    # None when the address could not be bound, e.g. by a second process.
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            try:
+                server = _ExporterServer((host, port), _MetricsHandler)
+            except OSError as e:
+                _exporter = e
+            else:
+                threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+                _exporter = server
+        return _exporter if isinstance(_exporter, ThreadingHTTPServer) else None
+
+# ================== SAMPLING PROFILER ==================
+class SamplingProfiler:
+    # Samples every thread's stack each `interval` seconds from a daemon
+    # thread and counts identical stacks. Cheap enough to leave on during an
+    # incident; nothing is collected while it is stopped.
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = []
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples.update(stacks)
+
+    def collapsed(self):
+        with self._lock:
+            items = self.samples.most_common()
+        return "".join(f"{stack} {n}\n" for stack, n in items)
+
+
+_profiler = None
+
+
+def get_profiler():
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+    return _profiler
+
+
+if os.environ.get("LIGHTNING_PROFILE", "") == "1":
+    get_profiler().start()
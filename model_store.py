@@ -0,0 +1,340 @@
+"""Versioned, lazily loaded model artifacts.
+
+Layout of a store directory:
+
+    model_store/
+        CURRENT                 # name of the active version
+        <version>/
+            manifest.json       # feature_list + one entry per member
+            log_pipe.joblib
+            mlp_pipe.joblib
+            gb_pipe.joblib
+            gb_pipe.<array>.npy # the trees as flat node arrays (see below)
+
+Members are written uncompressed and each one is only read the first time it
+is used. joblib memory-maps the plain weight arrays (scaler, logistic and MLP
+coefficients), but a pickled tree model never shares: sklearn rebuilds its
+node arrays in Tree.__setstate__ and XGBoost keeps the booster as raw bytes,
+so every worker would hold its own copy. The tree member is therefore also
+exported as fastpath.FastTrees node arrays, checked against the original
+predict_proba, and served from read-only .npy mmaps that every worker on a
+node shares through the page cache. Versions exported without them (or
+opened with mmap=False) load gb_pipe.joblib as before.
+
+Export the pickled ensemble once with:
+
+    python model_store.py export lightning_ensemble_model.pkl model_store
+
+Running processes follow CURRENT (see ModelHost), so a new version goes live
+in every worker without a restart:
+
+    python model_store.py export new_model.pkl model_store --no-activate
+    python model_store.py activate v20250601120000
+"""
+import argparse
+import datetime as dt
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import joblib
+import numpy as np
+
+from fastpath import PARITY_ATOL, FastPathUnsupported, FastTrees, probe_matrix
+from forecast import MEMBERS, load_model
+
+FORMAT_VERSION = 1
+STORE_DIR = "model_store"
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+POLL_SECONDS = 5.0
+
+log = logging.getLogger("model_store")
+
+
+class ModelStoreError(Exception):
+    pass
+
+
+def feature_hash(feature_list):
+    return hashlib.sha256("\n".join(feature_list).encode("utf-8")).hexdigest()[:16]
+
+
+def _sha256(path: str):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_atomic(path: str, text: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+# ================== EXPORT ==================
+def export_store(ens, root: str = STORE_DIR, version: str = None, activate: bool = True):
+    feature_list = list(ens["feature_list"])
+    if version is None:
+        version = dt.datetime.now(dt.timezone.utc).strftime("v%Y%m%d%H%M%S")
+    vdir = os.path.join(root, version)
+    if os.path.exists(os.path.join(vdir, MANIFEST)):
+        raise ModelStoreError(f"Model version already exists: {vdir}")
+    for name in MEMBERS:
+        n_features = getattr(ens[name], "n_features_in_", len(feature_list))
+        if n_features != len(feature_list):
+            raise ModelStoreError(f"{name} expects {n_features} features, feature_list has {len(feature_list)}.")
+    os.makedirs(vdir, exist_ok=True)
+
+    members = {}
+    for name in MEMBERS:
+        filename = f"{name}.joblib"
+        path = os.path.join(vdir, filename)
+        joblib.dump(ens[name], path, compress=0)
+        members[name] = {
+            "file": filename,
+            "bytes": os.path.getsize(path),
+            "sha256": _sha256(path),
+            "n_features_in": int(getattr(ens[name], "n_features_in_", len(feature_list))),
+        }
+    trees = _export_trees(ens["gb_pipe"], vdir, feature_list)
+    if trees is not None:
+        members["gb_pipe"]["trees"] = trees
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_version": version,
+        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "feature_list": feature_list,
+        "feature_hash": feature_hash(feature_list),
+        "members": members,
+    }
+    _write_atomic(os.path.join(vdir, MANIFEST), json.dumps(manifest, indent=2))
+    if activate:
+        _write_atomic(os.path.join(root, CURRENT), version)
+    return vdir
+
+
+def _export_trees(pipe, vdir: str, feature_list):
+    # the manifest entry for the shared node arrays, or None when the tree
+    # member cannot be compiled exactly (it is then served from its pickle)
+    if isinstance(pipe, FastTrees):
+        return pipe.save(vdir, "gb_pipe")
+    probe = probe_matrix(feature_list)
+    try:
+        trees = FastTrees(pipe, probe)
+    except FastPathUnsupported as e:
+        log.warning("gb_pipe is not exported as shared node arrays: %s", e)
+        return None
+    diff = float(np.max(np.abs(trees.predict_proba(probe)[:, 1] - pipe.predict_proba(probe)[:, 1])))
+    if not diff <= PARITY_ATOL:
+        log.warning("gb_pipe is not exported as shared node arrays: max |diff| %.2e", diff)
+        return None
+    entry = trees.save(vdir, "gb_pipe")
+    entry["max_abs_diff"] = diff
+    return entry
+
+
+def current_version(root: str = STORE_DIR):
+    with open(os.path.join(root, CURRENT), encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def activate(version: str, root: str = STORE_DIR):
+    # point CURRENT at an exported version (also used to roll back)
+    if not os.path.exists(os.path.join(root, version, MANIFEST)):
+        raise ModelStoreError(f"No exported model version {version!r} in {root}")
+    _write_atomic(os.path.join(root, CURRENT), version)
+
+# ================== LAZY STORE ==================
+class ModelStore(Mapping):
+    # Drop-in for the unpickled ensemble dict: ens["feature_list"] comes from
+    # the manifest and ens["gb_pipe"] etc. are loaded on first access.
+
+    def __init__(self, root: str = STORE_DIR, version: str = None, mmap: bool = True, verify: bool = False):
+        if version is None:
+            version = current_version(root)
+        self.root = root
+        self.version = version
+        self.path = os.path.join(root, version)
+        self.mmap_mode = "r" if mmap else None
+        self.verify = verify
+        self._members = {}
+        self._lock = threading.Lock()
+
+        try:
+            with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            raise ModelStoreError(f"No manifest in {self.path}") from None
+
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ModelStoreError(f"Unsupported model store format: {self.manifest.get('format_version')}")
+        self.feature_list = self.manifest["feature_list"]
+        if feature_hash(self.feature_list) != self.manifest["feature_hash"]:
+            raise ModelStoreError("Manifest feature_hash does not match its feature_list.")
+        missing = [name for name in MEMBERS if name not in self.manifest["members"]]
+        if missing:
+            raise ModelStoreError(f"Manifest is missing members: {', '.join(missing)}")
+
+    def __getitem__(self, key):
+        if key == "feature_list":
+            return self.feature_list
+        if key not in MEMBERS:
+            raise KeyError(key)
+        member = self._members.get(key)
+        if member is None:
+            with self._lock:
+                member = self._members.get(key)
+                if member is None:
+                    member = self._members[key] = self._load_member(key)
+        return member
+
+    def __iter__(self):
+        yield from MEMBERS
+        yield "feature_list"
+
+    def __len__(self):
+        return len(MEMBERS) + 1
+
+    def loaded(self):
+        return [name for name in MEMBERS if name in self._members]
+
+    def _load_member(self, name: str):
+        entry = self.manifest["members"][name]
+        path = os.path.join(self.path, entry["file"])
+        if os.path.getsize(path) != entry["bytes"]:
+            raise ModelStoreError(f"{path} does not match its manifest size.")
+        if self.verify and _sha256(path) != entry["sha256"]:
+            raise ModelStoreError(f"{path} does not match its manifest checksum.")
+
+        trees = entry.get("trees")
+        if trees is not None and self.mmap_mode:
+            return FastTrees.load(self.path, trees, self.mmap_mode)
+        pipe = joblib.load(path, mmap_mode=self.mmap_mode)
+        n_features = getattr(pipe, "n_features_in_", entry["n_features_in"])
+        if n_features != len(self.feature_list):
+            raise ModelStoreError(
+                f"{name} expects {n_features} features, feature_list has {len(self.feature_list)}."
+            )
+        names = getattr(pipe, "feature_names_in_", None)
+        if names is not None and list(names) != self.feature_list:
+            raise ModelStoreError(f"{name} was fitted on different feature names than feature_list.")
+        return pipe
+
+
+def open_store(root: str = STORE_DIR, **kwargs):
+    return ModelStore(root, **kwargs)
+
+# ================== HOT-SWAP HOST ==================
+class ModelHost:
+    # Process-wide handle on the active version. current() checks CURRENT at
+    # most every `poll` seconds; when it names a new version, a background
+    # thread opens and fully loads it, and it replaces the old one in a
+    # single assignment. Request threads never wait for a load: they keep
+    # getting the old version until the new one is ready. Callers keep the
+    # ModelStore they were handed for the whole prediction, so a swap never
+    # mixes members of two versions, and a version that fails to load leaves
+    # the old one serving.
+
+    def __init__(self, root: str = STORE_DIR, poll: float = POLL_SECONDS, clock=time.monotonic, **store_kwargs):
+        self.root = root
+        self.poll = poll
+        self.clock = clock
+        self.store_kwargs = store_kwargs
+        self.swaps = 0
+        self._failed = None
+        self._store = ModelStore(root, **store_kwargs)
+        self._checked = clock()
+        self._lock = threading.Lock()
+        self._loader = None
+
+    @property
+    def version(self):
+        return self._store.version
+
+    def current(self):
+        # a check already running keeps the lock; keep serving meanwhile
+        if self.clock() - self._checked >= self.poll and self._lock.acquire(blocking=False):
+            self._checked = self.clock()
+            self._loader = threading.Thread(target=self._reload_locked, name="model-reload", daemon=True)
+            self._loader.start()
+        return self._store
+
+    def wait(self, timeout: float = None):
+        # block until a background reload started by current() has finished
+        loader = self._loader
+        if loader is not None:
+            loader.join(timeout)
+
+    def reload(self):
+        # the same check on the calling thread; False when nothing changed
+        if not self._lock.acquire(blocking=False):
+            return False
+        self._checked = self.clock()
+        return self._reload_locked()
+
+    def _reload_locked(self):
+        try:
+            try:
+                version = current_version(self.root)
+            except OSError:
+                return False
+            if version in (self._store.version, self._failed):
+                return False
+            try:
+                store = ModelStore(self.root, version=version, **self.store_kwargs)
+                for name in MEMBERS:
+                    store[name]
+            except Exception:
+                log.exception("Could not load model version %s; still serving %s", version, self._store.version)
+                self._failed = version
+                return False
+            log.info("Model version %s -> %s", self._store.version, version)
+            self._store = store
+            self.swaps += 1
+            return True
+        finally:
+            self._lock.release()
+
+# ================== CLI ==================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the versioned model store.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_export = sub.add_parser("export", help="Split a pickled ensemble into a new store version.")
+    p_export.add_argument("pickle", nargs="?", default="lightning_ensemble_model.pkl")
+    p_export.add_argument("root", nargs="?", default=STORE_DIR)
+    p_export.add_argument("--version", default=None)
+    p_export.add_argument("--no-activate", action="store_true")
+
+    p_activate = sub.add_parser("activate", help="Make an exported version current (running workers follow).")
+    p_activate.add_argument("version")
+    p_activate.add_argument("root", nargs="?", default=STORE_DIR)
+
+    p_verify = sub.add_parser("verify", help="Load every member and check it against the manifest.")
+    p_verify.add_argument("root", nargs="?", default=STORE_DIR)
+    p_verify.add_argument("--version", default=None)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "export":
+        vdir = export_store(load_model(args.pickle), args.root, args.version, activate=not args.no_activate)
+        print(f"Exported {args.pickle} -> {vdir}")
+    elif args.cmd == "activate":
+        activate(args.version, args.root)
+        print(f"{args.root}/{CURRENT} -> {args.version}")
+    else:
+        store = ModelStore(args.root, version=args.version, verify=True)
+        for name in MEMBERS:
+            store[name]
+        print(f"{store.path}: {len(store.feature_list)} features, members OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+import requests
+
+from metrics import CACHE, UPSTREAM_ERRORS, timed
+
+NEWS_URL = "https://newsapi.org/v2/everything"
+NEWS_QUERY = "lightning OR thunderstorm OR IMD weather alert"
+NEWS_TTL = 900.0
+RETRY_AFTER = 60.0
+
+
+@timed("fetch_lightning_news")
+def fetch_lightning_news(max_articles: int = 4):
+    api_key = os.environ.get("NEWS_API_KEY", "").strip()
+    if not api_key:
+        return [], "News API key not configured."
+
+    params = {
+        "q": NEWS_QUERY,
+        "language": "en",
+        "sortBy": "publishedAt",
+        "pageSize": 10,
+        "apiKey": api_key,
+    }
+    try:
+        resp = requests.get(NEWS_URL, params=params, timeout=6)
+        if resp.status_code != 200:
+            return [], f"News API error: {resp.status_code}"
+        data = resp.json()
+        return data.get("articles", [])[:max_articles], None
+    except Exception as e:
+        return [], f"News request error: {e}"
+
+# ================== SHARED CACHE ==================
+class NewsCache:
+    # Articles shared by every session. get() never waits on NewsAPI: it
+    # returns the last good copy (even past its TTL) and, when that copy is
+    # stale, starts one background refresh that swaps in the new articles.
+    # A failed refresh keeps the old copy and is retried after RETRY_AFTER.
+
+    def __init__(
+        self,
+        fetch=fetch_lightning_news,
+        ttl: float = NEWS_TTL,
+        retry_after: float = RETRY_AFTER,
+        max_articles: int = 4,
+        clock=time.monotonic,
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.max_articles = max_articles
+        self.clock = clock
+        self._articles = None
+        self._error = None
+        self._next_refresh = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.stats = {"refreshes": 0, "failures": 0, "consecutive_failures": 0}
+
+    def get(self):
+        # (articles, err); articles is None until the first refresh finishes
+        with self._lock:
+            stale = self.clock() >= self._next_refresh
+            start = stale and not self._refreshing
+            if start:
+                self._refreshing = True
+            articles, error = self._articles, self._error
+        if start:
+            threading.Thread(target=self.refresh, name="news-refresh", daemon=True).start()
+        CACHE.inc("news", "miss" if articles is None else "stale" if stale else "hit")
+        if articles:
+            return list(articles), None
+        return articles, error
+
+    def refresh(self):
+        try:
+            articles, err = self.fetch(self.max_articles)
+        except Exception as e:
+            articles, err = [], f"News request error: {e}"
+        with self._lock:
+            self._refreshing = False
+            self.stats["refreshes"] += 1
+            if err:
+                self.stats["failures"] += 1
+                self.stats["consecutive_failures"] += 1
+                UPSTREAM_ERRORS.inc("newsapi")
+                self._error = err
+                self._next_refresh = self.clock() + self.retry_after
+                if self._articles is None:
+                    self._articles = []
+            else:
+                self.stats["consecutive_failures"] = 0
+                self._articles, self._error = articles, None
+                self._next_refresh = self.clock() + self.ttl
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_news_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = NewsCache()
+    return _cache
@@ -0,0 +1,219 @@
+import datetime as dt
+import os
+import threading
+
+import numpy as np
+
+from forecast import DISTRICTS, IST
+
+OBS_PATH = "observations.npz"
+DAY_SECONDS = 24 * 3600
+WINDOW_SECONDS = 3 * DAY_SECONDS
+# observations are bucketed by IST day, like every district-day date
+DAY_OFFSET = IST.utcoffset(None).total_seconds()
+# columns of the per-district value arrays
+FIELDS = ["temp_c", "rh", "pressure", "rain_mm"]
+TEMP, RH, PRES, RAIN = range(len(FIELDS))
+
+
+def _timestamp(when):
+    if isinstance(when, (int, float, np.floating, np.integer)):
+        return float(when)
+    if isinstance(when, dt.datetime):
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=dt.timezone.utc)
+        return when.timestamp()
+    if isinstance(when, dt.date):
+        return dt.datetime(when.year, when.month, when.day, tzinfo=IST).timestamp()
+    raise TypeError(f"Unsupported observation time: {when!r}")
+
+# ================== PER-DISTRICT SERIES ==================
+class _Series:
+    # Running sums and counts per day for one district. Appending adds the
+    # observation to its day's bucket (opening a new one on a new day), so
+    # each observation is O(1) and a lookup combines at most a few buckets
+    # instead of re-reading raw history. Only the last `keep` days are held.
+
+    def __init__(self, keep: int):
+        self.keep = keep
+        self.buckets = {}  # day number -> [sum per FIELD..., count]
+        self.last_ts = None
+
+    def append(self, ts: float, row):
+        if self.last_ts is not None and ts < self.last_ts:
+            raise ValueError("Observations must be appended in time order.")
+        day = _day(ts)
+        bucket = self.buckets.get(day)
+        if bucket is None:
+            bucket = self.buckets[day] = np.zeros(len(FIELDS) + 1)
+            # days arrive in order, so the oldest bucket is the first key
+            while len(self.buckets) > self.keep:
+                del self.buckets[next(iter(self.buckets))]
+        bucket[:-1] += row
+        bucket[-1] += 1
+        self.last_ts = ts
+
+    def days(self, first: int, last: int):
+        # the buckets for days first..last that have observations
+        return [self.buckets[d] for d in range(first, last + 1) if d in self.buckets]
+
+
+def _day(ts: float):
+    return int((ts + DAY_OFFSET) // DAY_SECONDS)
+
+
+def _combine(buckets, today=None):
+    # 3-day aggregates from day buckets (plus today's values as one more
+    # day): rain adds up, means weight each day equally
+    rain = sum(b[RAIN] for b in buckets)
+    means = [b[:-1] / b[-1] for b in buckets]
+    if today is not None:
+        rain += today[RAIN]
+        means.append(np.asarray(today, dtype=np.float64))
+    mean = np.mean(means, axis=0)
+    return {
+        "rain_3day_sum": float(rain),
+        "temp_3day_mean": float(mean[TEMP]),
+        "rh_3day_mean": float(mean[RH]),
+        "pres_3day_mean": float(mean[PRES]),
+    }
+
+# ================== STORE ==================
+class ObservationStore:
+    # Per-district weather observations reduced to daily running sums, from
+    # which the rolling 3-day aggregates are combined. Works for daily or
+    # sub-daily observations: each row holds the rain since the previous one,
+    # so a day's rain adds up every observation in it, and the day's other
+    # fields are averaged over its observations.
+
+    def __init__(self, window_seconds: float = WINDOW_SECONDS):
+        self.window = float(window_seconds)
+        self.window_days = max(1, round(self.window / DAY_SECONDS))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        # one day more than the window, so a lookup for the day before the
+        # latest one still finds a whole window
+        return _Series(self.window_days + 1)
+
+    def append(
+        self,
+        district: str,
+        when,
+        temp_c: float,
+        rh: float,
+        pressure: float,
+        rain_mm: float,
+        rain_hours: float = None,
+    ):
+        # rain_mm is the rain since the previous observation (a daily total for
+        # daily rows). Pass rain_hours when it is instead a trailing
+        # accumulation, like OpenWeather's rain.1h: only the share not already
+        # covered by the previous observation is stored, so snapshots taken
+        # every 15 minutes do not count the same hour four times.
+        if district not in DISTRICTS:
+            raise ValueError(f"Unknown district: {district}")
+        ts = _timestamp(when)
+        with self._lock:
+            series = self._series.get(district)
+            if series is None:
+                series = self._series[district] = self._new_series()
+            if rain_hours and series.last_ts is not None:
+                span = rain_hours * 3600.0
+                rain_mm = rain_mm * min(max(ts - series.last_ts, 0.0), span) / span
+            series.append(ts, (temp_c, rh, pressure, rain_mm))
+
+    def append_weather(self, district: str, when, weather: dict):
+        # current-conditions snapshot from weather.parse_current_weather
+        self.append(
+            district,
+            when,
+            weather["temp_c"],
+            weather["rh"],
+            weather["pressure"],
+            weather["rain_mm"],
+            rain_hours=weather.get("rain_hours", 1.0),
+        )
+
+    def __contains__(self, district):
+        return district in self._series
+
+    def aggregates(self, district: str, when=None):
+        # 3-day aggregates over the stored days ending on the day of `when`
+        # (default: the latest observation), that day included. None when
+        # the latest observation is more than a day older than `when`.
+        with self._lock:
+            series = self._series.get(district)
+            if series is None or series.last_ts is None:
+                return None
+            ts = series.last_ts if when is None else _timestamp(when)
+            if series.last_ts < ts - DAY_SECONDS:
+                return None
+            day = _day(ts)
+            buckets = [b.copy() for b in series.days(day - self.window_days + 1, day)]
+        return _combine(buckets) if buckets else None
+
+    def rolling(self, district: str, date, temp_c: float, rh: float, pressure: float, rain_mm: float):
+        # 3-day aggregates for `date` shaped like the training rows: the
+        # stored days before `date` in the window, with today's values as the
+        # last day. None unless the store has an observation on the day
+        # before `date`, so history from another period never stands in for it.
+        if isinstance(date, dt.datetime):
+            date = date.date()
+        day = _day(_timestamp(date))
+        with self._lock:
+            series = self._series.get(district)
+            if series is None or day - 1 not in series.buckets:
+                return None
+            buckets = [b.copy() for b in series.days(day - self.window_days + 1, day - 1)]
+        return _combine(buckets, (temp_c, rh, pressure, rain_mm))
+
+    # ---------- persistence ----------
+    def save(self, path: str = OBS_PATH):
+        # the day buckets are all that is needed to resume
+        arrays = {"window": np.array([self.window])}
+        with self._lock:
+            for i, district in enumerate(DISTRICTS):
+                series = self._series.get(district)
+                if series is None or series.last_ts is None:
+                    continue
+                arrays[f"days_{i}"] = np.array(list(series.buckets), dtype=np.int64)
+                arrays[f"buckets_{i}"] = np.array(list(series.buckets.values()))
+                arrays[f"last_ts_{i}"] = np.array([series.last_ts])
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = OBS_PATH):
+        with np.load(path) as data:
+            store = cls(float(data["window"][0]))
+            for i, district in enumerate(DISTRICTS):
+                if f"days_{i}" in data:
+                    series = store._series[district] = store._new_series()
+                    for day, bucket in zip(data[f"days_{i}"], data[f"buckets_{i}"]):
+                        series.buckets[int(day)] = bucket.astype(np.float64)
+                    series.last_ts = float(data[f"last_ts_{i}"][0])
+                elif f"ts_{i}" in data:
+                    # files written before the day buckets hold raw rows
+                    for ts, row in zip(data[f"ts_{i}"], data[f"values_{i}"]):
+                        store.append(district, float(ts), *row)
+        return store
+
+
+_store = None
+_store_mtime = None
+_store_lock = threading.Lock()
+
+
+def get_observation_store(path: str = OBS_PATH):
+    # process-wide store; reloaded when another process (the scheduler) has
+    # saved a newer copy to `path`
+    global _store, _store_mtime
+    with _store_lock:
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if _store is None or (mtime is not None and mtime != _store_mtime):
+            _store = ObservationStore.load(path) if mtime is not None else ObservationStore()
+            _store_mtime = mtime
+        return _store
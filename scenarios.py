@@ -0,0 +1,243 @@
+"""What-if scenario sweeps for one district and day.
+
+Ranges for any of the build_feature_row weather inputs are expanded into
+their Cartesian grid and scored in one batch: the base conditions are
+encoded once, the row is repeated for every grid point and only the swept
+columns (plus THI, blank 3-day aggregates and the derived pressure drop
+when they depend on a swept input) are overwritten before a single predict_proba per member.
+
+    python scenarios.py --district Ranchi --temp-c 31 --rh 75 --pressure 968 \\
+        --wind 2 --rain-mm 4 --sweep pressure_drop=-8:2:21 --sweep rain_3day_sum=0:60:31
+"""
+import argparse
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from forecast import (
+    DISTRICT_COORDS,
+    DISTRICTS,
+    NUMERIC_FEATURES,
+    ROLLING_SOURCES,
+    compute_thi,
+    get_encoder,
+    get_model,
+    predict_ensemble_proba,
+    resolve_rolling,
+    risk_labels,
+    today_ist,
+)
+from metrics import timed
+
+# the build_feature_row inputs that can be swept
+SWEEPABLE = [arg for arg, _ in NUMERIC_FEATURES]
+COLUMNS = dict(NUMERIC_FEATURES)
+MAX_ROWS = 1_000_000
+CHUNK_ROWS = 50_000
+
+
+def axis_values(spec):
+    # "start:stop:num" (inclusive linspace), "v1,v2,..." or any 1-d sequence
+    if isinstance(spec, str):
+        if ":" in spec:
+            start, stop, num = spec.split(":")
+            return np.linspace(float(start), float(stop), int(num))
+        return np.array([float(v) for v in spec.split(",")])
+    values = np.asarray(spec, dtype=np.float64).ravel()
+    if values.size == 0:
+        raise ValueError("Sweep axis has no values.")
+    return values
+
+
+def resolve_base(district: str, base: dict, date: dt.date = None):
+    # every SWEEPABLE input as a float: the district centroid for missing
+    # coordinates and resolve_rolling for missing 3-day aggregates
+    base = dict(base)
+    if "wind" in base:
+        base.setdefault("windspeed", base.pop("wind"))
+    lat, lon = DISTRICT_COORDS[district]
+    if base.get("lat") is None:
+        base["lat"] = lat
+    if base.get("lon") is None:
+        base["lon"] = lon
+    rolling = resolve_rolling(
+        district, base["temp_c"], base["rh"], base["pressure"], base["rain_mm"],
+        base.get("rain_3day_sum"), base.get("temp_3day_mean"), base.get("rh_3day_mean"),
+        base.get("pres_3day_mean"), base.get("pressure_drop"), date,
+    )
+    base.update(zip(("rain_3day_sum", "temp_3day_mean", "rh_3day_mean", "pres_3day_mean", "pressure_drop"), rolling))
+    return {name: float(base[name]) for name in SWEEPABLE}
+
+def follow_sources(date: dt.date, district: str, given: dict, axes):
+    # 3-day aggregates left blank are resolved from today's values, so they
+    # move with a swept temp_c, rh, pressure or rain_mm. Each depends on its
+    # own source only, so it is resolved once per value on that source's axis
+    # and broadcast over the grid.
+    shape = tuple(len(values) for _, values in axes)
+    names = [name for name, _ in axes]
+    derived = {}
+    for k, (src, values) in enumerate(axes):
+        follow = [a for a, s in ROLLING_SOURCES.items() if s == src and given.get(a) is None and a not in names]
+        if not follow:
+            continue
+        resolved = [resolve_base(district, {**given, src: float(v)}, date) for v in values]
+        along = [1] * len(shape)
+        along[k] = -1
+        for agg in follow:
+            column = np.array([r[agg] for r in resolved]).reshape(along)
+            derived[agg] = np.broadcast_to(column, shape).ravel()
+    return derived
+
+# ================== SURFACE ==================
+class Surface:
+    def __init__(self, axes, prob, base, meta):
+        self.axes = axes  # [(input name, values)], in grid order
+        self.prob = prob  # float64, shape (len(values) for each axis)
+        self.base = base  # the resolved inputs every grid point starts from
+        self.meta = meta
+
+    @property
+    def names(self):
+        return [name for name, _ in self.axes]
+
+    @property
+    def shape(self):
+        return self.prob.shape
+
+    def to_frame(self):
+        # one row per grid point: the swept inputs, probability and risk label
+        mesh = np.meshgrid(*(values for _, values in self.axes), indexing="ij")
+        df = pd.DataFrame({name: m.ravel() for name, m in zip(self.names, mesh)})
+        df["probability"] = self.prob.ravel()
+        df["risk"] = risk_labels(df["probability"].to_numpy())
+        return df
+
+    def pivot(self, index: str, columns: str):
+        # 2-d probability table; other axes are averaged out
+        keep = [self.names.index(index), self.names.index(columns)]
+        other = tuple(i for i in range(len(self.axes)) if i not in keep)
+        prob = self.prob.mean(axis=other) if other else self.prob
+        if keep[0] > keep[1]:
+            prob = prob.T
+        return pd.DataFrame(prob, index=self.axes[keep[0]][1], columns=self.axes[keep[1]][1])
+
+# ================== SWEEP ==================
+@timed("scenario_sweep")
+def sweep(
+    date: dt.date,
+    district: str,
+    base: dict,
+    ranges: dict,
+    ens=None,
+    chunk_rows: int = CHUNK_ROWS,
+    max_rows: int = MAX_ROWS,
+):
+    # base: build_feature_row weather arguments (lat/lon and the 3-day
+    # aggregates are optional, as on the prediction page); ranges: input
+    # name -> axis_values spec. Returns a Surface over the ranges' grid.
+    if district not in DISTRICTS:
+        raise ValueError(f"Unknown district: {district}")
+    unknown = [name for name in ranges if name not in SWEEPABLE]
+    if unknown:
+        raise ValueError(f"Cannot sweep: {', '.join(unknown)} (choose from {', '.join(SWEEPABLE)})")
+    if not ranges:
+        raise ValueError("No sweep ranges given.")
+    if ens is None:
+        ens = get_model()
+
+    axes = [(name, axis_values(spec)) for name, spec in ranges.items()]
+    shape = tuple(len(values) for _, values in axes)
+    n = int(np.prod(shape))
+    if n > max_rows:
+        raise ValueError(f"Sweep has {n} points; the limit is {max_rows}.")
+
+    # the pressure drop follows a swept pressure or 3-day mean unless it was given
+    derive_drop = base.get("pressure_drop") is None and "pressure_drop" not in ranges
+    given = base
+    base = resolve_base(district, given, date)
+
+    encoder = get_encoder(ens["feature_list"])
+    row = encoder.encode_row(date, district, **base)[0]
+    mesh = np.meshgrid(*(values for _, values in axes), indexing="ij")
+    swept = {name: m.ravel() for (name, _), m in zip(axes, mesh)}
+    swept.update(follow_sources(date, district, given, axes))
+
+    def column(name, start, stop):
+        return swept[name][start:stop] if name in swept else base[name]
+
+    prob = np.empty(n, dtype=np.float64)
+    buf = np.empty((min(chunk_rows, n), encoder.n_features), dtype=np.float64)
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        X = buf[: stop - start]
+        X[:] = row
+        for name, values in swept.items():
+            i = encoder.index.get(COLUMNS[name], -1)
+            if i >= 0:
+                X[:, i] = values[start:stop]
+        if encoder.thi_col >= 0 and ("temp_c" in swept or "rh" in swept):
+            X[:, encoder.thi_col] = compute_thi(column("temp_c", start, stop), column("rh", start, stop))
+        i = encoder.index.get(COLUMNS["pressure_drop"], -1)
+        if i >= 0 and derive_drop and ("pressure" in swept or "pres_3day_mean" in swept):
+            X[:, i] = column("pressure", start, stop) - column("pres_3day_mean", start, stop)
+        prob[start:stop] = predict_ensemble_proba(X, ens)
+
+    meta = {
+        "date": date.isoformat(),
+        "district": district,
+        "points": n,
+        "model_version": getattr(ens, "version", None),
+    }
+    return Surface(axes, prob.reshape(shape), base, meta)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a what-if grid of weather inputs for one district.")
+    parser.add_argument("--date", default=today_ist().isoformat())
+    parser.add_argument("--district", required=True, choices=DISTRICTS)
+    parser.add_argument("--temp-c", type=float, required=True)
+    parser.add_argument("--rh", type=float, required=True)
+    parser.add_argument("--pressure", type=float, required=True)
+    parser.add_argument("--wind", type=float, required=True)
+    parser.add_argument("--rain-mm", type=float, required=True)
+    parser.add_argument(
+        "--sweep",
+        action="append",
+        required=True,
+        metavar="NAME=SPEC",
+        help="Input to sweep, as name=start:stop:num or name=v1,v2,... (repeatable).",
+    )
+    parser.add_argument("--out", default=None, help="Write every grid point to this CSV.")
+    args = parser.parse_args(argv)
+
+    ranges = {}
+    for item in args.sweep:
+        name, _, spec = item.partition("=")
+        if not spec:
+            parser.error(f"--sweep expects NAME=SPEC, got {item!r}")
+        ranges[name] = spec
+    base = {
+        "temp_c": args.temp_c,
+        "rh": args.rh,
+        "pressure": args.pressure,
+        "windspeed": args.wind,
+        "rain_mm": args.rain_mm,
+    }
+    try:
+        surface = sweep(dt.date.fromisoformat(args.date), args.district, base, ranges)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    frame = surface.to_frame()
+    if args.out:
+        frame.to_csv(args.out, index=False)
+    if len(surface.axes) == 2:
+        print(surface.pivot(*surface.names).round(3).to_string())
+    else:
+        print(frame.sort_values("probability", ascending=False).head(20).to_string(index=False))
+    print(f"Scored {surface.meta['points']} scenarios for {args.district}.")
+
+
+if __name__ == "__main__":
+    main()
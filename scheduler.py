@@ -0,0 +1,247 @@
+"""Keeps a precomputed statewide risk table warm.
+
+Every N minutes the scheduler fetches current weather for all districts,
+scores them in one batch and publishes a timestamped risk table to SQLite.
+The Streamlit app and the API only read the latest table.
+
+    python scheduler.py --interval 15
+    python scheduler.py --once
+    python scheduler.py --interval 15 --alerts alerts.json   # also notify subscribers
+"""
+import argparse
+import datetime as dt
+import logging
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from forecast import DISTRICT_COORDS, DISTRICTS, score_batch, today_ist
+from metrics import parse_addr, start_exporter
+from observations import OBS_PATH, get_observation_store
+from weather import fetch_districts
+
+RISK_DB = "risk_table.sqlite"
+KEEP_ISSUES = 96
+
+log = logging.getLogger("scheduler")
+
+# ================== RISK TABLE STORE ==================
+class RiskTableStore:
+    # Each refresh is written in a single transaction, so readers always see
+    # either the previous table or the new one, never a mix.
+
+    COLUMNS = [
+        "issued_at",
+        "date",
+        "district",
+        "temp_c",
+        "rh",
+        "pressure",
+        "wind",
+        "rain_mm",
+        "probability",
+        "prediction",
+        "risk",
+    ]
+
+    def __init__(self, path: str = RISK_DB):
+        self.path = path
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS risk_table (
+                    issued_at TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    district TEXT NOT NULL,
+                    temp_c REAL,
+                    rh REAL,
+                    pressure REAL,
+                    wind REAL,
+                    rain_mm REAL,
+                    probability REAL NOT NULL,
+                    prediction INTEGER NOT NULL,
+                    risk TEXT NOT NULL,
+                    PRIMARY KEY (issued_at, district)
+                )
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fetch_errors (
+                    issued_at TEXT NOT NULL,
+                    district TEXT NOT NULL,
+                    error TEXT NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def publish(self, table: pd.DataFrame, issued_at: str, errors: dict = None, keep: int = KEEP_ISSUES):
+        rows = table.assign(issued_at=issued_at, date=table["date"].astype(str))[self.COLUMNS]
+        with self._connect() as con:
+            con.executemany(
+                f"INSERT OR REPLACE INTO risk_table ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                rows.itertuples(index=False, name=None),
+            )
+            con.executemany(
+                "INSERT INTO fetch_errors (issued_at, district, error) VALUES (?, ?, ?)",
+                [(issued_at, name, err) for name, err in (errors or {}).items()],
+            )
+            for table_name in ("risk_table", "fetch_errors"):
+                con.execute(
+                    f"DELETE FROM {table_name} WHERE issued_at NOT IN "
+                    "(SELECT DISTINCT issued_at FROM risk_table ORDER BY issued_at DESC LIMIT ?)",
+                    (keep,),
+                )
+
+    def latest_issue(self):
+        with self._connect() as con:
+            row = con.execute("SELECT MAX(issued_at) FROM risk_table").fetchone()
+        return row[0]
+
+    def latest(self):
+        with self._connect() as con:
+            return pd.read_sql_query(
+                "SELECT * FROM risk_table WHERE issued_at = (SELECT MAX(issued_at) FROM risk_table) "
+                "ORDER BY probability DESC",
+                con,
+            )
+
+    def lookup(self, district: str):
+        with self._connect() as con:
+            cur = con.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM risk_table WHERE district = ? "
+                "ORDER BY issued_at DESC LIMIT 1",
+                (district,),
+            )
+            row = cur.fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+# ================== REFRESH ==================
+def refresh_once(
+    store: RiskTableStore,
+    threshold: float = 0.5,
+    max_concurrency: int = 8,
+    rate_limit: float = None,
+    obs_path: str = OBS_PATH,
+    dispatcher=None,
+):
+    issued_at = dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds")
+    coords = {d: DISTRICT_COORDS[d] for d in DISTRICTS}
+    weather, errors = fetch_districts(coords, max_concurrency=max_concurrency, rate_limit=rate_limit)
+    if not weather:
+        log.warning("No weather fetched for any district: %s", errors)
+        return None, errors
+
+    # each fetch is also an observation; the store turns the history into the
+    # 3-day aggregates the model expects
+    observations = get_observation_store(obs_path)
+    now = dt.datetime.now(dt.timezone.utc)
+    for d in DISTRICTS:
+        if d in weather:
+            observations.append_weather(d, now, weather[d])
+    observations.save(obs_path)
+
+    # the IST day the observation store buckets by
+    today = today_ist()
+    records = []
+    for d in DISTRICTS:
+        if d not in weather:
+            continue
+        w = weather[d]
+        # the same date-based aggregates build_feature_row and score_batch use
+        agg = observations.rolling(d, today, w["temp_c"], w["rh"], w["pressure"], w["rain_mm"]) or {}
+        records.append({"date": today, "district": d, "lat": coords[d][0], "lon": coords[d][1], **w, **agg})
+    scored = score_batch(records, threshold=threshold)
+    table = pd.concat([scored, pd.DataFrame(records)[["temp_c", "rh", "pressure", "wind", "rain_mm"]]], axis=1)
+    store.publish(table, issued_at, errors)
+    log.info("Published %d districts at %s (%d fetch errors)", len(table), issued_at, len(errors))
+    if dispatcher is not None:
+        # only enqueues; an alerts.AlertDispatcher delivers on its own thread
+        dispatcher.submit(table, issued_at)
+    return issued_at, errors
+
+
+class RiskScheduler:
+    # Runs refresh_once every `interval` seconds on a daemon thread. A failed
+    # refresh is logged and the previous table stays published.
+
+    def __init__(self, store: RiskTableStore = None, interval: float = 900.0, **refresh_kwargs):
+        self.store = store or RiskTableStore()
+        self.interval = interval
+        self.refresh_kwargs = refresh_kwargs
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                refresh_once(self.store, **self.refresh_kwargs)
+            except Exception:
+                log.exception("Risk table refresh failed")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="risk-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish a precomputed district risk table.")
+    parser.add_argument("--db", default=RISK_DB)
+    parser.add_argument("--observations", default=OBS_PATH, help="Rolling observation store (.npz).")
+    parser.add_argument("--interval", type=float, default=15.0, help="Minutes between refreshes.")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Max OpenWeather calls per second.")
+    parser.add_argument("--once", action="store_true", help="Refresh once and exit.")
+    parser.add_argument("--alerts", default=None, help="Subscribers (JSON) to alert on High / Very High risk.")
+    parser.add_argument("--dry-run-alerts", action="store_true", help="Log alerts instead of sending them.")
+    parser.add_argument("--metrics-addr", default=None, help="Serve GET /metrics on this port or host:port.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.metrics_addr:
+        host, port = parse_addr(args.metrics_addr)
+        if start_exporter(port, host) is None:
+            parser.error(f"Cannot serve metrics on {args.metrics_addr}")
+    store = RiskTableStore(args.db)
+    kwargs = {
+        "threshold": args.threshold,
+        "max_concurrency": args.concurrency,
+        "rate_limit": args.rate_limit,
+        "obs_path": args.observations,
+    }
+    dispatcher = None
+    if args.alerts:
+        from alerts import AlertDispatcher, build_sinks, load_subscribers
+
+        dispatcher = AlertDispatcher(load_subscribers(args.alerts), build_sinks(args.dry_run_alerts))
+        kwargs["dispatcher"] = dispatcher
+    try:
+        if args.once:
+            refresh_once(store, **kwargs)
+            return
+        RiskScheduler(store, interval=args.interval * 60, **kwargs).run_forever()
+    finally:
+        if dispatcher is not None:
+            dispatcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Headless JSON prediction service (plain WSGI, no Streamlit).
+
+    python service.py --port 8000 --workers 4
+    gunicorn -w 4 -b 0.0.0.0:8000 service:app
+
+Endpoints:
+    GET  /health
+    POST /predict          one record   -> probability, prediction, risk
+    POST /predict/batch    {"records": [...], "threshold": 0.5}
+    GET  /risk/latest      latest table published by scheduler.py
+    GET  /metrics          Prometheus text format (see metrics.py)
+    GET  /debug/profile    collapsed stacks from the sampling profiler
+
+With --workers N every worker process binds the same port and the kernel
+picks one per connection, so /metrics and /debug/profile describe only the
+worker that answered. To scrape every worker, run single-worker services
+on separate ports instead.
+"""
+import argparse
+import datetime as dt
+import json
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from forecast import (
+    DISTRICT_COORDS,
+    DISTRICTS,
+    clear_model,
+    get_model,
+    get_prediction_cache,
+    risk_label,
+    score_batch,
+    today_ist,
+)
+from metrics import REQUEST_LATENCY, REQUESTS, get_profiler, render
+from scheduler import RISK_DB, RiskTableStore
+
+log = logging.getLogger("service")
+
+# LIGHTNING_FAST_PATH=1 (or --fast-path) serves predictions from the
+# pure-NumPy export in fastpath.py instead of the sklearn pipelines
+FAST_PATH = os.environ.get("LIGHTNING_FAST_PATH", "") == "1"
+# float32 / int8 (implies the fast path) trade a little accuracy for memory
+PRECISION = os.environ.get("LIGHTNING_PRECISION", "float64")
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_BATCH_ROWS = 100_000
+ROW_FIELDS = ["temp_c", "rh", "pressure", "windspeed", "rain_mm"]
+OPTIONAL_FIELDS = ["rain_3day_sum", "temp_3day_mean", "rh_3day_mean", "pres_3day_mean", "pressure_drop"]
+
+
+class BadRequest(Exception):
+    pass
+
+
+_fast = None
+
+
+def ensemble():
+    global _fast
+    if not FAST_PATH and PRECISION == "float64":
+        return get_model()
+    if _fast is not None and _fast.version is None:
+        # compiled from the pickle, which cannot change under a running worker
+        return _fast
+    model = get_model()
+    version = getattr(model, "version", None)
+    if _fast is None or _fast.version != version:
+        from fastpath import compile_ensemble
+
+        # recompiled when the model store hot-swaps to a new version
+        _fast = compile_ensemble(model, precision=PRECISION)
+        if version is None and PRECISION != "float64":
+            # the point of reduced precision is a smaller worker, so let the
+            # sklearn pipelines go once the compiled copy exists (store
+            # members are shared mmaps and cost nothing to keep)
+            clear_model()
+    return _fast
+
+# ================== HANDLERS ==================
+def _threshold(payload: dict):
+    try:
+        threshold = float(payload.get("threshold", 0.5))
+    except (TypeError, ValueError):
+        raise BadRequest("threshold must be a number.") from None
+    if math.isnan(threshold) or not 0.0 <= threshold <= 1.0:
+        raise BadRequest("threshold must be between 0 and 1.")
+    return threshold
+
+
+def predict_one(payload: dict):
+    try:
+        date = dt.date.fromisoformat(str(payload.get("date") or today_ist().isoformat()))
+    except ValueError:
+        raise BadRequest("date must be YYYY-MM-DD.") from None
+    district = payload.get("district")
+    if district not in DISTRICTS:
+        raise BadRequest(f"Unknown district: {district}")
+    if "windspeed" not in payload and "wind" in payload:
+        payload = {**payload, "windspeed": payload["wind"]}
+    missing = [f for f in ROW_FIELDS if payload.get(f) is None]
+    if missing:
+        raise BadRequest(f"Missing fields: {', '.join(missing)}")
+
+    lat, lon = DISTRICT_COORDS[district]
+    try:
+        values = {f: float(payload[f]) for f in ROW_FIELDS}
+        values.update({f: float(payload[f]) for f in OPTIONAL_FIELDS if payload.get(f) is not None})
+        lat = float(payload.get("lat", lat))
+        lon = float(payload.get("lon", lon))
+    except (TypeError, ValueError):
+        raise BadRequest("Weather fields must be numbers.") from None
+    # JSON NaN/Infinity parse as floats; a NaN probability would read as "Very High"
+    if not all(math.isfinite(v) for v in (*values.values(), lat, lon)):
+        raise BadRequest("Weather fields must be finite numbers.")
+    threshold = _threshold(payload)
+
+    ens = ensemble()
+    pred, prob = get_prediction_cache().predict(
+        date=date, district=district, lat=lat, lon=lon, **values, threshold=threshold, ens=ens
+    )
+    return {
+        "date": date.isoformat(),
+        "district": district,
+        "probability": prob,
+        "prediction": pred,
+        "risk": risk_label(prob),
+        "threshold": threshold,
+    }
+
+
+def predict_many(payload: dict):
+    records = payload.get("records")
+    if not isinstance(records, list) or not records:
+        raise BadRequest("records must be a non-empty list.")
+    if len(records) > MAX_BATCH_ROWS:
+        raise BadRequest(f"At most {MAX_BATCH_ROWS} records per request.")
+    threshold = _threshold(payload)
+    try:
+        table = score_batch(records, threshold=threshold, ens=ensemble())
+    except (ValueError, TypeError) as e:
+        raise BadRequest(str(e)) from None
+    if table["probability"].isna().any():
+        raise BadRequest("Weather fields must be finite numbers.")
+    table["date"] = table["date"].astype(str)
+    return {"threshold": threshold, "results": table.to_dict(orient="records")}
+
+
+def latest_risk(_payload=None):
+    if not os.path.exists(RISK_DB):
+        return {"issued_at": None, "results": []}
+    table = RiskTableStore(RISK_DB).latest()
+    issued_at = table["issued_at"].iloc[0] if len(table) else None
+    return {"issued_at": issued_at, "results": table.drop(columns="issued_at").to_dict(orient="records")}
+
+
+ROUTES = {
+    ("GET", "/health"): lambda _payload: {
+        "status": "ok",
+        "pid": os.getpid(),
+        "prediction_cache_hit_rate": get_prediction_cache().hit_rate(),
+    },
+    ("POST", "/predict"): predict_one,
+    ("POST", "/predict/batch"): predict_many,
+    ("GET", "/risk/latest"): latest_risk,
+}
+
+
+def profile_text():
+    profiler = get_profiler()
+    if not profiler.running:
+        return "# profiler is off; start the service with --profile or LIGHTNING_PROFILE=1\n"
+    return profiler.collapsed()
+
+
+# plain-text endpoints for scrapers and flamegraph tools
+TEXT_ROUTES = {
+    ("GET", "/metrics"): render,
+    ("GET", "/debug/profile"): profile_text,
+}
+
+# ================== WSGI APP ==================
+def _respond(start_response, status: str, body: dict):
+    data = json.dumps(body).encode("utf-8")
+    start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(data)))])
+    return [data]
+
+
+def _respond_text(start_response, body: str):
+    data = body.encode("utf-8")
+    start_response(
+        "200 OK", [("Content-Type", "text/plain; version=0.0.4"), ("Content-Length", str(len(data)))]
+    )
+    return [data]
+
+
+def app(environ, start_response):
+    method = environ["REQUEST_METHOD"]
+    path = environ.get("PATH_INFO", "/").rstrip("/") or "/"
+    if (method, path) in TEXT_ROUTES:
+        return _respond_text(start_response, TEXT_ROUTES[method, path]())
+
+    route = path if any(p == path for _, p in ROUTES) else "other"
+    status = []
+    started = time.perf_counter()
+
+    def counted_start_response(status_line, headers):
+        status.append(status_line.split(" ", 1)[0])
+        return start_response(status_line, headers)
+
+    try:
+        return _handle(environ, counted_start_response, method, path)
+    finally:
+        REQUEST_LATENCY.observe(time.perf_counter() - started, route)
+        REQUESTS.inc(route, status[0] if status else "500")
+
+
+def _handle(environ, start_response, method: str, path: str):
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        if any(p == path for _, p in ROUTES):
+            return _respond(start_response, "405 Method Not Allowed", {"error": "Method not allowed."})
+        return _respond(start_response, "404 Not Found", {"error": "Not found."})
+
+    payload = {}
+    if method == "POST":
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length > MAX_BODY_BYTES:
+            return _respond(start_response, "413 Payload Too Large", {"error": "Request body too large."})
+        try:
+            payload = json.loads(environ["wsgi.input"].read(length) or b"{}")
+        except ValueError:
+            return _respond(start_response, "400 Bad Request", {"error": "Body must be JSON."})
+        if not isinstance(payload, dict):
+            return _respond(start_response, "400 Bad Request", {"error": "Body must be a JSON object."})
+
+    try:
+        return _respond(start_response, "200 OK", handler(payload))
+    except BadRequest as e:
+        return _respond(start_response, "400 Bad Request", {"error": str(e)})
+    except Exception:
+        # the details go to the log, not to the client
+        log.exception("%s %s failed", method, path)
+        return _respond(start_response, "500 Internal Server Error", {"error": "Prediction failed."})
+
+# ================== SERVER ==================
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def server_bind(self):
+        # every worker binds the same port; the kernel spreads connections
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    fast_path: bool = False,
+    profile: bool = False,
+    precision: str = None,
+):
+    global FAST_PATH, PRECISION
+    FAST_PATH = FAST_PATH or fast_path
+    PRECISION = precision or PRECISION
+    if profile:
+        get_profiler().start()
+    ensemble()  # load once per worker, before the first request
+    with make_server(host, port, app, server_class=_ThreadingWSGIServer, handler_class=_QuietHandler) as httpd:
+        httpd.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve lightning risk predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes on one port (each serves its own /metrics)."
+    )
+    parser.add_argument("--fast-path", action="store_true", help="Serve from the pure-NumPy model export.")
+    parser.add_argument("--profile", action="store_true", help="Run the sampling profiler (GET /debug/profile).")
+    parser.add_argument(
+        "--precision", choices=["float64", "float32", "int8"], default=None, help="Fast-path precision."
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.workers <= 1 or not hasattr(socket, "SO_REUSEPORT"):
+        serve(args.host, args.port, args.fast_path, args.profile, args.precision)
+        return
+    workers = [
+        multiprocessing.Process(
+            target=serve,
+            args=(args.host, args.port, args.fast_path, args.profile, args.precision),
+            daemon=True,
+        )
+        for _ in range(args.workers)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+
+if __name__ == "__main__":
+    main()
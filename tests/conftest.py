@@ -0,0 +1,28 @@
+import json
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# the modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def pytest_configure(config):
+    # forecast.py silences this for the app; pytest resets warning filters
+    config.addinivalue_line("filterwarnings", "ignore:X does not have valid feature names")
+
+
+@pytest.fixture(scope="session")
+def synthetic_ens():
+    from fixtures import synthetic_model
+
+    return synthetic_model(n=1500)
+
+
+@pytest.fixture
+def forecast_payload():
+    # /data/2.5/forecast response for Ranchi (40 x 3-hourly steps)
+    with open(os.path.join(HERE, "data", "openweather_forecast_ranchi.json"), encoding="utf-8") as f:
+        return json.load(f)
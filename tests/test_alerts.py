@@ -0,0 +1,156 @@
+import threading
+
+import pytest
+
+from alerts import AlertDispatcher, DeliveryError, MemorySink, Subscriber, WebhookSink
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def table(*rows):
+    return [{"district": d, "risk": risk, "probability": p, "date": "2024-06-15"} for d, risk, p in rows]
+
+
+@pytest.fixture
+def make_dispatcher():
+    dispatchers = []
+
+    def make(sink, subscribers=None, **kwargs):
+        subscribers = subscribers or [Subscriber("ops", sink.name, "ops@example.org")]
+        kwargs.setdefault("backoff", 0.001)
+        d = AlertDispatcher(subscribers, {sink.name: sink}, **kwargs)
+        dispatchers.append(d)
+        return d
+
+    yield make
+    for d in dispatchers:
+        d.close(timeout=5.0)
+
+
+def sent_districts(sink):
+    return [[(a["district"], a["risk"]) for a in alerts] for _, alerts in sink.sent]
+
+
+def test_only_high_and_above_alert(make_dispatcher):
+    sink = MemorySink()
+    d = make_dispatcher(sink)
+    assert d.submit(table(("Ranchi", "High", 0.7), ("Dumka", "Moderate", 0.5), ("Gumla", "Very High", 0.9))) == 2
+    d.flush(5.0)
+    assert sent_districts(sink) == [[("Ranchi", "High"), ("Gumla", "Very High")]]
+
+
+def test_dedup_within_window(make_dispatcher):
+    sink, clock = MemorySink(), Clock()
+    d = make_dispatcher(sink, dedup_window=3600.0, clock=clock)
+    rows = table(("Ranchi", "High", 0.7))
+    d.submit(rows)
+    d.flush(5.0)
+    clock.now += 3599.0
+    d.submit(rows)
+    d.flush(5.0)
+    assert len(sink.sent) == 1
+    assert d.stats["deduped"] == 1
+
+    clock.now += 1.0  # the window has passed
+    d.submit(rows)
+    d.flush(5.0)
+    assert len(sink.sent) == 2
+
+
+def test_escalation_goes_out_within_window(make_dispatcher):
+    sink = MemorySink()
+    d = make_dispatcher(sink, clock=Clock())
+    d.submit(table(("Ranchi", "High", 0.7)))
+    d.flush(5.0)
+    d.submit(table(("Ranchi", "Very High", 0.9)))
+    d.flush(5.0)
+    # a repeated High after the escalation is still deduplicated
+    d.submit(table(("Ranchi", "High", 0.7)))
+    d.flush(5.0)
+    assert sent_districts(sink) == [[("Ranchi", "High")], [("Ranchi", "Very High")]]
+    assert d.stats["deduped"] == 1
+
+
+def test_failed_send_releases_its_key(make_dispatcher):
+    sink = MemorySink(fail_first=1)
+    d = make_dispatcher(sink, retries=0, clock=Clock())
+    rows = table(("Ranchi", "High", 0.7))
+    d.submit(rows)
+    d.flush(5.0)
+    assert sink.sent == [] and d.stats["failed"] == 1
+
+    d.submit(rows)
+    d.flush(5.0)
+    assert sent_districts(sink) == [[("Ranchi", "High")]]
+    assert d.stats["deduped"] == 0
+
+
+def test_retries_then_delivers(make_dispatcher):
+    sink = MemorySink(fail_first=2)
+    d = make_dispatcher(sink, retries=3)
+    d.submit(table(("Ranchi", "High", 0.7)))
+    d.flush(5.0)
+    assert sink.attempts == 3 and len(sink.sent) == 1
+    assert d.stats["retries"] == 2 and d.stats["sent"] == 1
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.posts = 0
+
+    def post(self, url, json=None, timeout=None):
+        self.posts += 1
+        return FakeResponse(self.status_code)
+
+
+@pytest.mark.parametrize("status, posts", [(400, 1), (404, 1), (429, 4), (503, 4)])
+def test_webhook_retries_only_server_errors(make_dispatcher, status, posts):
+    session = FakeSession(status)
+    sink = WebhookSink(session=session)
+    subscriber = Subscriber("ops", "webhook", "https://hooks.example/risk")
+    d = make_dispatcher(sink, [subscriber], retries=3)
+    d.submit(table(("Ranchi", "High", 0.7)))
+    d.flush(5.0)
+    assert session.posts == posts
+    assert d.stats["failed"] == 1 and d.stats["retries"] == posts - 1
+
+
+def test_non_retryable_error_is_not_retried(make_dispatcher):
+    class Rejecting(MemorySink):
+        def send(self, subscriber, alerts):
+            with self._lock:
+                self.attempts += 1
+            raise DeliveryError("rejected", retryable=False)
+
+    sink = Rejecting()
+    d = make_dispatcher(sink, retries=5)
+    d.submit(table(("Ranchi", "High", 0.7)))
+    d.flush(5.0)
+    assert sink.attempts == 1 and d.stats["retries"] == 0
+
+
+def test_full_queue_drops_batches(make_dispatcher):
+    sink = MemorySink()
+    d = make_dispatcher(sink, queue_size=1).start()
+    # hold the loop so the batches pile up in the queue
+    gate = threading.Event()
+    d._loop.call_soon_threadsafe(gate.wait, 5.0)
+    for district in ("Ranchi", "Dumka", "Gumla"):
+        d.submit(table((district, "High", 0.7)))
+    gate.set()
+    d.flush(5.0)
+    assert d.stats["dropped"] == 2
+    assert d.stats["batches"] == 1
+    assert sent_districts(sink) == [[("Ranchi", "High")]]
@@ -0,0 +1,103 @@
+import datetime as dt
+import json
+
+import numpy as np
+import pytest
+from sklearn.metrics import average_precision_score, roc_auc_score
+
+import calibration
+from calibration import MIN_POSITIVES, ScoreHistogram, curve_metrics, recommend, recommended_threshold
+from forecast import DISTRICTS, SEASONS
+
+
+def labelled_scores(n, seed=0, positive_rate=0.2):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < positive_rate).astype(int)
+    # informative but overlapping scores, with a few exact 0 and 1
+    prob = np.clip(rng.beta(2 + 3 * y, 5 - 2 * y), 0.0, 1.0)
+    prob[:5], prob[5:10] = 0.0, 1.0
+    return prob, y
+
+
+@pytest.mark.parametrize("n_bins", [100, 1000])
+def test_streamed_curves_match_sklearn(n_bins):
+    prob, y = labelled_scores(20_000)
+    hist = ScoreHistogram(n_bins)
+    # streamed in chunks, spread over groups
+    for chunk in np.array_split(np.arange(len(y)), 7):
+        hist.add(prob[chunk], y[chunk], chunk % len(DISTRICTS), chunk % len(SEASONS))
+    metrics = curve_metrics(hist.select()[0])
+    assert metrics["rows"] == len(y) and metrics["positives"] == y.sum()
+
+    # exact on the binned scores: rows in one bin are ties
+    binned = np.minimum((prob * n_bins).astype(int), n_bins - 1)
+    assert metrics["roc_auc"] == pytest.approx(roc_auc_score(y, binned), abs=1e-12)
+    assert metrics["average_precision"] == pytest.approx(average_precision_score(y, binned), abs=1e-12)
+    # and within the bin resolution of the raw scores
+    assert metrics["roc_auc"] == pytest.approx(roc_auc_score(y, prob), abs=2.0 / n_bins)
+    assert metrics["average_precision"] == pytest.approx(average_precision_score(y, prob), abs=2.0 / n_bins)
+
+
+def test_group_curves_match_sklearn():
+    prob, y = labelled_scores(20_000, seed=1)
+    district_idx = np.arange(len(y)) % len(DISTRICTS)
+    season_idx = (np.arange(len(y)) // len(DISTRICTS)) % len(SEASONS)
+    hist = ScoreHistogram()
+    hist.add(prob, y, district_idx, season_idx)
+    d, s = 3, SEASONS.index("Monsoon")
+    cell = (district_idx == d) & (season_idx == s)
+    metrics = curve_metrics(hist.select(DISTRICTS[d], "Monsoon")[0])
+    assert metrics["rows"] == cell.sum()
+    binned = np.minimum((prob[cell] * hist.n_bins).astype(int), hist.n_bins - 1)
+    assert metrics["roc_auc"] == pytest.approx(roc_auc_score(y[cell], binned), abs=1e-12)
+
+
+def sparse_history():
+    # every district-season has plenty of rows and positives except:
+    # Ranchi has too few positives in Winter only, and Dumka has too few
+    # positives in every season
+    rng = np.random.default_rng(2)
+    prob, y, didx, sidx = [], [], [], []
+    for d, district in enumerate(DISTRICTS):
+        for s, season in enumerate(SEASONS):
+            n_pos = 5 if district == "Dumka" or (district == "Ranchi" and season == "Winter") else 80
+            shift = 0.05 * (d % 4) + 0.05 * s
+            pos = np.clip(rng.normal(0.6 + shift, 0.1, n_pos), 0, 1)
+            neg = np.clip(rng.normal(0.3 + shift, 0.1, 300), 0, 1)
+            prob += [pos, neg]
+            y += [np.ones(n_pos, int), np.zeros(300, int)]
+            didx.append(np.full(n_pos + 300, d))
+            sidx.append(np.full(n_pos + 300, s))
+    hist = ScoreHistogram()
+    hist.add(np.concatenate(prob), np.concatenate(y), np.concatenate(didx), np.concatenate(sidx))
+    return hist
+
+
+def test_recommended_threshold_falls_back_for_sparse_cells(tmp_path, monkeypatch):
+    monkeypatch.setattr(calibration, "_reports", {})
+    report = recommend(sparse_history())
+    path = str(tmp_path / "calibration.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+
+    ranchi = report["district"]["Ranchi"]
+    cells = report["district_season"]["Ranchi"]
+    assert not ranchi["fallback"] and not cells["Monsoon"]["fallback"]
+    assert cells["Winter"]["fallback"] and cells["Winter"]["positives"] < MIN_POSITIVES
+    winter = dt.date(2024, 1, 15)
+    monsoon = dt.date(2024, 7, 15)
+    # a sparse cell gets its district's threshold, a full one its own
+    assert recommended_threshold("Ranchi", winter, path) == ranchi["threshold"]
+    assert recommended_threshold("Ranchi", monsoon, path) == cells["Monsoon"]["threshold"]
+    assert recommended_threshold("Ranchi", path=path) == ranchi["threshold"]
+
+    # a sparse district falls back to the overall threshold, and its cells to that
+    dumka = report["district"]["Dumka"]
+    assert dumka["fallback"] and dumka["threshold"] == report["overall"]["threshold"]
+    assert all(cell["fallback"] for cell in report["district_season"]["Dumka"].values())
+    assert recommended_threshold("Dumka", monsoon, path) == report["overall"]["threshold"]
+
+    # no district: season, then overall
+    assert recommended_threshold(None, monsoon, path) == report["season"]["Monsoon"]["threshold"]
+    assert recommended_threshold(path=path) == report["overall"]["threshold"]
+    assert recommended_threshold("Ranchi", monsoon, str(tmp_path / "missing.json"), default=0.42) == 0.42
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import forecast
+import model_store
+from ensemble import EnsembleExecutor
+from fastpath import probe_matrix
+
+
+class Flipped:
+    def __init__(self, pipe):
+        self.pipe = pipe
+
+    def predict_proba(self, X):
+        return self.pipe.predict_proba(X)[:, ::-1]
+
+
+@pytest.fixture(scope="module")
+def X(synthetic_ens):
+    return probe_matrix(synthetic_ens["feature_list"], n=600, seed=4)
+
+
+@pytest.mark.parametrize("mode", ["serial", "thread", "process"])
+def test_modes_match_predict_ensemble_proba(synthetic_ens, X, mode):
+    expected = forecast.predict_ensemble_proba(X, synthetic_ens)
+    with EnsembleExecutor(synthetic_ens, mode=mode, max_workers=3, process_min_rows=1) as executor:
+        prob, timings = executor.predict_proba(X)
+    np.testing.assert_array_equal(prob, expected)
+    assert set(timings) == set(forecast.MEMBERS) | {"total"}
+
+
+def test_follows_a_reloaded_model(synthetic_ens, X, monkeypatch, tmp_path):
+    # a second "version": the same members with gb_pipe's output flipped
+    swapped = dict(synthetic_ens, gb_pipe=Flipped(synthetic_ens["gb_pipe"]))
+    models = iter([synthetic_ens, swapped])
+    monkeypatch.setattr(forecast, "load_model", lambda path=None: next(models))
+    monkeypatch.setattr(model_store, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(forecast, "_model", None)
+    monkeypatch.setattr(forecast, "_host", None)
+
+    with EnsembleExecutor(mode="process", max_workers=2, process_min_rows=1) as executor:
+        before, _ = executor.predict_proba(X)
+        forecast.clear_model()
+        after, _ = executor.predict_proba(X)
+    np.testing.assert_array_equal(before, forecast.predict_ensemble_proba(X, synthetic_ens))
+    np.testing.assert_array_equal(after, forecast.predict_ensemble_proba(X, swapped))
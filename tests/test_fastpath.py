@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from fastpath import (
+    PARITY_ATOL,
+    PRECISION_ATOL,
+    FastPathUnsupported,
+    FastTrees,
+    check_parity,
+    compile_ensemble,
+    probe_matrix,
+    rss_report,
+    size_report,
+)
+from forecast import MEMBERS
+
+
+@pytest.fixture(scope="module")
+def xgb_ens(synthetic_ens):
+    # the synthetic ensemble with train.py's XGBoost hist member in place of
+    # sklearn GradientBoosting
+    pytest.importorskip("xgboost")
+    from train import make_members
+
+    X = probe_matrix(synthetic_ens["feature_list"], n=1500, seed=3)
+    y = synthetic_ens["log_pipe"].predict(X)
+    gb = make_members()["gb_pipe"]
+    gb.set_params(clf__n_estimators=60)
+    return dict(synthetic_ens, gb_pipe=gb.fit(X, y))
+
+
+@pytest.fixture(scope="module")
+def probe(synthetic_ens):
+    return probe_matrix(synthetic_ens["feature_list"], n=2000, seed=5)
+
+
+@pytest.mark.parametrize("ens_name", ["synthetic_ens", "xgb_ens"])
+def test_float64_parity_per_member(request, probe, ens_name):
+    ens = request.getfixturevalue(ens_name)
+    fast = compile_ensemble(ens)
+    assert type(fast["gb_pipe"]) is FastTrees
+    assert fast["gb_pipe"].strict == (ens_name == "xgb_ens")
+    # parity on rows the compile-time probe never saw
+    diffs = check_parity(ens, fast, probe)
+    assert set(diffs) == set(MEMBERS)
+    for name, diff in diffs.items():
+        assert diff <= PARITY_ATOL, name
+
+
+@pytest.mark.parametrize("precision", ["float32", "int8"])
+def test_reduced_precision_within_tolerance(synthetic_ens, probe, precision):
+    fast = compile_ensemble(synthetic_ens, precision=precision)
+    assert fast.precision == precision
+    diffs = check_parity(synthetic_ens, fast, probe)
+    assert max(diffs.values()) <= PRECISION_ATOL[precision]
+
+
+def test_compile_refuses_disagreement(synthetic_ens):
+    with pytest.raises(FastPathUnsupported):
+        compile_ensemble(synthetic_ens, atol=-1.0)
+
+
+def test_fast_ensemble_is_a_drop_in(synthetic_ens, probe):
+    from forecast import predict_ensemble_proba
+
+    fast = compile_ensemble(synthetic_ens)
+    assert fast["feature_list"] == synthetic_ens["feature_list"]
+    np.testing.assert_allclose(
+        predict_ensemble_proba(probe, fast), predict_ensemble_proba(probe, synthetic_ens), atol=PARITY_ATOL
+    )
+
+
+def test_size_report_is_per_member(synthetic_ens):
+    report = size_report(synthetic_ens, compile_ensemble(synthetic_ens, precision="int8"))
+    assert set(report) == set(MEMBERS) | {"total"}
+    assert report["mlp_pipe"]["compiled_bytes"] < report["mlp_pipe"]["original_bytes"]
+
+
+def test_rss_report_measures_a_fresh_process(synthetic_ens, tmp_path):
+    import pickle
+    import sys
+
+    if not sys.platform.startswith("linux"):
+        pytest.importorskip("psutil")
+    path = tmp_path / "model.pkl"
+    path.write_bytes(pickle.dumps(synthetic_ens))
+    rss = rss_report(str(path), precision="float32")
+    assert list(rss) == ["start", "loaded", "compiled", "cleared"]
+    assert all(isinstance(v, int) and v > 0 for v in rss.values())
+    assert rss["loaded"] > rss["start"]
@@ -0,0 +1,256 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecast
+import model_store
+import observations
+from forecast import DISTRICT_COORDS, DISTRICTS, FeatureEncoder, build_feature_row, normalize_records
+from observations import ObservationStore
+
+AGGREGATES = ["rain_3day_sum", "temp_3day_mean", "rh_3day_mean", "pres_3day_mean", "pressure_drop"]
+# last and first day of every season, leap day included
+BOUNDARIES = [
+    dt.date(2024, 2, 28), dt.date(2024, 2, 29), dt.date(2024, 3, 1), dt.date(2024, 3, 31),
+    dt.date(2024, 4, 1), dt.date(2024, 5, 31), dt.date(2024, 6, 1), dt.date(2024, 9, 30),
+    dt.date(2024, 10, 1), dt.date(2024, 11, 30), dt.date(2024, 12, 1), dt.date(2024, 12, 31),
+    dt.date(2025, 1, 1), dt.date(2023, 2, 28), dt.date(2023, 3, 1),
+]
+STORE_DAY = dt.date(2024, 6, 1)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    # history for half the districts in the days before STORE_DAY, so blank
+    # aggregates come from the store for some rows and from today's values
+    # for the rest
+    store = ObservationStore()
+    start = dt.datetime.combine(STORE_DAY, dt.time(), forecast.IST)
+    for k, d in enumerate(DISTRICTS[::2]):
+        for hours in range(-60, 0, 3):
+            store.append(d, start + dt.timedelta(hours=hours), 25.0 + k, 70.0, 970.0 - k, 1.0 + k)
+    monkeypatch.setattr(observations, "get_observation_store", lambda path=None: store)
+    return store
+
+
+def random_records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = [BOUNDARIES[i] for i in rng.integers(0, len(BOUNDARIES), n // 2)]
+    dates += [dt.date(2017, 1, 1) + dt.timedelta(days=int(k)) for k in rng.integers(0, 8 * 365, n - len(dates))]
+    records = []
+    for i, date in enumerate(dates):
+        district = DISTRICTS[i % len(DISTRICTS)]
+        temp, pressure = rng.normal(28.0, 5.0), rng.normal(975.0, 6.0)
+        record = {
+            "date": STORE_DAY if rng.random() < 0.2 else date,
+            "district": district,
+            "lat": DISTRICT_COORDS[district][0],
+            "lon": DISTRICT_COORDS[district][1],
+            "temp_c": temp,
+            "rh": rng.uniform(20.0, 100.0),
+            "pressure": pressure,
+            "windspeed": rng.uniform(0.0, 9.0),
+            "rain_mm": rng.exponential(4.0),
+            "rain_3day_sum": rng.exponential(8.0),
+            "temp_3day_mean": temp + rng.normal(),
+            "rh_3day_mean": rng.uniform(20.0, 100.0),
+            "pres_3day_mean": pressure + rng.normal(0.0, 2.0),
+            "pressure_drop": rng.normal(0.0, 2.0),
+        }
+        # all, some or none of the aggregates left blank
+        blank = rng.random()
+        for col in AGGREGATES:
+            if blank < 0.3 or (blank < 0.6 and rng.random() < 0.5):
+                record[col] = None
+        records.append(record)
+    return records
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_encoder_matches_build_feature_row(synthetic_ens, store, shuffle):
+    feature_list = list(synthetic_ens["feature_list"])
+    if shuffle:
+        # a different layout that also leaves some features out
+        rng = np.random.default_rng(1)
+        feature_list = [feature_list[i] for i in rng.permutation(len(feature_list))[:-5]]
+    records = random_records(400)
+    assert {r["district"] for r in records} == set(DISTRICTS)
+
+    expected = pd.concat([build_feature_row(**r, feature_list=feature_list) for r in records], ignore_index=True)
+    expected = expected.reindex(columns=feature_list).to_numpy(dtype=np.float64)
+
+    encoder = FeatureEncoder(feature_list)
+    batch = encoder.encode(normalize_records(records))
+    for j, col in enumerate(feature_list):
+        np.testing.assert_array_equal(batch[:, j], expected[:, j], err_msg=col)
+
+    out = encoder.empty(1)
+    for i, r in enumerate(records):
+        row = encoder.encode_row(**r, out=out)[0]
+        for j, col in enumerate(feature_list):
+            np.testing.assert_array_equal(row[j], expected[i, j], err_msg=f"{col} (row {i})")
+
+
+def test_score_batch_matches_row_predictions(synthetic_ens, store):
+    records = random_records(120, seed=3)
+    expected = []
+    for i, r in enumerate(records):
+        row = build_feature_row(**r, feature_list=synthetic_ens["feature_list"])
+        expected.append(forecast.predict_ensemble_from_row(row, threshold=0.4, ens=synthetic_ens))
+        # OpenWeather's "wind" alias, and coordinates from the district centroid
+        if i % 3 == 0:
+            r["wind"] = r.pop("windspeed")
+        if i % 4 == 0:
+            del r["lat"], r["lon"]
+
+    scored = forecast.score_batch(records, threshold=0.4, ens=synthetic_ens)
+    assert list(scored["district"]) == [r["district"] for r in records]
+    assert list(scored["date"]) == [r["date"] for r in records]
+    np.testing.assert_allclose(scored["probability"], [p for _, p in expected], rtol=1e-12)
+    assert list(scored["prediction"]) == [pred for pred, _ in expected]
+    assert list(scored["risk"]) == [forecast.risk_label(p) for _, p in expected]
+
+
+@pytest.mark.parametrize(
+    "change, message",
+    [
+        ({"district": "Atlantis"}, "Unknown districts: Atlantis"),
+        ({"temp_c": None}, "Records have empty values in: temp_c"),
+        ({"windspeed": None}, "Records have empty values in: windspeed"),
+        ({"date": None}, "Records have empty values in: date"),
+    ],
+)
+def test_score_batch_rejects_bad_rows(synthetic_ens, store, change, message):
+    records = random_records(6)
+    records[4].update(change)
+    with pytest.raises(ValueError, match=message):
+        forecast.score_batch(records, ens=synthetic_ens)
+
+
+def test_score_batch_rejects_missing_fields(synthetic_ens):
+    records = [{"date": dt.date(2024, 7, 10), "district": "Ranchi", "temp_c": 30.0, "rh": 70.0}]
+    with pytest.raises(ValueError, match="missing fields: pressure, windspeed, rain_mm"):
+        forecast.score_batch(records, ens=synthetic_ens)
+    with pytest.raises(ValueError, match="No records"):
+        forecast.score_batch([], ens=synthetic_ens)
+
+# ================== CALENDAR ==================
+def calendar_days():
+    # two leap years, a 53-week ISO year (2020) and every season boundary in
+    # between, plus days the table has to grow for: 2000 and 2100 are the
+    # leap and non-leap century years
+    days = [dt.date(2019, 12, 1) + dt.timedelta(days=k) for k in range(5 * 366)]
+    days += [dt.date(1999, 12, 31), dt.date(2000, 2, 29), dt.date(2041, 1, 1), dt.date(2100, 2, 28), dt.date(2100, 3, 1)]
+    return days
+
+
+def test_calendar_matches_build_feature_row():
+    days = calendar_days()
+    feature_list = list(forecast.CALENDAR_FEATURES) + [f"Season_{s}" for s in forecast.SEASONS]
+    rows = [build_feature_row(d, "Ranchi", **WEATHER, pressure_drop=0.0, feature_list=feature_list) for d in days]
+    expected = pd.concat(rows, ignore_index=True).to_numpy(dtype=np.float64)
+    n_cal = len(forecast.CALENDAR_FEATURES)
+
+    # a narrow span, so the lookups past it rebuild the table
+    table = forecast.CalendarTable(2020, 2021)
+    block, codes = table.lookup_many(np.array(days, dtype="datetime64[D]"))
+    np.testing.assert_array_equal(block, expected[:, :n_cal])
+    np.testing.assert_array_equal(np.eye(len(forecast.SEASONS))[codes], expected[:, n_cal:])
+
+    table = forecast.CalendarTable(2020, 2021)
+    for d, row in zip(days, expected):
+        block, code = table.lookup(d)
+        np.testing.assert_array_equal(block, row[:n_cal], err_msg=str(d))
+        assert row[n_cal + code] == 1.0, d
+
+# ================== PREDICTION CACHE ==================
+WEATHER = {
+    "lat": 23.35, "lon": 85.33, "temp_c": 31.0, "rh": 75.0, "pressure": 968.0, "windspeed": 2.0, "rain_mm": 4.0,
+    "rain_3day_sum": 9.0, "temp_3day_mean": 30.0, "rh_3day_mean": 72.0, "pres_3day_mean": 970.0,
+}
+
+
+@pytest.fixture
+def loaded(synthetic_ens, monkeypatch, tmp_path):
+    # get_model() loads the synthetic ensemble, a fresh copy on every load
+    monkeypatch.setattr(forecast, "load_model", lambda path=None: dict(synthetic_ens))
+    monkeypatch.setattr(forecast, "_model", None)
+    monkeypatch.setattr(forecast, "_host", None)
+    monkeypatch.setattr(model_store, "STORE_DIR", str(tmp_path))
+    return synthetic_ens
+
+
+def test_cache_hits_within_sensor_resolution(loaded):
+    cache = forecast.PredictionCache()
+    date = dt.date(2024, 7, 10)
+    _, prob = cache.predict(date, "Ranchi", **WEATHER)
+    _, again = cache.predict(date, "Ranchi", **dict(WEATHER, temp_c=31.04, rh=75.3, pressure=967.96))
+    assert again == prob
+    assert cache.stats == {"hits": 1, "misses": 1, "invalidations": 0}
+    assert cache.hit_rate() == 0.5
+
+    # a miss is scored on the rounded inputs
+    _, moved = cache.predict(date, "Ranchi", **dict(WEATHER, temp_c=31.06))
+    row = build_feature_row(date, "Ranchi", **dict(WEATHER, temp_c=31.1), feature_list=loaded["feature_list"])
+    assert moved == forecast.predict_ensemble_from_row(row, ens=loaded)[1]
+    assert cache.stats["misses"] == 2 and cache.hit_rate() == pytest.approx(1 / 3)
+
+
+def test_cache_is_bounded_lru(loaded):
+    cache = forecast.PredictionCache(maxsize=3)
+    date = dt.date(2024, 7, 10)
+    for temp in (30.0, 31.0, 32.0):
+        cache.predict(date, "Ranchi", **dict(WEATHER, temp_c=temp))
+    cache.predict(date, "Ranchi", **dict(WEATHER, temp_c=30.0))
+    cache.predict(date, "Ranchi", **dict(WEATHER, temp_c=33.0))  # evicts 31.0, used longest ago
+    assert len(cache) == 3
+    misses = cache.stats["misses"]
+    for temp in (30.0, 32.0, 33.0):
+        cache.predict(date, "Ranchi", **dict(WEATHER, temp_c=temp))
+    assert cache.stats["misses"] == misses
+    cache.predict(date, "Ranchi", **dict(WEATHER, temp_c=31.0))
+    assert cache.stats["misses"] == misses + 1 and len(cache) == 3
+
+
+def test_cache_is_dropped_on_reload(loaded):
+    cache = forecast.PredictionCache()
+    date = dt.date(2024, 7, 10)
+    cache.predict(date, "Ranchi", **WEATHER)
+    first = forecast.get_model()
+    forecast.clear_model()
+    assert forecast.get_model() is not first
+    cache.predict(date, "Ranchi", **WEATHER)
+    assert cache.stats == {"hits": 0, "misses": 2, "invalidations": 1}
+    assert len(cache) == 1
+
+
+def test_cache_keys_on_passed_ensemble_version(synthetic_ens):
+    class Versioned(dict):
+        version = "v1"
+
+    cache = forecast.PredictionCache()
+    date = dt.date(2024, 7, 10)
+    ens = Versioned(synthetic_ens)
+    cache.predict(date, "Ranchi", **WEATHER, ens=ens)
+    cache.predict(date, "Ranchi", **WEATHER, ens=ens)
+    ens.version = "v2"
+    cache.predict(date, "Ranchi", **WEATHER, ens=ens)
+    assert cache.stats == {"hits": 1, "misses": 2, "invalidations": 1}
+
+    # without a version, ensembles are told apart by identity
+    other = dict(synthetic_ens)
+    for ens in (synthetic_ens, synthetic_ens, other, other, synthetic_ens):
+        cache.predict(date, "Ranchi", **WEATHER, ens=ens)
+    assert cache.stats == {"hits": 3, "misses": 5, "invalidations": 4}
+
+
+def test_cache_keys_the_passed_process_model_on_its_load(loaded):
+    cache = forecast.PredictionCache()
+    date = dt.date(2024, 7, 10)
+    cache.predict(date, "Ranchi", **WEATHER, ens=forecast.get_model())
+    cache.predict(date, "Ranchi", **WEATHER, ens=forecast.get_model())
+    forecast.clear_model()
+    cache.predict(date, "Ranchi", **WEATHER, ens=forecast.get_model())
+    assert cache.stats == {"hits": 1, "misses": 2, "invalidations": 1}
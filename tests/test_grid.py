@@ -0,0 +1,66 @@
+import datetime as dt
+import os
+
+import numpy as np
+import pytest
+
+import forecast
+import grid
+from forecast import DISTRICT_COORDS, DISTRICTS
+
+DATE = dt.date(2024, 7, 10)
+# a corner of the state around Ranchi, coarse enough to stay small
+BBOX = (22.9, 23.8, 84.8, 85.9)
+
+
+@pytest.fixture(autouse=True)
+def fresh_grids(monkeypatch, tmp_path):
+    monkeypatch.setattr(grid, "_grids", {})
+    monkeypatch.chdir(tmp_path)
+
+
+def district_weather(seed=0):
+    rng = np.random.default_rng(seed)
+    weather = {}
+    for d in DISTRICTS:
+        temp, pressure = rng.normal(29.0, 3.0), rng.normal(970.0, 4.0)
+        weather[d] = {
+            "temp_c": temp, "rh": rng.uniform(50.0, 95.0), "pressure": pressure, "wind": rng.uniform(0.0, 6.0),
+            "rain_mm": rng.exponential(4.0), "rain_3day_sum": rng.exponential(10.0), "temp_3day_mean": temp - 0.5,
+            "rh_3day_mean": 75.0, "pres_3day_mean": pressure + 1.0,
+        }
+    return weather
+
+
+def test_chunked_grid_matches_score_batch(synthetic_ens):
+    weather = district_weather()
+    raster, meta = grid.score_grid(DATE, weather, resolution=0.1, bbox=BBOX, ens=synthetic_ens, chunk_cells=7)
+    g = grid.build_grid(0.1, BBOX)
+    lat, lon, didx = g.cells()
+    assert meta["cells_scored"] == len(lat) > 7
+    records = [
+        {**weather[DISTRICTS[i]], "date": DATE, "district": DISTRICTS[i], "lat": la, "lon": lo}
+        for la, lo, i in zip(lat, lon, didx)
+    ]
+    expected = forecast.score_batch(records, ens=synthetic_ens)["probability"].to_numpy()
+    np.testing.assert_allclose(raster[g.inside], expected.astype(np.float32), rtol=1e-6)
+    assert np.isnan(raster[~g.inside]).all()
+
+
+def test_cached_index_follows_the_centroids(monkeypatch, tmp_path):
+    cache = str(tmp_path / "cache")
+    first = grid.build_grid(0.1, BBOX, cache_dir=cache)
+    assert len(os.listdir(cache)) == 1
+
+    # move Ranchi's centroid: a new index, not the cached one
+    lat, lon = DISTRICT_COORDS["Ranchi"]
+    monkeypatch.setitem(DISTRICT_COORDS, "Ranchi", (lat + 0.4, lon + 0.4))
+    moved = grid.build_grid(0.1, BBOX, cache_dir=cache)
+    assert len(os.listdir(cache)) == 2
+    assert not np.array_equal(first.district_idx, moved.district_idx)
+
+    grid._grids.clear()
+    reloaded = grid.build_grid(0.1, BBOX, cache_dir=cache)
+    np.testing.assert_array_equal(reloaded.district_idx, moved.district_idx)
+    grid.build_grid(0.2, BBOX, cache_dir=cache)
+    assert len(os.listdir(cache)) == 3
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hindcast import RollingCarry
+
+
+def frame(dates, district="Ranchi", rain=None):
+    n = len(dates)
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(dates),
+            "district": district,
+            "temp_c": np.arange(1.0, n + 1.0),
+            "rh": 70.0,
+            "pressure": 970.0,
+            "rain_mm": np.full(n, 1.0) if rain is None else rain,
+        }
+    )
+
+
+def test_daily_rows_roll_over_three_days():
+    df = frame(["2024-06-01", "2024-06-02", "2024-06-03", "2024-06-04"], rain=[10.0, 20.0, 30.0, 40.0])
+    out = RollingCarry().apply(df)
+    assert out["rain_3day_sum"].tolist() == [10.0, 30.0, 60.0, 90.0]
+    assert out["temp_3day_mean"].tolist() == [1.0, 1.5, 2.0, 3.0]
+    assert out["pressure_drop"].tolist() == [0.0] * 4
+
+
+def test_missing_days_shorten_the_window():
+    df = frame(["2024-06-01", "2024-06-02", "2024-06-05"], rain=[10.0, 20.0, 30.0])
+    out = RollingCarry().apply(df)
+    # 06-05 looks back over (06-02, 06-05]: nothing but itself
+    assert out["rain_3day_sum"].tolist() == [10.0, 30.0, 30.0]
+
+
+def test_hourly_rows_cover_three_days_not_three_rows():
+    df = frame(pd.date_range("2024-06-01", periods=120, freq="h"))
+    out = RollingCarry().apply(df)
+    assert out["rain_3day_sum"].iloc[[0, 2, 71, 72, 119]].tolist() == [1.0, 3.0, 72.0, 72.0, 72.0]
+    assert out["temp_3day_mean"].iloc[119] == pytest.approx(np.arange(49.0, 121.0).mean())
+
+
+def test_chunks_match_the_whole_file():
+    dates = list(pd.date_range("2024-06-01", periods=40, freq="7h"))
+    df = pd.concat([frame(dates, "Ranchi"), frame(dates, "Dumka", rain=np.arange(40.0))])
+    df = df.sort_values("date", kind="stable", ignore_index=True)
+    whole = RollingCarry().apply(df.copy())
+
+    carry = RollingCarry()
+    parts = [carry.apply(df.iloc[i : i + 9].copy()) for i in range(0, len(df), 9)]
+    pd.testing.assert_frame_equal(pd.concat(parts), whole)
+
+
+def test_out_of_order_rows_are_rejected():
+    with pytest.raises(ValueError):
+        RollingCarry().apply(frame(["2024-06-02", "2024-06-01"]))
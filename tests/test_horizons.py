@@ -0,0 +1,180 @@
+import numpy as np
+import pytest
+
+import horizons
+from horizons import WINDOW_H, HorizonForecaster, horizon_records
+from observations import ObservationStore
+from weather import WeatherClient, parse_forecast
+
+HOUR = 3600.0
+
+
+def test_parse_forecast(forecast_payload):
+    series = parse_forecast(forecast_payload)
+    steps = forecast_payload["list"]
+    assert len(series["time"]) == len(steps) == 40
+    assert series["time"] == sorted(series["time"])
+    assert all(b - a == 3 * HOUR for a, b in zip(series["time"], series["time"][1:]))
+
+    first = steps[0]
+    assert series["temp_c"][0] == first["main"]["temp"]
+    assert series["rh"][0] == first["main"]["humidity"]
+    assert series["pressure"][0] == first["main"]["pressure"]
+    assert series["wind"][0] == first["wind"]["speed"]
+    # rain is the 3 h accumulation; dry steps carry no "rain" key at all
+    expected = [step.get("rain", {}).get("3h", 0.0) for step in steps]
+    assert series["rain_mm"] == expected
+    assert sum(r > 0 for r in expected) < len(expected)
+
+
+def test_parse_forecast_sorts_steps(forecast_payload):
+    shuffled = dict(forecast_payload, list=forecast_payload["list"][::-1])
+    assert parse_forecast(shuffled) == parse_forecast(forecast_payload)
+
+
+def test_parse_forecast_rejects_empty():
+    with pytest.raises(ValueError):
+        parse_forecast({"cod": "200", "list": []})
+
+
+def flat_series(issued, steps=31):
+    # 3-hourly steps from `issued` on, 1 mm of rain in each, constant weather
+    times = [issued + 3 * HOUR * k for k in range(steps)]
+    return {
+        "time": times,
+        "temp_c": [30.0] * steps,
+        "rh": [80.0] * steps,
+        "pressure": [970.0] * steps,
+        "wind": [2.0] * steps,
+        "rain_mm": [1.0] * steps,
+    }
+
+
+def test_horizon_window_edges():
+    issued = 1_718_409_600.0
+    rec = horizon_records("Ranchi", flat_series(issued), issued, [0, 3, 72, 75])
+    # the step at `issued` itself is not ahead; a step exactly at the horizon
+    # is inside (h - 72, h], one exactly 72 h before it is not
+    assert rec["rain_3day_sum"].tolist() == [0.0, 1.0, 24.0, 24.0]
+    assert rec["rain_mm"].tolist() == [0.0, 1.0, 8.0, 8.0]
+    assert rec["horizon_h"].tolist() == [0, 3, 72, 75]
+    assert [t.timestamp() for t in rec["valid_time"]] == [issued + h * HOUR for h in (0, 3, 72, 75)]
+    # 2024-06-15 00:00 UTC is 05:30 IST; 75 h later is 2024-06-18 08:30 IST
+    assert [d.isoformat() for d in rec["date"]] == ["2024-06-15", "2024-06-15", "2024-06-18", "2024-06-18"]
+
+
+def test_horizon_past_and_ahead_split():
+    issued = 1_718_409_600.0
+    past = {"rain_3day_sum": 72.0, "temp_3day_mean": 20.0, "rh_3day_mean": 60.0, "pres_3day_mean": 990.0}
+    rec = horizon_records("Ranchi", flat_series(issued), issued, [0, 12, 36, 72], past)
+
+    past_share = np.array([1.0, 60 / WINDOW_H, 0.5, 0.0])
+    ahead_steps = np.array([0, 4, 12, 24])
+    np.testing.assert_allclose(rec["rain_3day_sum"], past_share * 72.0 + ahead_steps)
+    np.testing.assert_allclose(rec["temp_3day_mean"], past_share * 20.0 + (1 - past_share) * 30.0)
+    np.testing.assert_allclose(rec["pres_3day_mean"], past_share * 990.0 + (1 - past_share) * 970.0)
+    # the day's rain: forecast steps ahead plus the observed hourly rate for
+    # the part of the last 24 h that is already past
+    np.testing.assert_allclose(rec["rain_mm"], [24.0, 4 + 12.0, 8.0, 8.0])
+    np.testing.assert_allclose(rec["pressure_drop"], 970.0 - rec["pres_3day_mean"])
+
+
+def test_horizon_without_history_uses_forecast_only(forecast_payload):
+    series = parse_forecast(forecast_payload)
+    issued = series["time"][0] - 1800.0
+    rec = horizon_records("Ranchi", series, issued, range(0, 73, 3))
+    rain = np.asarray(series["rain_mm"])
+    offset = (np.asarray(series["time"]) - issued) / HOUR
+    assert rec["rain_3day_sum"].iloc[-1] == pytest.approx(rain[offset <= 72].sum())
+    assert rec["temp_c"].iloc[0] == pytest.approx(series["temp_c"][0])
+
+
+def test_build_uses_only_recent_observations(forecast_payload):
+    series = parse_forecast(forecast_payload)
+    issued = float(series["time"][0] - 1800)
+    store = ObservationStore()
+    store.append("Ranchi", issued - 5 * 86400.0, 20.0, 60.0, 990.0, 500.0)
+    stale = horizons.build_horizon_records({"Ranchi": series}, issued, [0], store)
+    # five-day-old history is not "the past 72 h": the forecast stands alone
+    assert stale["rain_3day_sum"].iloc[0] == 0.0
+
+    store.append("Ranchi", issued - 3600.0, 20.0, 60.0, 990.0, 500.0)
+    fresh = horizons.build_horizon_records({"Ranchi": series}, issued, [0], store)
+    assert fresh["rain_3day_sum"].iloc[0] == 500.0
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return FakeResponse(self.payload)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def forecaster(forecast_payload, synthetic_ens, monkeypatch):
+    monkeypatch.setattr(horizons, "get_observation_store", lambda path: ObservationStore())
+    first = forecast_payload["list"][0]["dt"]
+    session = FakeSession(forecast_payload)
+    client = WeatherClient(api_key="test", session=session, parser=parse_forecast)
+    clock = Clock(first - 1800.0)
+    f = HorizonForecaster(client=client, max_horizon=12, clock=clock)
+    return f, session, clock, first, synthetic_ens
+
+
+def test_forecaster_keeps_table_until_first_step(forecaster):
+    f, session, clock, first, ens = forecaster
+    table, errors = f.table(ens)
+    assert errors == {}
+    fetched = session.calls
+    assert fetched == len(horizons.DISTRICTS)
+    assert len(table) == len(horizons.DISTRICTS) * 5
+    assert table["probability"].between(0.0, 1.0).all()
+
+    clock.now = first - 1.0
+    again, _ = f.table(ens)
+    assert again is table and session.calls == fetched
+
+    # the provider's first step is now current: a new forecast is due
+    clock.now = first
+    refreshed, _ = f.table(ens)
+    assert refreshed is not table and session.calls == 2 * fetched
+
+
+def test_forecaster_waits_at_least_a_minute(forecaster):
+    f, session, clock, first, ens = forecaster
+    clock.now = first + 600.0  # the forecast's first step is already past
+    table, _ = f.table(ens)
+    fetched = session.calls
+
+    clock.now = first + 659.0
+    assert f.table(ens)[0] is table and session.calls == fetched
+    clock.now = first + 660.0
+    assert f.table(ens)[0] is not table and session.calls == 2 * fetched
+
+
+def test_forecaster_invalidate(forecaster):
+    f, session, clock, first, ens = forecaster
+    table, _ = f.table(ens)
+    f.invalidate()
+    assert f.table(ens)[0] is not table
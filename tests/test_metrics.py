@@ -0,0 +1,51 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metrics
+from metrics import LATENCY, parse_addr, start_exporter
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    monkeypatch.setattr(metrics, "_exporter", None)
+    server = start_exporter(0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_addr():
+    assert parse_addr("9101") == ("127.0.0.1", 9101)
+    assert parse_addr("0.0.0.0:9101") == ("0.0.0.0", 9101)
+
+
+def test_exporter_serves_the_registry_once_per_process(exporter):
+    LATENCY.observe(0.01, "render_risk")
+    url = f"http://127.0.0.1:{exporter.server_address[1]}/metrics"
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        text = resp.read().decode("utf-8")
+    assert resp.status == 200
+    assert 'lightning_operation_seconds_count{operation="render_risk"}' in text
+    assert start_exporter(0) is exporter
+
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(url.replace("/metrics", "/other"), timeout=5)
+
+
+def test_unbindable_address_returns_none(exporter, monkeypatch):
+    monkeypatch.setattr(metrics, "_exporter", None)
+    assert start_exporter(exporter.server_address[1]) is None
+    # the failure is remembered rather than retried on every rerun
+    assert start_exporter(0) is None
+
+
+def test_label_values_are_escaped():
+    registry = metrics.Registry()
+    counter = registry.counter("test_errors_total", "Errors by \\ message\nand kind.", ("message",))
+    counter.inc('bad "quote" in C:\\path\nsecond line')
+    text = registry.render()
+    assert '# HELP test_errors_total Errors by \\\\ message\\nand kind.\n' in text
+    assert 'test_errors_total{message="bad \\"quote\\" in C:\\\\path\\nsecond line"} 1\n' in text
+    assert len(text.splitlines()) == 3
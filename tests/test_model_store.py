@@ -0,0 +1,106 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import model_store
+from fastpath import PARITY_ATOL, FastTrees, compile_ensemble, probe_matrix
+from forecast import MEMBERS
+from model_store import ModelHost, ModelStore, ModelStoreError, export_store
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def store_root(tmp_path, synthetic_ens):
+    root = str(tmp_path / "model_store")
+    export_store(synthetic_ens, root, "v1")
+    return root
+
+
+def test_tree_member_is_served_from_shared_node_arrays(store_root, synthetic_ens):
+    store = ModelStore(store_root)
+    gb = store["gb_pipe"]
+    assert isinstance(gb, FastTrees)
+    for name in ("feature", "threshold", "left", "right", "value", "roots"):
+        array = getattr(gb, name)
+        assert isinstance(array, np.memmap) and not array.flags.writeable, name
+    X = probe_matrix(store.feature_list, n=500, seed=9)
+    for name in MEMBERS:
+        diff = np.abs(store[name].predict_proba(X) - synthetic_ens[name].predict_proba(X)).max()
+        assert diff <= PARITY_ATOL, name
+
+
+def test_mmap_off_loads_the_pickled_pipeline(store_root):
+    assert type(ModelStore(store_root, mmap=False)["gb_pipe"]).__name__ == "Pipeline"
+
+
+def test_fast_path_compiles_from_a_store(store_root):
+    fast = compile_ensemble(ModelStore(store_root), precision="float32")
+    assert fast["gb_pipe"].value.dtype == np.float32
+    assert fast.version == "v1"
+
+
+def test_feature_list_mismatch_is_rejected(store_root, synthetic_ens):
+    ens = dict(synthetic_ens, feature_list=synthetic_ens["feature_list"][:-1])
+    with pytest.raises(ModelStoreError):
+        export_store(ens, store_root, "bad", activate=False)
+
+
+def truncate(store_root, version, filename):
+    path = os.path.join(store_root, version, filename)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)
+
+
+def test_host_follows_current_and_keeps_serving_a_broken_version(store_root, synthetic_ens):
+    clock = Clock()
+    host = ModelHost(store_root, poll=5.0, clock=clock)
+    export_store(synthetic_ens, store_root, "v2")
+    assert host.current().version == "v1"
+    clock.now = 5.0
+    host.current()
+    host.wait(10.0)
+    assert host.current().version == "v2" and host.swaps == 1
+
+    export_store(synthetic_ens, store_root, "v3")
+    truncate(store_root, "v3", "mlp_pipe.joblib")
+    clock.now = 10.0
+    host.current()
+    host.wait(10.0)
+    assert host.current().version == "v2"
+
+    model_store.activate("v1", store_root)
+    assert host.reload() and host.current().version == "v1" and host.swaps == 2
+
+
+def test_host_loads_new_versions_off_the_request_thread(store_root, synthetic_ens, monkeypatch):
+    clock = Clock()
+    host = ModelHost(store_root, poll=5.0, clock=clock)
+    export_store(synthetic_ens, store_root, "v2")
+
+    release = threading.Event()
+    opened = []
+
+    class SlowStore(ModelStore):
+        def __init__(self, *args, **kwargs):
+            opened.append(kwargs.get("version"))
+            assert release.wait(10.0)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(model_store, "ModelStore", SlowStore)
+    clock.now = 5.0
+    # the load is blocked, yet every request is answered by v1 at once
+    for _ in range(3):
+        assert host.current().version == "v1"
+    release.set()
+    host.wait(10.0)
+    assert opened == ["v2"]
+    assert host.current().version == "v2" and host.swaps == 1
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from news import NewsCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubFetcher:
+    # answers from `results` in turn; each call blocks until released, so a
+    # test can look at the cache while a refresh is in flight
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+        self.started = threading.Semaphore(0)
+        self.release = threading.Semaphore(0)
+
+    def __call__(self, max_articles):
+        self.calls += 1
+        self.started.release()
+        assert self.release.acquire(timeout=5.0)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def complete(cache, fetcher):
+    # let the refresh in flight finish and wait until the cache has stored it
+    done = cache.stats["refreshes"] + 1
+    fetcher.release.release()
+    deadline = time.monotonic() + 5.0
+    while cache.stats["refreshes"] < done:
+        assert time.monotonic() < deadline, "refresh did not finish"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def warm(cache, fetcher):
+    assert cache.get() == (None, None)
+    complete(cache, fetcher)
+    return cache.get()
+
+
+def test_stale_read_returns_old_articles_and_refreshes_once(clock):
+    fetcher = StubFetcher((["old"], None), (["new"], None))
+    cache = NewsCache(fetch=fetcher, ttl=900.0, clock=clock)
+    assert warm(cache, fetcher) == (["old"], None)
+
+    clock.now = 900.0
+    start = time.monotonic()
+    reads = [cache.get() for _ in range(20)]
+    # none of the reads waits for the refresh still blocked in the fetcher
+    assert time.monotonic() - start < 1.0
+    assert reads == [(["old"], None)] * 20
+    assert fetcher.started.acquire(timeout=5.0) and fetcher.calls == 2
+
+    complete(cache, fetcher)
+    assert cache.get() == (["new"], None)
+    assert cache.stats == {"refreshes": 2, "failures": 0, "consecutive_failures": 0}
+    assert fetcher.calls == 2
+
+
+def test_failed_refresh_keeps_serving_stale_articles(clock):
+    fetcher = StubFetcher((["old"], None), ([], "News API error: 500"), RuntimeError("boom"), (["new"], None))
+    cache = NewsCache(fetch=fetcher, ttl=900.0, retry_after=60.0, clock=clock)
+    warm(cache, fetcher)
+
+    clock.now = 900.0
+    assert cache.get() == (["old"], None)
+    complete(cache, fetcher)
+    assert cache.get() == (["old"], None)
+    assert cache.stats["failures"] == 1
+
+    # retried after retry_after, not on every read; a raising fetcher counts as a failure too
+    clock.now = 959.0
+    cache.get()
+    assert fetcher.calls == 2
+    clock.now = 960.0
+    assert cache.get() == (["old"], None)
+    complete(cache, fetcher)
+    assert cache.stats == {"refreshes": 3, "failures": 2, "consecutive_failures": 2}
+
+    clock.now = 1020.0
+    cache.get()
+    complete(cache, fetcher)
+    assert cache.get() == (["new"], None)
+    assert cache.stats["consecutive_failures"] == 0
+
+
+def test_first_failure_reports_the_error(clock):
+    fetcher = StubFetcher(([], "News API key not configured."))
+    cache = NewsCache(fetch=fetcher, clock=clock)
+    assert warm(cache, fetcher) == ([], "News API key not configured.")
@@ -0,0 +1,129 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import observations
+from forecast import IST, normalize_records, resolve_rolling
+from observations import DAY_SECONDS, RAIN, ObservationStore
+
+DAY = dt.datetime(2024, 6, 15, tzinfo=dt.timezone.utc)
+
+
+def at(days=0.0, hours=0.0):
+    return DAY + dt.timedelta(days=days, hours=hours)
+
+
+def daily_store(rains=(10.0, 20.0), temps=(26.0, 28.0), district="Ranchi"):
+    # one observation per day on the days before DAY
+    store = ObservationStore()
+    n = len(rains)
+    for k, (rain, temp) in enumerate(zip(rains, temps)):
+        store.append(district, at(k - n), temp, 80.0, 970.0, rain)
+    return store
+
+
+def test_window_covers_the_last_three_days():
+    store = ObservationStore()
+    for k in range(4):
+        store.append("Ranchi", at(k), 25.0 + k, 80.0, 970.0, 1.0)
+    agg = store.aggregates("Ranchi")
+    assert agg["rain_3day_sum"] == 3.0
+    assert agg["temp_3day_mean"] == 27.0
+
+
+def test_aggregates_and_rolling_agree_after_many_appends():
+    rng = np.random.default_rng(0)
+    store = ObservationStore()
+    ts = DAY.timestamp()
+    for _ in range(3000):
+        ts += rng.uniform(60.0, 3 * 3600.0)
+        store.append("Ranchi", ts, *rng.uniform([20, 40, 950, 0], [40, 100, 990, 5]))
+    latest = dt.datetime.fromtimestamp(ts, IST)
+    today = store._series["Ranchi"].buckets[observations._day(ts)]
+    temp, rh, pres, rain = today[:-1] / today[-1]
+    # rolling() with the latest day's observations as "today" is aggregates()
+    rolled = store.rolling("Ranchi", latest.date(), temp, rh, pres, today[RAIN])
+    assert rolled == pytest.approx(store.aggregates("Ranchi"))
+
+
+def test_days_are_ist_days():
+    store = ObservationStore()
+    # 20:00 UTC on the 13th is already 01:30 on the 14th in IST
+    store.append("Ranchi", dt.datetime(2024, 6, 13, 20, tzinfo=dt.timezone.utc), 28.0, 80.0, 970.0, 5.0)
+    assert store.rolling("Ranchi", dt.date(2024, 6, 15), 30.0, 70.0, 960.0, 0.0)["rain_3day_sum"] == 5.0
+    assert store.rolling("Ranchi", dt.date(2024, 6, 14), 30.0, 70.0, 960.0, 0.0) is None
+
+
+def test_aggregates_reject_stale_history():
+    store = daily_store()
+    assert store.aggregates("Ranchi", at(0)) is not None
+    assert store.aggregates("Ranchi", at(1)) is None
+
+
+def test_trailing_rain_is_stored_per_interval():
+    store = ObservationStore()
+    # rain.1h of 2 mm reported every 15 minutes for three hours
+    for q in range(13):
+        store.append("Ranchi", at(hours=q / 4), 28.0, 80.0, 970.0, 2.0, rain_hours=1.0)
+    # the first snapshot brings its full hour, every later one a quarter
+    assert store.aggregates("Ranchi")["rain_3day_sum"] == pytest.approx(2.0 + 12 * 0.5)
+
+
+def test_rolling_folds_in_today():
+    agg = daily_store().rolling("Ranchi", DAY.date(), 30.0, 70.0, 960.0, 30.0)
+    assert agg["rain_3day_sum"] == 60.0
+    assert agg["temp_3day_mean"] == pytest.approx((26.0 + 28.0 + 30.0) / 3)
+    assert agg["pres_3day_mean"] == pytest.approx((970.0 + 970.0 + 960.0) / 3)
+
+
+def test_rolling_weights_days_not_snapshots():
+    store = ObservationStore()
+    store.append("Ranchi", at(-2), 20.0, 80.0, 970.0, 0.0)
+    for h in range(24):
+        store.append("Ranchi", at(-1, h), 30.0, 80.0, 970.0, 0.0)
+    agg = store.rolling("Ranchi", DAY.date(), 40.0, 80.0, 970.0, 0.0)
+    assert agg["temp_3day_mean"] == pytest.approx(30.0)
+
+
+def test_rolling_needs_yesterday():
+    store = daily_store()
+    assert store.rolling("Ranchi", (DAY + dt.timedelta(days=5)).date(), 30.0, 70.0, 960.0, 30.0) is None
+    assert store.rolling("Dumka", DAY.date(), 30.0, 70.0, 960.0, 30.0) is None
+
+
+def test_rolling_survives_save_and_load(tmp_path):
+    store = daily_store()
+    path = str(tmp_path / "obs.npz")
+    store.save(path)
+    loaded = ObservationStore.load(path)
+    args = ("Ranchi", DAY.date(), 30.0, 70.0, 960.0, 30.0)
+    assert loaded.rolling(*args) == store.rolling(*args)
+    assert loaded.window == store.window == 3 * DAY_SECONDS
+    # appending carries on from the saved rain interval
+    loaded.append("Ranchi", at(-1, 0.5), 30.0, 70.0, 960.0, 4.0, rain_hours=1.0)
+    assert loaded.aggregates("Ranchi")["rain_3day_sum"] == pytest.approx(10.0 + 20.0 + 2.0)
+
+
+def test_loads_raw_rows_from_older_files(tmp_path):
+    path = str(tmp_path / "old.npz")
+    i = observations.DISTRICTS.index("Ranchi")
+    ts = np.array([at(-2).timestamp(), at(-1).timestamp()])
+    values = np.array([[26.0, 80.0, 970.0, 10.0], [28.0, 80.0, 970.0, 20.0]])
+    np.savez(path, window=np.array([3 * DAY_SECONDS]), **{f"ts_{i}": ts, f"values_{i}": values})
+    args = ("Ranchi", DAY.date(), 30.0, 70.0, 960.0, 30.0)
+    assert ObservationStore.load(path).rolling(*args) == daily_store().rolling(*args)
+
+
+def test_single_and_batch_resolve_the_same_aggregates(monkeypatch):
+    store = daily_store()
+    monkeypatch.setattr(observations, "get_observation_store", lambda path=None: store)
+    weather = {"temp_c": 30.0, "rh": 70.0, "pressure": 960.0, "rain_mm": 30.0}
+    single = resolve_rolling("Ranchi", **weather, date=DAY.date())
+
+    records = pd.DataFrame([dict(weather, date=DAY.date(), district="Ranchi", windspeed=2.0)])
+    batch = normalize_records(records).iloc[0]
+    columns = ["rain_3day_sum", "temp_3day_mean", "rh_3day_mean", "pres_3day_mean", "pressure_drop"]
+    assert [batch[c] for c in columns] == pytest.approx(list(single))
+    assert single[0] == 60.0
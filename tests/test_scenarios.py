@@ -0,0 +1,43 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+
+import observations
+import scenarios
+from forecast import DISTRICT_COORDS, IST, build_feature_row, predict_ensemble_from_row
+from observations import ObservationStore
+
+DATE = dt.date(2024, 7, 10)
+BASE = {"temp_c": 31.0, "rh": 75.0, "pressure": 968.0, "windspeed": 2.0, "rain_mm": 4.0}
+
+
+@pytest.fixture(params=["history", "empty"])
+def store(request, monkeypatch):
+    store = ObservationStore()
+    if request.param == "history":
+        start = dt.datetime.combine(DATE, dt.time(), IST)
+        for hours in range(-60, 0, 3):
+            store.append("Ranchi", start + dt.timedelta(hours=hours), 27.0, 85.0, 972.0, 2.5)
+    monkeypatch.setattr(observations, "get_observation_store", lambda path=None: store)
+    return store
+
+
+@pytest.mark.parametrize(
+    "ranges",
+    [
+        {"temp_c": "24:36:5", "pressure": "955:985:4", "rain_mm": "0,10,40"},
+        {"rh": "40:100:4", "rain_3day_sum": "0:60:3"},
+        {"pressure": "955:985:7", "pressure_drop": "-6:2:3"},
+    ],
+)
+def test_sweep_matches_row_predictions(synthetic_ens, store, ranges):
+    surface = scenarios.sweep(DATE, "Ranchi", BASE, ranges, ens=synthetic_ens, chunk_rows=7)
+    frame = surface.to_frame()
+    rng = np.random.default_rng(0)
+    for i in rng.choice(len(frame), size=min(len(frame), 12), replace=False):
+        point = {**BASE, **frame.iloc[i][surface.names].to_dict()}
+        lat, lon = DISTRICT_COORDS["Ranchi"]
+        row = build_feature_row(DATE, "Ranchi", lat, lon, feature_list=synthetic_ens["feature_list"], **point)
+        _, prob = predict_ensemble_from_row(row, ens=synthetic_ens)
+        np.testing.assert_allclose(frame["probability"].iloc[i], prob, rtol=1e-9, err_msg=str(point))
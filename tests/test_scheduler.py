@@ -0,0 +1,93 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+import forecast
+import observations
+import scheduler
+from scheduler import RiskTableStore
+
+
+def _table(districts, prob=0.5):
+    return pd.DataFrame(
+        {
+            "date": dt.date(2024, 6, 15),
+            "district": districts,
+            "temp_c": 30.0,
+            "rh": 70.0,
+            "pressure": 960.0,
+            "wind": 2.0,
+            "rain_mm": 1.0,
+            "probability": prob,
+            "prediction": int(prob >= 0.5),
+            "risk": "Moderate",
+        }
+    )
+
+
+def test_latest_is_the_newest_issue_by_probability(tmp_path):
+    store = RiskTableStore(str(tmp_path / "risk.sqlite"))
+    store.publish(_table(["Ranchi", "Dumka"], 0.9), "2024-06-15T00:00:00+00:00")
+    newer = _table(["Ranchi", "Dumka"])
+    newer["probability"] = [0.2, 0.7]
+    store.publish(newer, "2024-06-15T00:15:00+00:00")
+
+    latest = store.latest()
+    assert set(latest["issued_at"]) == {"2024-06-15T00:15:00+00:00"}
+    assert list(latest["district"]) == ["Dumka", "Ranchi"]
+    assert store.latest_issue() == "2024-06-15T00:15:00+00:00"
+    assert store.lookup("Ranchi")["probability"] == 0.2
+
+
+def test_keeps_the_last_issues(tmp_path):
+    store = RiskTableStore(str(tmp_path / "risk.sqlite"))
+    start = dt.datetime(2024, 6, 15, tzinfo=dt.timezone.utc)
+    issues = [(start + dt.timedelta(minutes=15 * i)).isoformat() for i in range(scheduler.KEEP_ISSUES + 4)]
+    for issued_at in issues:
+        store.publish(_table(["Ranchi"]), issued_at, {"Dumka": "timeout"})
+
+    with store._connect() as con:
+        kept = [r[0] for r in con.execute("SELECT DISTINCT issued_at FROM risk_table ORDER BY issued_at")]
+        errors = [r[0] for r in con.execute("SELECT DISTINCT issued_at FROM fetch_errors ORDER BY issued_at")]
+    assert kept == issues[-scheduler.KEEP_ISSUES :]
+    assert errors == kept
+
+
+@pytest.fixture
+def refresh(tmp_path, synthetic_ens, monkeypatch):
+    weather = {
+        "Ranchi": {"temp_c": 30.0, "rh": 70.0, "pressure": 960.0, "wind": 2.0, "rain_mm": 4.0, "rain_hours": 1.0},
+        "Dumka": {"temp_c": 32.0, "rh": 60.0, "pressure": 965.0, "wind": 3.0, "rain_mm": 0.0, "rain_hours": 1.0},
+    }
+    errors = {"Pakur": "timeout"}
+    monkeypatch.setattr(scheduler, "fetch_districts", lambda coords, **kw: (dict(weather), dict(errors)))
+    score = lambda records, threshold: forecast.score_batch(records, threshold, ens=synthetic_ens)  # noqa: E731
+    monkeypatch.setattr(scheduler, "score_batch", score)
+    monkeypatch.setattr(observations, "_store", None)
+    monkeypatch.setattr(observations, "_store_mtime", None)
+    store = RiskTableStore(str(tmp_path / "risk.sqlite"))
+    return store, str(tmp_path / "obs.npz"), weather
+
+
+def test_refresh_once_publishes_fetched_districts(refresh):
+    store, obs_path, weather = refresh
+    issued_at, errors = scheduler.refresh_once(store, obs_path=obs_path)
+
+    assert errors == {"Pakur": "timeout"}
+    latest = store.latest()
+    assert set(latest["district"]) == set(weather)
+    assert set(latest["issued_at"]) == {issued_at}
+    assert set(latest["date"]) == {str(forecast.today_ist())}
+    assert latest["probability"].between(0, 1).all()
+    row = store.lookup("Ranchi")
+    assert (row["temp_c"], row["rain_mm"]) == (30.0, 4.0)
+    # every fetch is also recorded as an observation
+    assert set(observations.ObservationStore.load(obs_path)._series) == set(weather)
+
+
+def test_refresh_once_with_no_weather_publishes_nothing(refresh, monkeypatch):
+    store, obs_path, _ = refresh
+    monkeypatch.setattr(scheduler, "fetch_districts", lambda coords, **kw: ({}, {"Ranchi": "down"}))
+    assert scheduler.refresh_once(store, obs_path=obs_path) == (None, {"Ranchi": "down"})
+    assert store.latest_issue() is None
@@ -0,0 +1,88 @@
+import io
+import json
+
+import pytest
+
+import service
+from fastpath import compile_ensemble
+
+RECORD = {
+    "district": "Ranchi",
+    "date": "2024-06-15",
+    "temp_c": 31.0,
+    "rh": 78.0,
+    "pressure": 968.0,
+    "windspeed": 2.5,
+    "rain_mm": 4.0,
+    "rain_3day_sum": 12.0,
+    "temp_3day_mean": 30.0,
+    "rh_3day_mean": 75.0,
+    "pres_3day_mean": 970.0,
+}
+
+
+@pytest.fixture
+def fast_ens(synthetic_ens, monkeypatch):
+    # the fast path turns NaN inputs into NaN probabilities instead of raising
+    fast = compile_ensemble(synthetic_ens)
+    monkeypatch.setattr(service, "ensemble", lambda: fast)
+    return fast
+
+
+def call(method, path, body=None):
+    # body: a dict, or raw JSON text for literals json.dumps would not write
+    data = (body if isinstance(body, str) else json.dumps(body or {})).encode("utf-8")
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "CONTENT_LENGTH": str(len(data)),
+        "wsgi.input": io.BytesIO(data),
+    }
+    status = []
+    chunks = service.app(environ, lambda s, headers: status.append(s))
+    return int(status[0].split()[0]), json.loads(b"".join(chunks))
+
+
+@pytest.mark.parametrize("threshold", ["abc", [0.5], {"x": 1}, "NaN", 1.5, -0.1])
+def test_bad_threshold_is_a_bad_request(fast_ens, threshold):
+    status, body = call("POST", "/predict", dict(RECORD, threshold=threshold))
+    assert status == 400, body
+    assert "threshold" in body["error"]
+    status, _ = call("POST", "/predict/batch", {"records": [RECORD], "threshold": threshold})
+    assert status == 400
+
+
+def test_json_nan_threshold_is_rejected(fast_ens):
+    status, body = call("POST", "/predict", json.dumps(RECORD)[:-1] + ', "threshold": NaN}')
+    assert status == 400 and "threshold" in body["error"]
+
+
+@pytest.mark.parametrize("literal", ["NaN", "Infinity"])
+def test_non_finite_weather_is_rejected(fast_ens, literal):
+    body = json.dumps(dict(RECORD, temp_c=0.0)).replace('"temp_c": 0.0', f'"temp_c": {literal}')
+    status, _ = call("POST", "/predict", body)
+    assert status == 400
+    status, _ = call("POST", "/predict/batch", '{"records": [' + body + "]}")
+    assert status == 400
+
+
+def test_valid_request(fast_ens):
+    status, body = call("POST", "/predict", dict(RECORD, threshold="0.3"))
+    assert status == 200
+    assert body["threshold"] == 0.3 and 0.0 <= body["probability"] <= 1.0
+    status, body = call("POST", "/predict/batch", {"records": [RECORD, RECORD]})
+    assert status == 200 and len(body["results"]) == 2
+
+
+def test_server_errors_do_not_leak_details(monkeypatch, caplog):
+    def broken():
+        raise RuntimeError("cannot read /srv/models/v3/gb_pipe.npy")
+
+    monkeypatch.setattr(service, "ensemble", broken)
+    for path, body in (("/predict", RECORD), ("/predict/batch", {"records": [RECORD]})):
+        caplog.clear()
+        with caplog.at_level("ERROR", logger="service"):
+            status, body = call("POST", path, body)
+        assert status == 500
+        assert body == {"error": "Prediction failed."}
+        assert "/srv/models/v3" in caplog.text
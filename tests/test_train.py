@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from train import tomek_majority
+
+
+def brute_force_tomek(X, y, rows, mean, std):
+    # every pair of mutual nearest neighbours among `rows` with different
+    # labels; returns the majority member of each
+    Z = (X[rows] - mean) / std
+    d = ((Z[:, None, :] - Z[None, :, :]) ** 2).sum(axis=2)
+    np.fill_diagonal(d, np.inf)
+    nn = d.argmin(axis=1)
+    mutual = nn[nn] == np.arange(len(rows))
+    link = mutual & (y[rows] != y[rows[nn]])
+    return np.unique(np.where(y[rows[link]] == 0, rows[link], rows[nn[link]]))
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    n = 3000
+    y = (rng.random(n) < 0.25).astype(int)
+    # overlapping classes on differently scaled features, so the scaling matters
+    X = rng.normal(0.0, 1.0, (n, 6)) * [1.0, 5.0, 0.2, 50.0, 1.0, 3.0] + y[:, None] * [0.8, 2.0, 0.1, 10.0, 0.0, 0.5]
+    return X.astype(np.float32), y
+
+
+@pytest.mark.parametrize("chunk", [3, 7, 250, 1000, 100_000])
+def test_matches_brute_force_mutual_neighbours(data, chunk):
+    X, y = data
+    # a shuffled subset, so the returned indices must map back into X
+    rows = np.random.default_rng(1).permutation(len(y))[:2500]
+    mean, std = X[rows].mean(axis=0, dtype=np.float64), X[rows].std(axis=0, dtype=np.float64)
+    expected = brute_force_tomek(X.astype(np.float64), y, rows, mean, std)
+    assert len(expected) > 20
+    np.testing.assert_array_equal(tomek_majority(X, y, rows, mean, std, chunk=chunk), expected)
+
+
+def test_nothing_to_remove_without_both_classes(data):
+    X, y = data
+    rows = np.flatnonzero(y == 0)[:100]
+    assert len(tomek_majority(X, y, rows, X.mean(axis=0), X.std(axis=0))) == 0
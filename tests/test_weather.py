@@ -0,0 +1,229 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from weather import WeatherClient, fetch_districts, parse_forecast
+
+SLOW_LAT, FAILING_LAT = 1.0, 2.0
+PAYLOAD = {"main": {"temp": 30.0, "humidity": 80, "pressure": 968}, "wind": {"speed": 2.5}}
+
+
+class StubOpenWeather(ThreadingHTTPServer):
+    # /data/2.5/weather stand-in: the district at SLOW_LAT answers after
+    # `delay` seconds, the one at FAILING_LAT with a 500, the rest at once
+    daemon_threads = True
+
+    def __init__(self, delay=0.0, slow_delay=0.5):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.delay = delay
+        self.slow_delay = slow_delay
+        self.active = self.max_active = 0
+        self.arrivals = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/data/2.5/weather"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        lat = float(parse_qs(urlparse(self.path).query)["lat"][0])
+        with server.lock:
+            server.arrivals.append(time.monotonic())
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.slow_delay if lat == SLOW_LAT else server.delay)
+            status, body = (500, {"message": "boom"}) if lat == FAILING_LAT else (200, PAYLOAD)
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server = StubOpenWeather(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def client_for(server, timeout=5.0):
+    return WeatherClient(api_key="test", base_url=server.url, timeout=timeout)
+
+
+def coords(n):
+    return {f"D{i}": (10.0 + i, 85.0) for i in range(n)}
+
+
+def test_partial_results_and_per_district_errors(stub):
+    server = stub(slow_delay=1.0)
+    districts = dict(coords(3), Slow=(SLOW_LAT, 85.0), Failing=(FAILING_LAT, 85.0))
+    start = time.monotonic()
+    weather, errors = fetch_districts(districts, client=client_for(server, timeout=0.3))
+    elapsed = time.monotonic() - start
+
+    assert set(weather) == {"D0", "D1", "D2"}
+    assert weather["D0"]["temp_c"] == 30.0 and weather["D0"]["wind"] == 2.5
+    assert set(errors) == {"Slow", "Failing"}
+    assert errors["Failing"] == "OpenWeather API error: 500"
+    assert errors["Slow"].startswith("Request error:")
+    # the slow district times out on its own instead of holding the batch
+    assert elapsed < 1.0
+
+
+def test_slow_district_within_timeout_is_returned(stub):
+    server = stub(slow_delay=0.2)
+    weather, errors = fetch_districts(dict(coords(2), Slow=(SLOW_LAT, 85.0)), client=client_for(server))
+    assert set(weather) == {"D0", "D1", "Slow"}
+    assert errors == {}
+
+
+def test_concurrency_is_bounded(stub):
+    server = stub(delay=0.1)
+    weather, errors = fetch_districts(coords(8), client=client_for(server), max_concurrency=3)
+    assert len(weather) == 8 and errors == {}
+    assert len(server.arrivals) == 8
+    assert server.max_active == 3
+
+
+def test_rate_limit_spaces_requests(stub):
+    server = stub()
+    rate = 10.0
+    weather, errors = fetch_districts(coords(5), client=client_for(server), max_concurrency=5, rate_limit=rate)
+    assert len(weather) == 5 and errors == {}
+    arrivals = sorted(server.arrivals)
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    # connection setup adds jitter to single gaps, never to the whole run
+    assert min(gaps) >= 0.5 / rate
+    assert arrivals[-1] - arrivals[0] >= 4 * 0.9 / rate
+
+
+class StubResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return json.loads(json.dumps(self._body))
+
+
+class StubSession:
+    # requests.Session stand-in counting upstream calls; each call waits for
+    # `gate` (when set) so tests can line callers up behind it
+    def __init__(self, body=PAYLOAD, gate=None):
+        self.body = body
+        self.gate = gate
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self.lock:
+            self.calls.append((params["lat"], params["lon"]))
+        if self.gate is not None:
+            self.gate()
+        return StubResponse(200, self.body)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_expires_after_ttl():
+    clock, session = FakeClock(), StubSession()
+    client = WeatherClient(api_key="test", ttl=60.0, session=session, clock=clock)
+    assert client.fetch(23.35, 85.33)[0]["temp_c"] == 30.0
+    clock.now = 59.0
+    client.fetch(23.35, 85.33)
+    # same ~1 km bucket
+    client.fetch(23.351, 85.332)
+    assert len(session.calls) == 1 and client.stats["hits"] == 2
+    clock.now = 60.0
+    client.fetch(23.35, 85.33)
+    assert len(session.calls) == 2
+
+
+def test_cache_evicts_least_recently_used():
+    session = StubSession()
+    client = WeatherClient(api_key="test", maxsize=2, session=session)
+    client.fetch(1.0, 1.0)
+    client.fetch(2.0, 2.0)
+    client.fetch(1.0, 1.0)
+    client.fetch(3.0, 3.0)  # evicts (2, 2), used longest ago
+    assert len(client.cache) == 2
+    client.fetch(1.0, 1.0)
+    client.fetch(3.0, 3.0)
+    assert len(session.calls) == 3
+    client.fetch(2.0, 2.0)
+    assert session.calls[-1] == (2.0, 2.0) and len(session.calls) == 4
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    n = 8
+    started = threading.Event()
+    release = threading.Event()
+
+    def gate():
+        started.set()
+        assert release.wait(5.0)
+
+    session = StubSession(gate=gate)
+    client = WeatherClient(api_key="test", session=session)
+    results = [None] * n
+
+    def call(i):
+        results[i] = client.fetch(23.35, 85.33)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    threads[0].start()
+    assert started.wait(5.0)
+    for t in threads[1:]:
+        t.start()
+    deadline = time.monotonic() + 5.0
+    while client.stats["coalesced"] < n - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5.0)
+
+    assert len(session.calls) == 1
+    assert client.stats == {"hits": 0, "misses": 1, "coalesced": n - 1, "errors": 0}
+    assert all(err is None and weather["temp_c"] == 30.0 for weather, err in results)
+    # every caller holds its own copy
+    assert len({id(weather) for weather, _ in results}) == n
+
+
+def test_callers_cannot_change_the_cached_value(forecast_payload):
+    client = WeatherClient(api_key="test", session=StubSession(forecast_payload), parser=parse_forecast)
+    first, _ = client.fetch(23.35, 85.33)
+    first["rain_mm"][0] = 999.0
+    first["wind"] = []
+    second, _ = client.fetch(23.35, 85.33)
+    assert second == parse_forecast(forecast_payload)
@@ -0,0 +1,351 @@
+"""Rebuild lightning_ensemble_model.pkl from labelled district-day (or finer) data.
+
+    python train.py lis_mts_2017_2022.csv --label Lightning
+    python train.py district_hours.parquet --chunksize 500000 --n-jobs 6 --export-store
+
+The input is read in chunks, encoded with the same FeatureEncoder used at
+inference time and spilled to a float32 memmap, so the raw table is never
+held in memory. Class balancing runs against that memmap:
+
+* Tomek links (majority side removed) are found exactly, one chunk of
+  majority rows at a time, with only the minority class indexed in memory.
+* SMOTE synthesizes minority rows from minority neighbours and appends them
+  to the memmap in blocks.
+
+Tomek runs before SMOTE (the reverse of imblearn's SMOTETomek) so the
+neighbour search is bounded by the original minority size rather than by the
+oversampled one. Cross-validation fits every (member, fold) pair in parallel,
+balancing only the training folds. The gradient boosting member is XGBoost
+with the histogram tree method. Every random step is seeded, and a JSON
+report with the data checksum, class counts and CV scores is written next
+to the model.
+"""
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import pickle
+import platform
+import tempfile
+
+import numpy as np
+
+from forecast import FEATURE_COLUMNS, MEMBERS, MODEL_PATH, get_encoder, normalize_records
+from hindcast import DEFAULT_CHUNKSIZE, RENAMES, RollingCarry, normalize_dates, read_chunks
+
+DEFAULT_LABEL = "Lightning"
+SEED = 42
+SMOTE_K = 5
+NEIGHBOR_CHUNK = 100_000
+
+# ================== OUT-OF-CORE FEATURE MATRIX ==================
+class FeatureMatrix:
+    # float32 rows appended to a file and read back as a memmap; labels and
+    # per-column moments are small and stay in memory
+
+    def __init__(self, path: str, n_features: int):
+        self.path = path
+        self.n_features = n_features
+        self.rows = 0
+        self.labels = []
+        self._sum = np.zeros(n_features)
+        self._sumsq = np.zeros(n_features)
+        self._file = open(path, "wb")
+
+    def append(self, X, y):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        self._file.write(X.tobytes())
+        self.rows += len(X)
+        self.labels.append(np.asarray(y, dtype=np.int8))
+        X64 = X.astype(np.float64)
+        self._sum += X64.sum(axis=0)
+        self._sumsq += (X64 * X64).sum(axis=0)
+
+    def close(self):
+        self._file.close()
+        y = np.concatenate(self.labels) if self.labels else np.zeros(0, dtype=np.int8)
+        X = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.n_features))
+        return X, y
+
+    def moments(self):
+        # mean / std used only for neighbour search (SMOTE, Tomek)
+        mean = self._sum / max(self.rows, 1)
+        std = np.sqrt(np.maximum(self._sumsq / max(self.rows, 1) - mean * mean, 0.0))
+        std[std == 0] = 1.0
+        return mean, std
+
+
+def load_matrix(src: str, label: str, workdir: str, chunksize: int = DEFAULT_CHUNKSIZE):
+    encoder = get_encoder(FEATURE_COLUMNS)
+    buf = encoder.empty(chunksize)
+    matrix = FeatureMatrix(os.path.join(workdir, "X.f32"), encoder.n_features)
+    rolling = RollingCarry()
+    digest = hashlib.sha256()
+    for chunk in read_chunks(src, chunksize):
+        chunk = chunk.rename(columns={k: v for k, v in RENAMES.items() if k in chunk and v not in chunk})
+        if label not in chunk:
+            raise ValueError(f"Label column {label!r} not found in {src}")
+        y = (chunk[label].to_numpy() > 0).astype(np.int8)
+        df = normalize_records(rolling.apply(normalize_dates(chunk.drop(columns=label))))
+        X = encoder.encode(df, out=buf)
+        digest.update(X.astype(np.float32).tobytes())
+        digest.update(y.tobytes())
+        matrix.append(X, y)
+    X, y = matrix.close()
+    mean, std = matrix.moments()
+    return X, y, mean, std, digest.hexdigest()
+
+# ================== MEMORY-LIGHT BALANCING ==================
+def _scaled(X, rows, mean, std):
+    return (np.asarray(X[rows], dtype=np.float64) - mean) / std
+
+
+def tomek_majority(X, y, rows, mean, std, chunk: int = NEIGHBOR_CHUNK):
+    # Majority rows (indices into X) that form a Tomek link with a minority
+    # row: the two are each other's nearest neighbour among `rows`. Only the
+    # minority rows are indexed; majority rows are streamed chunk by chunk.
+    from sklearn.neighbors import NearestNeighbors
+
+    minority = rows[y[rows] == 1]
+    majority = rows[y[rows] == 0]
+    if len(minority) < 2 or not len(majority):
+        return np.zeros(0, dtype=np.int64)
+    Xmin = _scaled(X, minority, mean, std)
+    nn_min = NearestNeighbors(n_neighbors=2).fit(Xmin)
+    d_min, _ = nn_min.kneighbors(Xmin)
+    d_min = d_min[:, 1]  # nearest other minority row
+
+    # nearest majority row of every minority row
+    best_d = np.full(len(minority), np.inf)
+    best_j = np.full(len(minority), -1, dtype=np.int64)
+    for start in range(0, len(majority), chunk):
+        part = majority[start : start + chunk]
+        d, j = NearestNeighbors(n_neighbors=1).fit(_scaled(X, part, mean, std)).kneighbors(Xmin)
+        closer = d[:, 0] < best_d
+        best_d[closer] = d[closer, 0]
+        best_j[closer] = part[j[closer, 0]]
+
+    cand = np.flatnonzero(best_d < d_min)
+    if not len(cand):
+        return np.zeros(0, dtype=np.int64)
+    cand_j = best_j[cand]
+    Xc = _scaled(X, cand_j, mean, std)
+
+    # the majority row's own nearest neighbour must be that minority row:
+    # closer than every other minority row ...
+    _, i_back = nn_min.kneighbors(Xc, n_neighbors=1)
+    linked = i_back[:, 0] == cand
+    # ... and than every other majority row
+    other = np.full(len(cand), np.inf)
+    for start in range(0, len(majority), chunk):
+        part = majority[start : start + chunk]
+        k = min(2, len(part))
+        d, j = NearestNeighbors(n_neighbors=k).fit(_scaled(X, part, mean, std)).kneighbors(Xc)
+        for col in range(k):
+            not_self = part[j[:, col]] != cand_j
+            other = np.where(not_self & (d[:, col] < other), d[:, col], other)
+    linked &= best_d[cand] < other
+    return np.unique(cand_j[linked])
+
+
+def smote_blocks(X, minority, n_new: int, mean, std, rng, k: int = SMOTE_K, block: int = NEIGHBOR_CHUNK):
+    # yields float32 synthetic minority rows, `block` at a time
+    from sklearn.neighbors import NearestNeighbors
+
+    if n_new <= 0 or len(minority) < 2:
+        return
+    k = min(k, len(minority) - 1)
+    Xmin = np.asarray(X[minority], dtype=np.float64)
+    _, neigh = NearestNeighbors(n_neighbors=k + 1).fit((Xmin - mean) / std).kneighbors((Xmin - mean) / std)
+    neigh = neigh[:, 1:]
+    for start in range(0, n_new, block):
+        n = min(block, n_new - start)
+        base = rng.integers(0, len(minority), n)
+        other = neigh[base, rng.integers(0, k, n)]
+        gap = rng.random((n, 1))
+        yield (Xmin[base] + gap * (Xmin[other] - Xmin[base])).astype(np.float32)
+
+
+def balance(X, y, rows, mean, std, workdir: str, seed: int = SEED, ratio: float = 1.0, tag: str = "balanced"):
+    # Tomek cleaning then SMOTE on X[rows]. Returns a memmap of the kept
+    # original rows followed by the synthetic ones, and its labels.
+    rng = np.random.default_rng(seed)
+    drop = tomek_majority(X, y, rows, mean, std)
+    keep = np.setdiff1d(rows, drop, assume_unique=False)
+    minority = keep[y[keep] == 1]
+    n_majority = len(keep) - len(minority)
+    n_new = max(0, int(round(ratio * n_majority)) - len(minority))
+
+    out = FeatureMatrix(os.path.join(workdir, f"{tag}.f32"), X.shape[1])
+    for start in range(0, len(keep), NEIGHBOR_CHUNK):
+        part = keep[start : start + NEIGHBOR_CHUNK]
+        out.append(X[part], y[part])
+    for synthetic in smote_blocks(X, minority, n_new, mean, std, rng):
+        out.append(synthetic, np.ones(len(synthetic), dtype=np.int8))
+    Xb, yb = out.close()
+    stats = {"tomek_removed": int(len(drop)), "smote_added": int(n_new), "rows": int(len(yb))}
+    return Xb, yb, stats
+
+# ================== MEMBERS ==================
+def make_members(seed: int = SEED, n_jobs: int = 1):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBClassifier
+
+    return {
+        "log_pipe": Pipeline([("scaler", StandardScaler()), ("clf", LogisticRegression(max_iter=2000))]),
+        "mlp_pipe": Pipeline(
+            [
+                ("scaler", StandardScaler()),
+                ("clf", MLPClassifier((64, 32), max_iter=300, early_stopping=True, random_state=seed)),
+            ]
+        ),
+        "gb_pipe": Pipeline(
+            [
+                (
+                    "clf",
+                    XGBClassifier(
+                        tree_method="hist",
+                        n_estimators=300,
+                        max_depth=6,
+                        learning_rate=0.1,
+                        subsample=0.8,
+                        colsample_bytree=0.8,
+                        random_state=seed,
+                        n_jobs=n_jobs,
+                    ),
+                )
+            ]
+        ),
+    }
+
+
+def _fit(name: str, X, y, seed: int):
+    return name, make_members(seed)[name].fit(X, y)
+
+
+def _fit_fold(name: str, fold: int, Xb, yb, X, y, test, seed: int):
+    from sklearn.metrics import roc_auc_score
+
+    _, model = _fit(name, Xb, yb, seed)
+    prob = model.predict_proba(np.asarray(X[test]))[:, 1]
+    return name, fold, float(roc_auc_score(y[test], prob)), prob
+
+# ================== TRAINING ==================
+def cross_validate(X, y, mean, std, workdir: str, folds: int = 5, n_jobs: int = 1, seed: int = SEED, ratio=1.0):
+    from joblib import Parallel, delayed
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import StratifiedKFold
+
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=seed).split(np.zeros(len(y)), y))
+    balanced = [
+        balance(X, y, train, mean, std, workdir, seed + fold, ratio, tag=f"fold{fold}")[:2]
+        for fold, (train, _) in enumerate(splits)
+    ]
+    # every (member, fold) fit is independent; joblib shares the memmaps
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(name, fold, Xb, yb, X, y, test, seed)
+        for fold, ((_, test), (Xb, yb)) in enumerate(zip(splits, balanced))
+        for name in MEMBERS
+    )
+    scores = {name: [] for name in MEMBERS}
+    oof = {name: np.zeros(len(y)) for name in MEMBERS}
+    for name, fold, auc, prob in results:
+        scores[name].append(auc)
+        oof[name][splits[fold][1]] = prob
+    ensemble = sum(oof.values()) / len(MEMBERS)
+    return {
+        "folds": folds,
+        "auc": {name: float(np.mean(s)) for name, s in scores.items()},
+        "auc_per_fold": scores,
+        "ensemble_oof_auc": float(roc_auc_score(y, ensemble)),
+    }
+
+
+def train(
+    src: str,
+    out: str = MODEL_PATH,
+    label: str = DEFAULT_LABEL,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    folds: int = 5,
+    n_jobs: int = 1,
+    seed: int = SEED,
+    ratio: float = 1.0,
+    workdir: str = None,
+):
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        X, y, mean, std, data_sha = load_matrix(src, label, tmp, chunksize)
+        if len(np.unique(y)) < 2:
+            raise ValueError("Training data needs both lightning and non-lightning rows.")
+        report = {
+            "created_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+            "source": os.path.abspath(src),
+            "data_sha256": data_sha,
+            "rows": int(len(y)),
+            "positives": int(y.sum()),
+            "seed": seed,
+            "smote_ratio": ratio,
+            "python": platform.python_version(),
+        }
+        if folds > 1:
+            report["cv"] = cross_validate(X, y, mean, std, tmp, folds, n_jobs, seed, ratio)
+
+        from joblib import Parallel, delayed
+
+        Xb, yb, report["balance"] = balance(X, y, np.arange(len(y)), mean, std, tmp, seed)
+        jobs = (delayed(_fit)(name, Xb, yb, seed) for name in MEMBERS)
+        fitted = dict(Parallel(n_jobs=min(n_jobs, len(MEMBERS)))(jobs))
+        del X, Xb  # release the memmaps before the directory goes away
+
+    ens = {name: fitted[name] for name in MEMBERS}
+    ens["feature_list"] = list(FEATURE_COLUMNS)
+    tmp_out = f"{out}.tmp"
+    with open(tmp_out, "wb") as f:
+        pickle.dump(ens, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_out, out)
+    with open(f"{os.path.splitext(out)[0]}.report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return ens, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the lightning ensemble from labelled weather data.")
+    parser.add_argument("src", help="Labelled .csv or .parquet")
+    parser.add_argument("--out", default=MODEL_PATH)
+    parser.add_argument("--label", default=DEFAULT_LABEL, help="Label column (lightning > 0).")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds (0 to skip).")
+    parser.add_argument("--n-jobs", type=int, default=1, help="Parallel (member, fold) fits.")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--smote-ratio", type=float, default=1.0, help="Minority:majority ratio after SMOTE.")
+    parser.add_argument("--workdir", default=None, help="Where to spill the feature memmaps.")
+    parser.add_argument("--export-store", action="store_true", help="Also export a new model store version.")
+    args = parser.parse_args(argv)
+
+    ens, report = train(
+        args.src,
+        args.out,
+        args.label,
+        args.chunksize,
+        args.folds,
+        args.n_jobs,
+        args.seed,
+        args.smote_ratio,
+        args.workdir,
+    )
+    print(f"Trained on {report['rows']} rows ({report['positives']} positive) -> {args.out}")
+    if "cv" in report:
+        for name, auc in report["cv"]["auc"].items():
+            print(f"{name:<9} CV AUC {auc:.4f}")
+        print(f"ensemble  OOF AUC {report['cv']['ensemble_oof_auc']:.4f}")
+    if args.export_store:
+        from model_store import export_store
+
+        print(f"Exported -> {export_store(ens)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from forecast import DISTRICT_COORDS
+from metrics import CACHE, UPSTREAM_ERRORS, timed
+
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+OPENWEATHER_FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+
+# ================== PARSING ==================
+def parse_current_weather(data: dict):
+    main = data.get("main", {})
+    temp_c = main.get("temp", 28.0)
+    rh = main.get("humidity", 70.0)
+    pressure = main.get("pressure", 970.0)
+    wind = data.get("wind", {}).get("speed", 0.0)
+    rain_raw, rain_hours = 0.0, 1.0
+    if "rain" in data:
+        if "1h" in data["rain"]:
+            rain_raw = data["rain"]["1h"]
+        else:
+            rain_raw, rain_hours = data["rain"].get("3h", 0.0), 3.0
+
+    return {
+        "temp_c": float(temp_c),
+        "rh": float(rh),
+        "pressure": float(pressure),
+        "wind": float(wind),
+        "rain_mm": float(rain_raw),
+        # rain_mm is the accumulation over the trailing rain_hours
+        "rain_hours": rain_hours,
+    }
+
+
+def parse_forecast(data: dict):
+    # 3-hourly forecast -> columnar steps sorted by valid time. rain_mm is the
+    # accumulation over the 3 h ending at each step.
+    steps = sorted(data.get("list", []), key=lambda item: item.get("dt", 0))
+    if not steps:
+        raise ValueError("Forecast response has no steps.")
+    series = {"time": [], "temp_c": [], "rh": [], "pressure": [], "wind": [], "rain_mm": []}
+    for item in steps:
+        current = parse_current_weather(item)
+        series["time"].append(int(item["dt"]))
+        for key in ("temp_c", "rh", "pressure", "wind"):
+            series[key].append(current[key])
+        series["rain_mm"].append(float(item.get("rain", {}).get("3h", 0.0)))
+    return series
+
+# ================== TTL CACHE ==================
+class TTLCache:
+    # LRU cache whose entries also expire ttl seconds after they were stored
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= self.clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# ================== RATE LIMIT ==================
+class RateLimiter:
+    # spaces calls at least 1 / rate seconds apart across all threads
+
+    def __init__(self, rate: float, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = self.clock()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            self.sleep(wait)
+
+# ================== CLIENT ==================
+class WeatherClient:
+    # OpenWeather client shared by every session (current conditions by
+    # default; pass the forecast URL and parse_forecast for the 3-hourly series).
+    #
+    # Lookups are cached on (lat, lon) rounded to `precision` decimals
+    # (2 decimals ~ 1 km), so every user asking about the same district
+    # within the TTL is served from memory. Concurrent misses for the same
+    # bucket wait on a single upstream call instead of each issuing one.
+
+    def __init__(
+        self,
+        api_key: str = None,
+        ttl: float = 600.0,
+        maxsize: int = 1024,
+        precision: int = 2,
+        timeout: float = 8.0,
+        pool_size: int = 16,
+        base_url: str = OPENWEATHER_URL,
+        session: requests.Session = None,
+        parser=parse_current_weather,
+        clock=time.monotonic,
+    ):
+        self._api_key = api_key
+        self.precision = precision
+        self.timeout = timeout
+        self.base_url = base_url
+        self.parser = parser
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    @property
+    def api_key(self):
+        if self._api_key is not None:
+            return self._api_key
+        return os.environ.get("OPENWEATHER_API_KEY", "").strip()
+
+    def bucket(self, lat: float, lon: float):
+        return (round(float(lat), self.precision), round(float(lon), self.precision))
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return (self.stats["hits"] + self.stats["coalesced"]) / total if total else 0.0
+
+    def fetch(self, lat: float, lon: float, limiter: RateLimiter = None):
+        # every caller gets its own copy, so one caller editing its weather
+        # cannot change what the cache serves to the next
+        if not self.api_key:
+            return None, "Weather API key not configured."
+
+        key = self.bucket(lat, lon)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("hits")
+            CACHE.inc("weather", "hit")
+            return copy.deepcopy(cached), None
+
+        with self._lock:
+            # another caller may have finished the upstream call meanwhile
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                CACHE.inc("weather", "hit")
+                return copy.deepcopy(cached), None
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        CACHE.inc("weather", "miss" if leader else "coalesced")
+        if not leader:
+            value, err = fut.result()
+            return copy.deepcopy(value), err
+
+        result = (None, "Request error: lookup did not complete")
+        try:
+            if limiter is not None:
+                limiter.acquire()
+            result = self._request(*key)
+            if result[0] is not None:
+                self.cache.set(key, result[0])
+            else:
+                self._count("errors")
+                UPSTREAM_ERRORS.inc("openweather")
+            return copy.deepcopy(result[0]), result[1]
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_result(result)
+
+    @timed("fetch_weather")
+    def _request(self, lat: float, lon: float):
+        params = {"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric"}
+        try:
+            resp = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            if resp.status_code == 401:
+                return None, "Invalid or inactive OpenWeather API key (401)."
+            if resp.status_code != 200:
+                return None, f"OpenWeather API error: {resp.status_code}"
+            return self.parser(resp.json()), None
+        except Exception as e:
+            return None, f"Request error: {e}"
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_weather_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WeatherClient()
+    return _client
+
+
+def fetch_weather_from_openweather(lat: float, lon: float):
+    return get_weather_client().fetch(lat, lon)
+
+
+def fetch_districts(
+    coords: dict = None,
+    client: WeatherClient = None,
+    max_concurrency: int = 8,
+    rate_limit: float = None,
+):
+    # Current conditions for many districts at once. Returns (weather, errors):
+    # one dict of results and one of error messages, both keyed by district,
+    # so a slow or failing district never sinks the whole batch.
+    if coords is None:
+        coords = DISTRICT_COORDS
+    if client is None:
+        client = get_weather_client()
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    weather, errors = {}, {}
+    if not coords:
+        return weather, errors
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(coords)))) as pool:
+        futures = {
+            pool.submit(client.fetch, lat, lon, limiter): name for name, (lat, lon) in coords.items()
+        }
+        for fut in as_completed(futures):
+            name = futures[fut]
+            try:
+                data, err = fut.result()
+            except Exception as e:
+                data, err = None, f"Request error: {e}"
+            if err:
+                errors[name] = err
+            else:
+                weather[name] = data
+    return weather, errors